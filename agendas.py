@@ -0,0 +1,105 @@
+"""
+Índice del horario semanal ocupado de cada estudiante (tabla `agenda_estudiante`).
+
+Cada fila guarda el horario de los cursos que el estudiante tiene matriculados y la máscara
+de los bloques de la semana que ocupan (ver horarios.HorarioOcupado). Con ella, la matrícula
+comprueba el choque de horario leyendo una fila por clave primaria y cruzando dos enteros,
+sin unir matrícula, curso y franja_horaria, y GET /estudiantes/{cedula}/horario arma el
+horario de la semana sin interpretar los cursos uno por uno. Un estudiante sin matrículas no
+tiene fila.
+
+Se mantiene como las tablas de resumen (ver resumenes.py), pero siempre: eventos.py marca
+en la sesión los estudiantes cuyas matrículas cambian, o cuyos cursos cambian de horario,
+y justo antes del commit se recalculan solo esas filas dentro de la misma transacción. La
+migración 8 la llena para las bases existentes; lo que se inserte sin pasar por la API debe
+volver a generarla con `reconstruir`.
+"""
+from typing import Dict, Iterable, Optional, Union
+
+from sqlalchemy import delete, event
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, insert, select
+
+import crud
+from database import engine
+from horarios import HorarioOcupado
+from models import AgendaEstudiante, Curso, Matricula
+
+TAMANO_LOTE_INSERT = 1000
+
+_CLAVE_PENDIENTES = "agendas_pendientes"
+
+
+def marcar(session: Session, cedulas: Iterable[str]):
+    """
+    Anota los estudiantes cuyo horario ocupado cambia con la transacción actual.
+    """
+    session.info.setdefault(_CLAVE_PENDIENTES, set()).update(cedulas)
+
+
+def _fila(cedula: str, cursos: Dict[str, str]) -> dict:
+    return {"cedula": cedula, **HorarioOcupado.de_cursos(cursos).a_fila()}
+
+
+def recalcular(session: Session, cedulas: Iterable[str]):
+    """
+    Vuelve a calcular las filas de agenda de los estudiantes dados a partir de sus matrículas.
+    """
+    for lote in crud.en_lotes(sorted(set(cedulas))):
+        cursos: Dict[str, Dict[str, str]] = {}
+        for cedula, codigo, _, horario, _ in session.exec(crud.MATRICULAS_DE_ESTUDIANTES, params={"cedulas": list(lote)}).all():
+            cursos.setdefault(cedula, {})[codigo] = horario
+        session.exec(delete(AgendaEstudiante).where(AgendaEstudiante.cedula.in_(lote)))
+        if cursos:
+            session.exec(insert(AgendaEstudiante), params=[_fila(cedula, horarios) for cedula, horarios in cursos.items()])
+
+
+def reconstruir(engine_a_usar: Union[Engine, Connection] = engine) -> int:
+    """
+    Vuelve a generar la tabla completa. Con una conexión, escribe dentro de su transacción
+    (ver migraciones/).
+
+    Returns:
+        int: Cantidad de estudiantes con agenda.
+    """
+    statement = (
+        select(Matricula.estudiante_cedula, Curso.codigo, Curso.horario)
+        .join(Curso)
+        .order_by(Matricula.estudiante_cedula)
+        .execution_options(yield_per=TAMANO_LOTE_INSERT)
+    )
+    with Session(engine_a_usar) as session:
+        session.exec(delete(AgendaEstudiante))
+        filas = []
+        total = 0
+        actual: Optional[str] = None
+        cursos: Dict[str, str] = {}
+        for cedula, codigo, horario in session.exec(statement):
+            if cedula != actual:
+                if cursos:
+                    filas.append(_fila(actual, cursos))
+                actual, cursos = cedula, {}
+                if len(filas) >= TAMANO_LOTE_INSERT:
+                    session.exec(insert(AgendaEstudiante), params=filas)
+                    total += len(filas)
+                    filas = []
+            cursos[codigo] = horario
+        if cursos:
+            filas.append(_fila(actual, cursos))
+        if filas:
+            session.exec(insert(AgendaEstudiante), params=filas)
+            total += len(filas)
+        session.commit()
+    return total
+
+
+@event.listens_for(Session, "before_commit")
+def _actualizar_pendientes(session: Session):
+    cedulas = session.info.pop(_CLAVE_PENDIENTES, None)
+    if cedulas:
+        recalcular(session, cedulas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session: Session):
+    session.info.pop(_CLAVE_PENDIENTES, None)
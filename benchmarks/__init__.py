@@ -0,0 +1,5 @@
+"""
+Benchmarks del sistema de gestión de universidad.
+
+Cada módulo se ejecuta con `python -m benchmarks.<modulo>` desde la raíz del proyecto.
+"""
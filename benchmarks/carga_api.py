@@ -0,0 +1,292 @@
+"""
+Benchmark de carga de todas las rutas de la API, ejecutado en el mismo proceso a través
+de la aplicación ASGI (sin red ni servidor).
+
+Siembra una base SQLite temporal con datos sintéticos (ver benchmarks/datos.py), recorre
+cada ruta de routers/estudiantes.py, routers/cursos.py, routers/matriculas.py y
+routers/busqueda.py y, por escenario, informa el throughput, la latencia p50/p95/p99, las sentencias SQL, el tiempo
+en SQL y las filas por petición (tomados de metricas.py) y el pico de memoria. Con
+--salida los resultados se guardan en JSON para comparar ejecuciones.
+
+    python -m benchmarks.carga_api --estudiantes 100000 --cursos 2000 --matriculas-por-estudiante 10 --salida antes.json
+    python -m benchmarks.carga_api --escenarios estudiantes.detalle,cursos.detalle --peticiones 2000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import datos
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+Peticion = Tuple[str, str, dict]
+
+
+@dataclass
+class Contexto:
+    """
+    Tamaño de los datos sembrados y estado compartido entre escenarios (lo creado por
+    un escenario lo puede eliminar otro).
+    """
+    estudiantes: int
+    cursos: int
+    matriculas_por_estudiante: int
+    secuencia: "itertools.count" = field(default_factory=itertools.count)
+    estudiantes_creados: List[str] = field(default_factory=list)
+    cursos_creados: List[str] = field(default_factory=list)
+
+    def cedula(self, azar: random.Random) -> str:
+        return datos.cedula(azar.randrange(self.estudiantes))
+
+    def codigo(self, azar: random.Random) -> str:
+        return datos.codigo(azar.randrange(self.cursos))
+
+    def matricula(self, azar: random.Random) -> dict:
+        e, k = azar.randrange(self.estudiantes), azar.randrange(self.matriculas_por_estudiante)
+        return {"estudiante_cedula": datos.cedula(e), "curso_codigo": datos.codigo(datos.curso_de_matricula(e, k, self.cursos))}
+
+    def nuevo_estudiante(self) -> dict:
+        n = next(self.secuencia)
+        return {"cedula": f"BN{n:07d}", "nombre": f"Estudiante nuevo {n}", "email": f"bn{n}@bench.co", "semestre": 1 + n % 12}
+
+    def nuevo_curso(self) -> dict:
+        n = next(self.secuencia)
+        return {"codigo": f"BN{n:06d}", "nombre": f"Curso nuevo {n}", "creditos": 1 + n % 5, "horario": datos.horario(n)}
+
+
+@dataclass(frozen=True)
+class Escenario:
+    nombre: str
+    generar: Callable[[Contexto, random.Random], Peticion]
+    max_peticiones: Optional[int] = None
+
+
+def _crear_estudiante(ctx: Contexto, azar: random.Random) -> Peticion:
+    fila = ctx.nuevo_estudiante()
+    ctx.estudiantes_creados.append(fila["cedula"])
+    return "POST", "/estudiantes/", {"json": fila}
+
+
+def _crear_curso(ctx: Contexto, azar: random.Random) -> Peticion:
+    fila = ctx.nuevo_curso()
+    ctx.cursos_creados.append(fila["codigo"])
+    return "POST", "/cursos/", {"json": fila}
+
+
+def _ndjson(filas: List[dict]) -> dict:
+    return {"content": "".join(json.dumps(fila) + "\n" for fila in filas).encode("utf-8")}
+
+
+def _matricular(ctx: Contexto, azar: random.Random) -> Peticion:
+    codigo = ctx.codigo(azar)
+    return "POST", f"/cursos/{codigo}/estudiantes/", {"json": {"estudiante_cedula": ctx.cedula(azar), "curso_codigo": codigo}}
+
+
+# Primero las lecturas sobre los datos sembrados y después las escrituras; los escenarios
+# de eliminación usan lo creado por los de creación.
+ESCENARIOS = [
+    Escenario("estudiantes.listar", lambda ctx, azar: ("GET", f"/estudiantes/?semestre={azar.randint(1, 12)}&limit=100", {})),
+    Escenario("estudiantes.listar_1000", lambda ctx, azar: ("GET", f"/estudiantes/?semestre={azar.randint(1, 12)}&limit=1000", {})),
+    Escenario("estudiantes.listar_ndjson", lambda ctx, azar: ("GET", "/estudiantes/?formato=ndjson&limit=1000", {})),
+    Escenario("estudiantes.exportar", lambda ctx, azar: ("GET", "/estudiantes/exportar?formato=csv", {}), max_peticiones=3),
+    Escenario("estudiantes.detalle", lambda ctx, azar: ("GET", f"/estudiantes/{ctx.cedula(azar)}/", {})),
+    Escenario("estudiantes.cursos", lambda ctx, azar: ("GET", f"/estudiantes/{ctx.cedula(azar)}/cursos/", {})),
+    Escenario("cursos.listar", lambda ctx, azar: ("GET", f"/cursos/?creditos={azar.randint(1, 5)}&limit=100", {})),
+    Escenario("cursos.listar_ndjson", lambda ctx, azar: ("GET", "/cursos/?formato=ndjson&limit=1000", {})),
+    Escenario("cursos.exportar", lambda ctx, azar: ("GET", "/cursos/exportar?formato=csv", {}), max_peticiones=20),
+    Escenario("cursos.detalle", lambda ctx, azar: ("GET", f"/cursos/{ctx.codigo(azar)}/", {})),
+    Escenario("cursos.estudiantes", lambda ctx, azar: ("GET", f"/cursos/{ctx.codigo(azar)}/estudiantes/", {})),
+    Escenario("buscar.estudiantes", lambda ctx, azar: ("GET", f"/buscar/?tipo=estudiantes&q=Estudiante {azar.randrange(ctx.estudiantes)}", {})),
+    Escenario("buscar.cursos", lambda ctx, azar: ("GET", f"/buscar/?tipo=cursos&q={ctx.codigo(azar)[:4]}", {})),
+    Escenario("estudiantes.crear", _crear_estudiante),
+    Escenario("estudiantes.actualizar", lambda ctx, azar: ("PATCH", f"/estudiantes/{ctx.cedula(azar)}/", {"json": {"nombre": f"Renombrado {azar.randrange(10**6)}"}})),
+    Escenario("estudiantes.importar", lambda ctx, azar: ("POST", "/estudiantes/importar?formato=ndjson", _ndjson([ctx.nuevo_estudiante() for _ in range(100)])), max_peticiones=20),
+    Escenario("estudiantes.eliminar", lambda ctx, azar: ("DELETE", f"/estudiantes/{ctx.estudiantes_creados.pop() if ctx.estudiantes_creados else 'BN-----'}/", {})),
+    Escenario("cursos.crear", _crear_curso),
+    Escenario("cursos.actualizar", lambda ctx, azar: ("PATCH", f"/cursos/{ctx.codigo(azar)}/", {"json": {"nombre": f"Curso renombrado {azar.randrange(10**6)}"}})),
+    Escenario("cursos.importar", lambda ctx, azar: ("POST", "/cursos/importar?formato=ndjson", _ndjson([ctx.nuevo_curso() for _ in range(100)])), max_peticiones=20),
+    Escenario("cursos.eliminar", lambda ctx, azar: ("DELETE", f"/cursos/{ctx.cursos_creados.pop() if ctx.cursos_creados else 'BN-----'}/", {})),
+    Escenario("cursos.matricular", _matricular),
+    Escenario("matriculas.desmatricular", lambda ctx, azar: ("DELETE", "/matriculas/", {"json": ctx.matricula(azar)})),
+    Escenario("matriculas.bulk", lambda ctx, azar: ("POST", "/matriculas/bulk", {"json": [
+        {"estudiante_cedula": ctx.cedula(azar), "curso_codigo": ctx.codigo(azar)} for _ in range(500)
+    ]}), max_peticiones=20),
+]
+
+
+def _percentil(ordenadas: List[float], p: float) -> float:
+    return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))] * 1000, 2)
+
+
+async def _medir(cliente: httpx.AsyncClient, escenario: Escenario, ctx: Contexto, args, registro) -> dict:
+    azar = random.Random(f"{args.semilla}:{escenario.nombre}")
+    total = min(args.peticiones, escenario.max_peticiones or args.peticiones)
+    for _ in range(min(args.calentamiento, total)):
+        metodo, url, kwargs = escenario.generar(ctx, azar)
+        await cliente.request(metodo, url, **kwargs)
+
+    registro.limpiar()
+    if args.memoria:
+        tracemalloc.reset_peak()
+    pendientes = iter(range(total))
+    latencias: List[float] = []
+    estados: Counter = Counter()
+
+    async def trabajador():
+        for _ in pendientes:
+            metodo, url, kwargs = escenario.generar(ctx, azar)
+            inicio = time.perf_counter()
+            respuesta = await cliente.request(metodo, url, **kwargs)
+            latencias.append(time.perf_counter() - inicio)
+            estados[respuesta.status_code] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(args.concurrencia)))
+    segundos = time.perf_counter() - inicio
+
+    latencias.sort()
+    rutas = registro.por_ruta()
+    ruta, sql = next(iter(rutas.items())) if len(rutas) == 1 else ("", {})
+    resultado = {
+        "escenario": escenario.nombre,
+        "ruta": ruta,
+        "peticiones": len(latencias),
+        "estados": {str(estado): cantidad for estado, cantidad in sorted(estados.items())},
+        "errores_5xx": sum(cantidad for estado, cantidad in estados.items() if estado >= 500),
+        "segundos": round(segundos, 3),
+        "peticiones_por_segundo": round(len(latencias) / segundos, 1),
+        "p50_ms": _percentil(latencias, 0.50),
+        "p95_ms": _percentil(latencias, 0.95),
+        "p99_ms": _percentil(latencias, 0.99),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 2),
+        "sentencias_sql_media": sql.get("sentencias_sql_media"),
+        "sql_ms_media": sql.get("sql_ms_media"),
+        "filas_media": sql.get("filas_media"),
+        "bytes_media": sql.get("bytes_media"),
+    }
+    if args.memoria:
+        resultado["memoria_pico_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+    return resultado
+
+
+async def _ejecutar(app, escenarios: List[Escenario], ctx: Contexto, args, registro) -> List[dict]:
+    limites = httpx.Limits(max_connections=None)
+    # Un error no controlado de la aplicación se cuenta como 500 en lugar de abortar el benchmark.
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    resultados = []
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark", limits=limites, timeout=None) as cliente:
+        for escenario in escenarios:
+            resultado = await _medir(cliente, escenario, ctx, args, registro)
+            resultados.append(resultado)
+            print(
+                f"{escenario.nombre:<26} {resultado['peticiones_por_segundo']:>9} pet/s | p50 {resultado['p50_ms']:>8} ms"
+                f" | p95 {resultado['p95_ms']:>8} ms | p99 {resultado['p99_ms']:>8} ms"
+                f" | SQL/pet {resultado['sentencias_sql_media']} | estados {resultado['estados']}",
+                flush=True,
+            )
+    return resultados
+
+
+def _memoria_pico_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes.
+    return round(pico / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudiantes", type=int, default=100000)
+    parser.add_argument("--cursos", type=int, default=2000)
+    parser.add_argument("--matriculas-por-estudiante", type=int, default=10)
+    parser.add_argument("--peticiones", type=int, default=500, help="Peticiones medidas por escenario.")
+    parser.add_argument("--calentamiento", type=int, default=10, help="Peticiones sin medir antes de cada escenario.")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--escenarios", help="Lista separada por comas; por defecto, todos.")
+    parser.add_argument("--modo", choices=("sync", "async"), default="sync", help="DB_MODO de la aplicación.")
+    parser.add_argument("--sin-cache", action="store_true", help="Desactiva la caché de lecturas.")
+    parser.add_argument("--memoria", action="store_true", help="Mide el pico de memoria de cada escenario con tracemalloc (más lento).")
+    parser.add_argument("--base", help="Archivo SQLite a usar; por defecto uno temporal que se borra al terminar.")
+    parser.add_argument("--desde", help="Copia este archivo (por ejemplo universidad.db) como base antes de sembrar.")
+    parser.add_argument("--sin-sembrar", action="store_true", help="Usa la base tal cual (ya sembrada con los mismos tamaños).")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    escenarios = ESCENARIOS
+    if args.escenarios:
+        nombres = args.escenarios.split(",")
+        desconocidos = set(nombres) - {escenario.nombre for escenario in ESCENARIOS}
+        if desconocidos:
+            parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+        escenarios = [escenario for escenario in ESCENARIOS if escenario.nombre in nombres]
+
+    directorio = None if args.base else tempfile.mkdtemp(prefix="universidad-bench-")
+    ruta_base = args.base or os.path.join(directorio, "universidad.db")
+    if args.desde:
+        shutil.copyfile(args.desde, ruta_base)
+
+    # La configuración se lee al importar la aplicación: hay que fijarla antes.
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{ruta_base}",
+        "DB_MODO": args.modo,
+        "LOG_LEVEL": "WARNING",
+        "CACHE_HABILITADA": "false" if args.sin_cache else "true",
+        "METRICAS_HABILITADAS": "true",
+        "METRICAS_UMBRAL_LENTO_MS": str(10**9),
+    })
+    try:
+        sembrado = None
+        if not args.sin_sembrar:
+            sembrado = datos.sembrar(os.environ["DATABASE_URL"], args.estudiantes, args.cursos, args.matriculas_por_estudiante, args.semilla)
+            print(f"Base sembrada en {sembrado['segundos']} s: {sembrado}", flush=True)
+
+        import main as aplicacion
+        import metricas
+        aplicacion.on_startup()
+
+        if args.memoria:
+            tracemalloc.start()
+        ctx = Contexto(args.estudiantes, args.cursos, args.matriculas_por_estudiante)
+        resultados = asyncio.run(_ejecutar(aplicacion.app, escenarios, ctx, args, metricas.registro))
+    finally:
+        if directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    informe = {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "configuracion": {clave: valor for clave, valor in vars(args).items() if clave != "salida"},
+        "sembrado": sembrado,
+        "memoria_pico_rss_mb": _memoria_pico_rss_mb(),
+        "resultados": resultados,
+    }
+    print(f"Pico de memoria del proceso: {informe['memoria_pico_rss_mb']} MB")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
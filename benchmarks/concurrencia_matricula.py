@@ -0,0 +1,306 @@
+"""
+Prueba de estrés de la matrícula concurrente: comprueba que ni el cupo de los cursos ni
+los créditos máximos de un estudiante se superan cuando cientos de peticiones compiten
+por ellos al mismo tiempo.
+
+Escenarios (cada uno con cursos y estudiantes nuevos):
+
+    cupo      N estudiantes piden a la vez el mismo curso de cupo C: deben entrar exactamente C.
+    creditos  Un estudiante de primer semestre pide a la vez muchos cursos de 4 créditos sin
+              choques de horario: no debe pasar de los créditos máximos de su semestre.
+    mixto     Matrículas individuales y lotes (POST /matriculas/bulk) mezclados sobre varios
+              cursos con cupo: ninguno debe pasar de su cupo ni responder 5xx.
+    espera    En un curso lleno con lista de espera, la mitad de los matriculados se retira
+              mientras otros piden matricularse: los cupos liberados son de la lista de espera
+              y, tras la promoción en segundo plano, el curso no debe pasar del cupo ni quedar
+              con cupos libres y estudiantes esperando.
+
+Por defecto la aplicación corre en el mismo proceso sobre una base SQLite temporal. Con
+--url se ataca un servidor ya levantado (por ejemplo con varios workers de uvicorn); los
+datos se crean y se verifican a través de la API. Termina con código 1 si algún escenario
+sobrevende un cupo, supera los créditos o recibe errores 5xx. Los escenarios cupo y
+creditos, a menor escala y desde varios procesos, corren también con pytest
+(tests/test_concurrencia_matricula.py).
+
+    python -m benchmarks.concurrencia_matricula --estudiantes 500 --cupo 50
+    python -m benchmarks.concurrencia_matricula --url http://127.0.0.1:8000 --modo async
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Awaitable, List
+
+import httpx
+
+import cupos
+from benchmarks import datos
+
+CREDITOS_CURSO_CREDITOS = 4
+CURSOS_ESCENARIO_CREDITOS = 20
+CURSOS_ESCENARIO_MIXTO = 5
+PARES_POR_LOTE = 10
+ESPERAS_PROMOCION = 50
+PAUSA_PROMOCION_SEGUNDOS = 0.1
+
+
+def _ndjson(filas: List[dict]) -> dict:
+    return {"content": "".join(json.dumps(fila) + "\n" for fila in filas).encode("utf-8")}
+
+
+class Prueba:
+    """
+    Cliente de la prueba: crea los datos de cada escenario con una etiqueta propia (para
+    poder repetir la prueba sobre la misma base) y lanza las peticiones concurrentes.
+    """
+
+    def __init__(self, cliente: httpx.AsyncClient, concurrencia: int):
+        self.cliente = cliente
+        self.limite = asyncio.Semaphore(concurrencia)
+        self.etiqueta = f"{random.randrange(16**4):04X}"
+        self.horarios = iter(range(len(datos.DIAS_LECTIVOS) * 7))
+
+    def codigo(self, escenario: str, n: int) -> str:
+        return f"{escenario}{self.etiqueta}{n:03d}"
+
+    async def _verificar(self, respuesta: httpx.Response) -> httpx.Response:
+        if respuesta.status_code >= 300:
+            raise RuntimeError(f"{respuesta.request.method} {respuesta.request.url} -> {respuesta.status_code}: {respuesta.text}")
+        return respuesta
+
+    async def crear_cursos(self, escenario: str, cantidad: int, creditos: int, cupo=None) -> List[str]:
+        filas = [
+            {"codigo": self.codigo(escenario, n), "nombre": f"Curso de estrés {n}", "creditos": creditos,
+             "horario": datos.horario(next(self.horarios)), **({"cupo": cupo} if cupo else {})}
+            for n in range(cantidad)
+        ]
+        for fila in filas:
+            await self._verificar(await self.cliente.post("/cursos/", json=fila))
+        return [fila["codigo"] for fila in filas]
+
+    async def crear_estudiantes(self, escenario: str, cantidad: int, semestre: int) -> List[str]:
+        filas = [
+            {"cedula": f"E{escenario}{self.etiqueta}{n:06d}", "nombre": f"Estudiante de estrés {n}",
+             "email": f"estres.{escenario}{self.etiqueta}{n}@bench.co".lower(), "semestre": semestre}
+            for n in range(cantidad)
+        ]
+        reporte = (await self._verificar(await self.cliente.post("/estudiantes/importar?formato=ndjson", **_ndjson(filas)))).json()
+        if reporte["rechazados"]:
+            raise RuntimeError(f"No se pudieron crear los estudiantes: {reporte['errores'][:3]}")
+        return [fila["cedula"] for fila in filas]
+
+    async def _enviar(self, metodo: str, url: str, cuerpo, estados: Counter, latencias: List[float]) -> httpx.Response:
+        async with self.limite:
+            inicio = time.perf_counter()
+            respuesta = await self.cliente.request(metodo, url, json=cuerpo)
+            latencias.append(time.perf_counter() - inicio)
+            estados[f"{metodo} {respuesta.status_code}"] += 1
+            return respuesta
+
+    async def en_paralelo(self, peticiones: List[Awaitable]) -> float:
+        inicio = time.perf_counter()
+        await asyncio.gather(*peticiones)
+        return time.perf_counter() - inicio
+
+    async def matriculados(self, codigos: List[str]) -> dict:
+        por_curso = {}
+        for codigo in codigos:
+            estudiantes = (await self._verificar(await self.cliente.get(f"/cursos/{codigo}/"))).json()["estudiantes"]
+            por_curso[codigo] = len(estudiantes)
+        return por_curso
+
+    async def creditos_de(self, cedula: str) -> int:
+        cursos = (await self._verificar(await self.cliente.get(f"/estudiantes/{cedula}/cursos/"))).json()
+        return sum(curso["creditos"] for curso in cursos)
+
+
+def _resultado(nombre: str, estados: Counter, latencias: List[float], segundos: float, fallas: List[str], **detalle) -> dict:
+    latencias.sort()
+    errores_5xx = sum(cantidad for clave, cantidad in estados.items() if clave.split()[1].startswith("5"))
+    if errores_5xx:
+        fallas.append(f"{errores_5xx} respuestas 5xx")
+    return {
+        "escenario": nombre,
+        "peticiones": len(latencias),
+        "segundos": round(segundos, 3),
+        "peticiones_por_segundo": round(len(latencias) / segundos, 1),
+        "p50_ms": round(latencias[len(latencias) // 2] * 1000, 1),
+        "p99_ms": round(latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000, 1),
+        "estados": dict(sorted(estados.items())),
+        **detalle,
+        "correcto": not fallas,
+        "fallas": fallas,
+    }
+
+
+async def escenario_cupo(prueba: Prueba, args) -> dict:
+    (codigo,) = await prueba.crear_cursos("C", 1, creditos=3, cupo=args.cupo)
+    cedulas = await prueba.crear_estudiantes("C", args.estudiantes, semestre=12)
+    estados, latencias = Counter(), []
+    segundos = await prueba.en_paralelo([
+        prueba._enviar("POST", f"/cursos/{codigo}/estudiantes/", {"estudiante_cedula": cedula, "curso_codigo": codigo}, estados, latencias)
+        for cedula in cedulas
+    ])
+    matriculados = (await prueba.matriculados([codigo]))[codigo]
+    esperados = min(args.cupo, args.estudiantes)
+    fallas = []
+    if matriculados != esperados:
+        fallas.append(f"{matriculados} matriculados en un curso de cupo {args.cupo} (se esperaban {esperados})")
+    if estados["POST 201"] != matriculados:
+        fallas.append(f"{estados['POST 201']} respuestas 201 para {matriculados} matrículas")
+    return _resultado("cupo", estados, latencias, segundos, fallas, cupo=args.cupo, matriculados=matriculados)
+
+
+async def escenario_creditos(prueba: Prueba, args) -> dict:
+    codigos = await prueba.crear_cursos("K", CURSOS_ESCENARIO_CREDITOS, creditos=CREDITOS_CURSO_CREDITOS)
+    (cedula,) = await prueba.crear_estudiantes("K", 1, semestre=1)
+    estados, latencias = Counter(), []
+    segundos = await prueba.en_paralelo([
+        prueba._enviar("POST", f"/cursos/{codigo}/estudiantes/", {"estudiante_cedula": cedula, "curso_codigo": codigo}, estados, latencias)
+        for codigo in codigos
+    ])
+    creditos = await prueba.creditos_de(cedula)
+    maximo = cupos.creditos_maximos(1)
+    esperados = maximo // CREDITOS_CURSO_CREDITOS * CREDITOS_CURSO_CREDITOS
+    fallas = []
+    if creditos != esperados:
+        fallas.append(f"{creditos} créditos matriculados con un máximo de {maximo} (se esperaban {esperados})")
+    return _resultado("creditos", estados, latencias, segundos, fallas, creditos_maximos=maximo, creditos=creditos)
+
+
+async def escenario_mixto(prueba: Prueba, args) -> dict:
+    codigos = await prueba.crear_cursos("M", CURSOS_ESCENARIO_MIXTO, creditos=3, cupo=args.cupo)
+    cedulas = await prueba.crear_estudiantes("M", args.estudiantes, semestre=12)
+    azar = random.Random(args.semilla)
+    estados, latencias = Counter(), []
+    peticiones = []
+    for indice, cedula in enumerate(cedulas):
+        if indice % 2:
+            codigo = azar.choice(codigos)
+            peticiones.append(prueba._enviar("POST", f"/cursos/{codigo}/estudiantes/", {"estudiante_cedula": cedula, "curso_codigo": codigo}, estados, latencias))
+        else:
+            lote = [{"estudiante_cedula": azar.choice(cedulas), "curso_codigo": azar.choice(codigos)} for _ in range(PARES_POR_LOTE)]
+            peticiones.append(prueba._enviar("POST", "/matriculas/bulk", lote, estados, latencias))
+    segundos = await prueba.en_paralelo(peticiones)
+    por_curso = await prueba.matriculados(codigos)
+    fallas = [f"{codigo}: {cantidad} matriculados con cupo {args.cupo}" for codigo, cantidad in por_curso.items() if cantidad > args.cupo]
+    return _resultado("mixto", estados, latencias, segundos, fallas, cupo=args.cupo, matriculados=por_curso)
+
+
+async def escenario_espera(prueba: Prueba, args) -> dict:
+    (codigo,) = await prueba.crear_cursos("W", 1, creditos=3, cupo=args.cupo)
+    cedulas = await prueba.crear_estudiantes("W", 3 * args.cupo, semestre=12)
+    dentro, en_espera, directos = cedulas[:args.cupo], cedulas[args.cupo:2 * args.cupo], cedulas[2 * args.cupo:]
+    await prueba._verificar(await prueba.cliente.post("/matriculas/bulk", json=[{"estudiante_cedula": cedula, "curso_codigo": codigo} for cedula in dentro]))
+    for cedula in en_espera:
+        await prueba._verificar(await prueba.cliente.post(f"/cursos/{codigo}/lista-espera/", json={"estudiante_cedula": cedula, "curso_codigo": codigo}))
+
+    # La mitad de los matriculados se retira mientras otros intentan matricularse directamente:
+    # los cupos liberados deben ir a la lista de espera o a los directos, sin pasarse del cupo.
+    estados, latencias = Counter(), []
+    peticiones = [
+        prueba._enviar("DELETE", "/matriculas/", {"estudiante_cedula": cedula, "curso_codigo": codigo}, estados, latencias)
+        for cedula in dentro[:args.cupo // 2]
+    ] + [
+        prueba._enviar("POST", f"/cursos/{codigo}/estudiantes/", {"estudiante_cedula": cedula, "curso_codigo": codigo}, estados, latencias)
+        for cedula in directos
+    ]
+    random.Random(args.semilla).shuffle(peticiones)
+    segundos = await prueba.en_paralelo(peticiones)
+
+    # La promoción corre en segundo plano: se espera a que no queden cupos libres o nadie en espera.
+    for _ in range(ESPERAS_PROMOCION):
+        matriculados = (await prueba.matriculados([codigo]))[codigo]
+        esperando = len((await prueba._verificar(await prueba.cliente.get(f"/cursos/{codigo}/lista-espera/"))).json())
+        if matriculados >= args.cupo or not esperando:
+            break
+        await asyncio.sleep(PAUSA_PROMOCION_SEGUNDOS)
+    fallas = []
+    if matriculados > args.cupo:
+        fallas.append(f"{matriculados} matriculados en un curso de cupo {args.cupo}")
+    if matriculados < args.cupo and esperando:
+        fallas.append(f"{args.cupo - matriculados} cupos libres con {esperando} estudiantes en espera")
+    # Los cupos liberados son primero de la lista de espera.
+    directos_posibles = max(0, args.cupo // 2 - len(en_espera))
+    if estados["POST 201"] > directos_posibles:
+        fallas.append(f"{estados['POST 201']} matrículas directas con estudiantes en espera (máximo {directos_posibles})")
+    promovidos = len(en_espera) - esperando
+    return _resultado("espera", estados, latencias, segundos, fallas, cupo=args.cupo, matriculados=matriculados, promovidos=promovidos)
+
+
+ESCENARIOS = {"cupo": escenario_cupo, "creditos": escenario_creditos, "mixto": escenario_mixto, "espera": escenario_espera}
+
+
+async def _ejecutar(transporte_o_url, args) -> List[dict]:
+    opciones = {"limits": httpx.Limits(max_connections=None), "timeout": None}
+    if isinstance(transporte_o_url, str):
+        opciones["base_url"] = transporte_o_url
+    else:
+        opciones.update(transport=transporte_o_url, base_url="http://estres")
+    resultados = []
+    async with httpx.AsyncClient(**opciones) as cliente:
+        for nombre in args.escenarios.split(","):
+            prueba = Prueba(cliente, args.concurrencia)
+            resultado = await ESCENARIOS[nombre](prueba, args)
+            resultados.append(resultado)
+            print(
+                f"{nombre:<9} {'OK   ' if resultado['correcto'] else 'FALLA'} {resultado['peticiones']:>5} peticiones en"
+                f" {resultado['segundos']} s | p50 {resultado['p50_ms']} ms | p99 {resultado['p99_ms']} ms"
+                f" | estados {resultado['estados']}",
+                flush=True,
+            )
+            for falla in resultado["fallas"]:
+                print(f"          {falla}", flush=True)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudiantes", type=int, default=500, help="Estudiantes que compiten en los escenarios cupo y mixto.")
+    parser.add_argument("--cupo", type=int, default=50)
+    parser.add_argument("--concurrencia", type=int, default=500, help="Peticiones en vuelo a la vez.")
+    parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+    parser.add_argument("--modo", choices=("sync", "async"), default="sync", help="DB_MODO de la aplicación en proceso.")
+    parser.add_argument("--url", help="URL de un servidor ya levantado; por defecto la aplicación corre en este proceso.")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+    desconocidos = set(args.escenarios.split(",")) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    directorio = None
+    if args.url:
+        resultados = asyncio.run(_ejecutar(args.url, args))
+    else:
+        directorio = tempfile.mkdtemp(prefix="universidad-estres-")
+        # La configuración se lee al importar la aplicación: hay que fijarla antes.
+        os.environ.update({
+            "DATABASE_URL": f"sqlite:///{os.path.join(directorio, 'universidad.db')}",
+            "DB_MODO": args.modo,
+            "MIGRAR_AL_INICIAR": "true",
+            "LOG_LEVEL": "WARNING",
+            "METRICAS_UMBRAL_LENTO_MS": str(10**9),
+        })
+        try:
+            import main as aplicacion
+            aplicacion.on_startup()
+            transporte = httpx.ASGITransport(app=aplicacion.app, raise_app_exceptions=False)
+            resultados = asyncio.run(_ejecutar(transporte, args))
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+    sys.exit(0 if all(resultado["correcto"] for resultado in resultados) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Mide cada consulta de la capa de acceso a datos (crud.py) directamente, sin HTTP.
+
+Siembra una base temporal con datos sintéticos (ver benchmarks/datos.py) y ejecuta cada
+consulta con claves al azar a través de la misma sesión que usan los endpoints según
+DB_MODO (database.sesion_independiente). Además compara:
+
+- las sentencias ya armadas de crud.py con armar la misma consulta en cada llamada, como
+  hacían antes los routers;
+- las variantes por lotes con una consulta por clave (estudiantes por cédula y estudiantes
+  matriculados de varios cursos).
+
+    python -m benchmarks.consultas
+    python -m benchmarks.consultas --modo async --repeticiones 5000 --salida consultas.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from benchmarks import datos
+
+
+def _percentil(ordenadas: List[float], p: float) -> float:
+    return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+
+async def _medir(nombre: str, repeticiones: int, llamada: Callable[[random.Random], Awaitable[object]]) -> dict:
+    azar = random.Random(7)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await llamada(azar)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    total = sum(tiempos)
+    resultado = {
+        "consulta": nombre,
+        "repeticiones": repeticiones,
+        "por_segundo": round(repeticiones / total, 1),
+        "p50_us": round(_percentil(tiempos, 0.5) * 1e6, 1),
+        "p99_us": round(_percentil(tiempos, 0.99) * 1e6, 1),
+    }
+    print(f"{nombre:<44} {resultado['por_segundo']:>10.1f}/s | p50 {resultado['p50_us']:>8.1f} us | p99 {resultado['p99_us']:>8.1f} us", flush=True)
+    return resultado
+
+
+async def _ejecutar(args) -> List[dict]:
+    from sqlmodel import select
+
+    import crud
+    from database import sesion_independiente
+    from models import Estudiante, EstudianteRead, Matricula
+    from serializacion import columnas, como_dicts
+
+    cedula = lambda azar: datos.cedula(azar.randrange(args.estudiantes))
+    codigo = lambda azar: datos.codigo(azar.randrange(args.cursos))
+    matriculada = lambda azar: (lambda e: (datos.cedula(e), datos.codigo(datos.curso_de_matricula(e, 0, args.cursos))))(azar.randrange(args.estudiantes))
+    n, lote = args.repeticiones, args.lote
+
+    async def estudiantes_de_curso_armada(session, c: str):
+        statement = (
+            select(*columnas(EstudianteRead, Estudiante))
+            .join(Matricula)
+            .where(Matricula.curso_codigo == c)
+            .order_by(Matricula.estudiante_cedula)
+        )
+        return como_dicts((await session.exec(statement)).all())
+
+    async def estudiantes_uno_a_uno(session, cedulas):
+        return [await crud.estudiante(session, c) for c in cedulas]
+
+    async def rosters_uno_a_uno(session, codigos):
+        return {c: await crud.estudiantes_de_curso(session, c) for c in codigos}
+
+    resultados = []
+    async with sesion_independiente() as session:
+        consultas = [
+            ("estudiante", n, lambda azar: crud.estudiante(session, cedula(azar))),
+            ("existe_estudiante", n, lambda azar: crud.existe_estudiante(session, cedula(azar))),
+            ("existe_matricula", n, lambda azar: crud.existe_matricula(session, *matriculada(azar))),
+            ("estudiante_con_cursos", n, lambda azar: crud.estudiante_con_cursos(session, cedula(azar))),
+            ("curso_con_estudiantes", n, lambda azar: crud.curso_con_estudiantes(session, codigo(azar))),
+            ("estudiantes_de_curso", n, lambda azar: crud.estudiantes_de_curso(session, codigo(azar))),
+            ("estudiantes_de_curso (armada por llamada)", n, lambda azar: estudiantes_de_curso_armada(session, codigo(azar))),
+            ("curso_en_conflicto", n, lambda azar: crud.curso_en_conflicto(session, cedula(azar), codigo(azar), datos.horario(azar.randrange(args.cursos)))),
+            (f"estudiantes_por_cedula ({lote} claves)", max(1, n // lote), lambda azar: crud.estudiantes_por_cedula(session, [cedula(azar) for _ in range(lote)])),
+            (f"estudiante x {lote} (una consulta por clave)", max(1, n // lote), lambda azar: estudiantes_uno_a_uno(session, [cedula(azar) for _ in range(lote)])),
+            (f"estudiantes_de_cursos ({args.cursos_por_lote} cursos)", max(1, n // lote), lambda azar: crud.estudiantes_de_cursos(session, [codigo(azar) for _ in range(args.cursos_por_lote)])),
+            (f"estudiantes_de_curso x {args.cursos_por_lote}", max(1, n // lote), lambda azar: rosters_uno_a_uno(session, [codigo(azar) for _ in range(args.cursos_por_lote)])),
+        ]
+        for nombre, repeticiones, llamada in consultas:
+            resultados.append(await _medir(nombre, repeticiones, llamada))
+    return resultados
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mide las consultas de crud.py sobre datos sintéticos.")
+    parser.add_argument("--estudiantes", type=int, default=20000)
+    parser.add_argument("--cursos", type=int, default=500)
+    parser.add_argument("--matriculas-por-estudiante", type=int, default=5)
+    parser.add_argument("--repeticiones", type=int, default=2000)
+    parser.add_argument("--lote", type=int, default=200, help="Claves por llamada en las variantes por lotes.")
+    parser.add_argument("--cursos-por-lote", type=int, default=20)
+    parser.add_argument("--modo", choices=("sync", "async"), default="sync")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix="universidad-consultas-")
+    # La configuración se lee al importar database: hay que fijarla antes.
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directorio, 'universidad.db')}",
+        "DB_MODO": args.modo,
+        "LOG_LEVEL": "WARNING",
+    })
+    try:
+        sembrado = datos.sembrar(os.environ["DATABASE_URL"], args.estudiantes, args.cursos, args.matriculas_por_estudiante)
+        print(f"Base sembrada en {sembrado['segundos']} s ({args.modo}).", flush=True)
+        resultados = asyncio.run(_ejecutar(args))
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump({"parametros": vars(args), "resultados": resultados}, archivo, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
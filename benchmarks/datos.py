@@ -0,0 +1,101 @@
+"""
+Datos sintéticos y reproducibles para los benchmarks.
+
+Los identificadores siguen un patrón fijo para que los escenarios puedan elegir
+estudiantes, cursos y matrículas existentes sin consultar la base de datos:
+
+    estudiante e  -> cédula  "BE" + e con 7 dígitos
+    curso c       -> código  "BC" + c con 5 dígitos
+    matrícula k del estudiante e -> curso (e * 7 + k) % cursos
+"""
+import random
+import time
+from typing import Iterable, Iterator, List
+
+TAMANO_LOTE = 20000
+DIAS_LECTIVOS = ("Lun", "Mar", "Mie", "Jue", "Vie")
+
+
+def cedula(e: int) -> str:
+    return f"BE{e:07d}"
+
+
+def codigo(c: int) -> str:
+    return f"BC{c:05d}"
+
+
+def curso_de_matricula(e: int, k: int, cursos: int) -> int:
+    return (e * 7 + k) % cursos
+
+
+def horario(c: int) -> str:
+    inicio = 7 + 2 * (c // len(DIAS_LECTIVOS) % 7)
+    return f"{DIAS_LECTIVOS[c % len(DIAS_LECTIVOS)]} {inicio}-{inicio + 2}"
+
+
+def _en_lotes(filas: Iterable[dict], tamano: int = TAMANO_LOTE) -> Iterator[List[dict]]:
+    lote: List[dict] = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _insertar(session, modelo, filas: Iterable[dict]) -> int:
+    from sqlmodel import insert
+
+    total = 0
+    for lote in _en_lotes(filas):
+        session.exec(insert(modelo).prefix_with("OR IGNORE", dialect="sqlite"), params=lote)
+        total += len(lote)
+    return total
+
+
+def sembrar(url: str, estudiantes: int, cursos: int, matriculas_por_estudiante: int, semilla: int = 42) -> dict:
+    """
+    Aplica las migraciones y llena las tablas en lotes. Las filas que ya existen se conservan, así que
+    se puede volver a sembrar sobre la misma base.
+
+    Returns:
+        dict: Filas escritas por tabla y segundos empleados.
+    """
+    # La aplicación se importa aquí y no al cargar el módulo: config.py lee las variables
+    # de entorno al importarse, y quien use solo los identificadores puede fijarlas antes.
+    from sqlmodel import Session
+
+    import agendas
+    import horarios
+    import migraciones
+    from config import settings
+    from database import crear_engine
+    from models import Curso, Estudiante, Matricula
+
+    if matriculas_por_estudiante > cursos:
+        raise ValueError("No puede haber más matrículas por estudiante que cursos.")
+    azar = random.Random(semilla)
+    inicio = time.perf_counter()
+    engine = crear_engine(settings, url=url)
+    migraciones.migrar(engine)
+    with Session(engine) as session:
+        filas = {
+            "cursos": _insertar(session, Curso, (
+                {"codigo": codigo(c), "nombre": f"Curso sintético {c:05d}", "creditos": 1 + c % 5, "horario": horario(c)}
+                for c in range(cursos)
+            )),
+            "estudiantes": _insertar(session, Estudiante, (
+                {"cedula": cedula(e), "nombre": f"Estudiante {e}", "email": f"be{e}@bench.co", "semestre": azar.randint(1, 12)}
+                for e in range(estudiantes)
+            )),
+            "matriculas": _insertar(session, Matricula, (
+                {"estudiante_cedula": cedula(e), "curso_codigo": codigo(curso_de_matricula(e, k, cursos))}
+                for e in range(estudiantes) for k in range(matriculas_por_estudiante)
+            )),
+        }
+        session.commit()
+    filas["cursos_con_franjas"] = horarios.migrar_horarios(engine)
+    filas["agendas"] = agendas.reconstruir(engine)
+    engine.dispose()
+    return {**filas, "segundos": round(time.perf_counter() - inicio, 2)}
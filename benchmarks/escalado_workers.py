@@ -0,0 +1,213 @@
+"""
+Mide cómo escala el throughput con la cantidad de workers de `python -m servidor` sobre
+SQLite en modo WAL.
+
+Siembra una base temporal (ver benchmarks/datos.py) y, para cada cantidad de workers, levanta
+el servidor sobre una copia nueva de esa base, espera a que todos los workers terminen de
+iniciar y calentarse, y lanza la mezcla de modo_sesion.py (45% detalle de curso, 45% detalle
+de estudiante y el resto matrículas) desde varios procesos cliente, para que el cliente no
+sea el cuello de botella. Informa peticiones por segundo, latencias y el escalado respecto
+de un worker.
+
+    python -m benchmarks.escalado_workers
+    python -m benchmarks.escalado_workers --workers 1 2 4 8 --clientes 4 --escrituras 0.2 --salida escalado.json
+
+Los clientes corren en la misma máquina que el servidor y le quitan núcleos: con pocos
+núcleos conviene mirar la latencia además del throughput. Las lecturas escalan con los
+workers hasta los núcleos disponibles; las escrituras no, porque SQLite admite un solo
+escritor para todos los procesos.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import httpx
+
+from benchmarks import datos
+
+INICIO_COMPLETO = "Application startup complete."
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _cantidades_por_defecto() -> List[int]:
+    nucleos = os.cpu_count() or 1
+    cantidades, n = [], 1
+    while n < nucleos:
+        cantidades.append(n)
+        n *= 2
+    return cantidades + [nucleos]
+
+
+def _copiar_base(origen: str, destino: str):
+    for archivo in glob.glob(origen + "*"):
+        shutil.copy(archivo, destino + archivo[len(origen):])
+
+
+def _percentil(ordenadas: List[float], p: float) -> float:
+    return round(ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))] * 1000, 2)
+
+
+class Servidor:
+    """
+    `python -m servidor` en un subproceso. Lee su log para saber cuándo terminaron de iniciar
+    todos los workers.
+    """
+
+    def __init__(self, workers: int, url: str, modo: str):
+        self.workers = workers
+        self.base = f"http://127.0.0.1:{_puerto_libre()}"
+        self._iniciados = 0
+        self._listos = threading.Event()
+        entorno = {**os.environ, "DATABASE_URL": url, "DB_MODO": modo, "LOG_LEVEL": "INFO"}
+        self.proceso = subprocess.Popen(
+            [sys.executable, "-m", "servidor", "--port", self.base.rsplit(":", 1)[1],
+             "--workers", str(workers), "--sin-registro-accesos"],
+            env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        threading.Thread(target=self._leer_log, daemon=True).start()
+
+    def _leer_log(self):
+        for linea in self.proceso.stderr:
+            if INICIO_COMPLETO in linea:
+                self._iniciados += 1
+                if self._iniciados >= self.workers:
+                    self._listos.set()
+
+    def esperar(self, segundos: float = 60):
+        fin = time.monotonic() + segundos
+        while not self._listos.wait(0.1):
+            if self.proceso.poll() is not None:
+                raise RuntimeError("El servidor terminó antes de estar listo.")
+            if time.monotonic() > fin:
+                raise RuntimeError("Los workers no terminaron de iniciar a tiempo.")
+
+    def detener(self):
+        self.proceso.terminate()
+        self.proceso.wait(timeout=60)
+
+
+async def _cargar(base: str, concurrencia: int, segundos: float, estudiantes: int, cursos: int, escrituras: float, semilla: int) -> Tuple[List[float], int]:
+    latencias: List[float] = []
+    errores = 0
+    fin = time.perf_counter() + segundos
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=30) as client:
+        async def trabajador(numero: int):
+            nonlocal errores
+            azar = random.Random(semilla * 1000 + numero)
+            while time.perf_counter() < fin:
+                tipo = azar.random()
+                if tipo < escrituras:
+                    codigo = datos.codigo(azar.randrange(cursos))
+                    peticion = client.post(f"/cursos/{codigo}/estudiantes/", json={
+                        "estudiante_cedula": datos.cedula(azar.randrange(estudiantes)), "curso_codigo": codigo
+                    })
+                elif tipo < escrituras + (1 - escrituras) / 2:
+                    peticion = client.get(f"/cursos/{datos.codigo(azar.randrange(cursos))}/")
+                else:
+                    peticion = client.get(f"/estudiantes/{datos.cedula(azar.randrange(estudiantes))}/")
+                inicio = time.perf_counter()
+                respuesta = await peticion
+                latencias.append(time.perf_counter() - inicio)
+                if respuesta.status_code >= 500:
+                    errores += 1
+
+        await asyncio.gather(*(trabajador(i) for i in range(concurrencia)))
+    return latencias, errores
+
+
+def _cliente(base: str, concurrencia: int, segundos: float, estudiantes: int, cursos: int, escrituras: float, semilla: int) -> Tuple[List[float], int]:
+    return asyncio.run(_cargar(base, concurrencia, segundos, estudiantes, cursos, escrituras, semilla))
+
+
+def medir(workers: int, url: str, args) -> dict:
+    servidor = Servidor(workers, url, args.modo)
+    try:
+        inicio = time.perf_counter()
+        servidor.esperar()
+        arranque = time.perf_counter() - inicio
+        concurrencia = max(1, args.concurrencia // args.clientes)
+        with ProcessPoolExecutor(max_workers=args.clientes) as clientes:
+            resultados = list(clientes.map(
+                _cliente,
+                *zip(*[(servidor.base, concurrencia, args.segundos, args.estudiantes, args.cursos, args.escrituras, semilla)
+                       for semilla in range(args.clientes)]),
+            ))
+    finally:
+        servidor.detener()
+
+    latencias = sorted(latencia for parciales, _ in resultados for latencia in parciales)
+    return {
+        "workers": workers,
+        "arranque_segundos": round(arranque, 2),
+        "peticiones": len(latencias),
+        "errores_5xx": sum(errores for _, errores in resultados),
+        "peticiones_por_segundo": round(len(latencias) / args.segundos, 1),
+        "p50_ms": _percentil(latencias, 0.50),
+        "p95_ms": _percentil(latencias, 0.95),
+        "p99_ms": _percentil(latencias, 0.99),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=_cantidades_por_defecto(),
+                        help="Cantidades de workers a medir (por defecto potencias de 2 hasta los núcleos).")
+    parser.add_argument("--estudiantes", type=int, default=5000)
+    parser.add_argument("--cursos", type=int, default=200)
+    parser.add_argument("--matriculas-por-estudiante", type=int, default=4)
+    parser.add_argument("--concurrencia", type=int, default=64, help="Peticiones simultáneas entre todos los clientes.")
+    parser.add_argument("--clientes", type=int, default=max(1, min(4, (os.cpu_count() or 1) // 2)),
+                        help="Procesos que generan la carga.")
+    parser.add_argument("--escrituras", type=float, default=0.1, help="Fracción de peticiones que son matrículas.")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--modo", choices=("sync", "async"), default="sync")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="universidad-escalado-") as directorio:
+        semilla = os.path.join(directorio, "semilla.db")
+        sembrado = datos.sembrar(f"sqlite:///{semilla}", args.estudiantes, args.cursos, args.matriculas_por_estudiante)
+        print(f"Base sembrada en {sembrado['segundos']} s; {os.cpu_count()} núcleos, {args.clientes} procesos cliente.", flush=True)
+        for workers in args.workers:
+            base = os.path.join(directorio, f"workers-{workers}.db")
+            _copiar_base(semilla, base)
+            resultado = medir(workers, f"sqlite:///{base}", args)
+            resultado["escalado"] = round(resultado["peticiones_por_segundo"] / resultados[0]["peticiones_por_segundo"], 2) if resultados else 1.0
+            resultados.append(resultado)
+            print(
+                f"{workers:>3} workers | {resultado['peticiones_por_segundo']:>8} pet/s (x{resultado['escalado']})"
+                f" | p50 {resultado['p50_ms']} ms | p99 {resultado['p99_ms']} ms"
+                f" | 5xx: {resultado['errores_5xx']} | arranque {resultado['arranque_segundos']} s",
+                flush=True,
+            )
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump({"parametros": vars(args), "nucleos": os.cpu_count(), "resultados": resultados}, archivo, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
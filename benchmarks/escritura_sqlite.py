@@ -0,0 +1,86 @@
+"""
+Compara el rendimiento de escritura de SQLite con los PRAGMAs por defecto y con
+los ajustes de producción de database.py (WAL, synchronous=NORMAL, busy_timeout...).
+
+Cada escritura es una transacción independiente de una fila, igual que un POST de la API.
+
+    python -m benchmarks.escritura_sqlite --escrituras 2000 --hilos 8
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel
+
+from config import settings
+from database import crear_engine
+from models import Estudiante
+
+
+def _escribir(engine, inicio: int, cantidad: int) -> int:
+    errores = 0
+    for i in range(inicio, inicio + cantidad):
+        try:
+            with Session(engine) as session:
+                session.add(Estudiante(cedula=f"B{i:09d}", nombre="Estudiante de prueba", email=f"b{i}@bench.co", semestre=1 + i % 12))
+                session.commit()
+        except OperationalError:
+            errores += 1
+    return errores
+
+
+def medir(ajustar_sqlite: bool, escrituras: int, hilos: int) -> dict:
+    """
+    Ejecuta `escrituras` transacciones repartidas entre `hilos` sobre una base temporal.
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        url = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+        engine = crear_engine(settings, url=url, ajustar_sqlite=ajustar_sqlite)
+        SQLModel.metadata.create_all(engine)
+
+        por_hilo = escrituras // hilos
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            errores = sum(pool.map(lambda h: _escribir(engine, h * por_hilo, por_hilo), range(hilos)))
+        duracion = time.perf_counter() - inicio
+        engine.dispose()
+
+    realizadas = por_hilo * hilos - errores
+    return {
+        "modo": "ajustado" if ajustar_sqlite else "por defecto",
+        "hilos": hilos,
+        "escrituras": realizadas,
+        "errores_bloqueo": errores,
+        "segundos": round(duracion, 3),
+        "escrituras_por_segundo": round(realizadas / duracion, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escrituras", type=int, default=2000)
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    resultados = []
+    for hilos in sorted({1, args.hilos}):
+        for ajustar in (False, True):
+            resultado = medir(ajustar, args.escrituras, hilos)
+            resultados.append(resultado)
+            print(
+                f"{resultado['modo']:>12} | hilos={hilos:<3} | {resultado['escrituras_por_segundo']:>9} escrituras/s"
+                f" | errores de bloqueo: {resultado['errores_bloqueo']}"
+            )
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
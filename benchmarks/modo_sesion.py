@@ -0,0 +1,132 @@
+"""
+Compara el modo síncrono y el asíncrono de la capa de sesiones (DB_MODO=sync|async).
+
+Para cada modo levanta `uvicorn main:app` en un subproceso sobre la misma base temporal
+y lanza peticiones concurrentes de lectura y matrícula, midiendo el throughput y la latencia.
+
+    python -m benchmarks.modo_sesion --concurrencia 64 --segundos 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.datos import sembrar
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _esperar_servidor(base: str, proceso: subprocess.Popen):
+    async with httpx.AsyncClient() as client:
+        for _ in range(200):
+            if proceso.poll() is not None:
+                raise RuntimeError("El servidor terminó antes de estar listo.")
+            try:
+                await client.get(base + "/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.05)
+    raise RuntimeError("El servidor no respondió a tiempo.")
+
+
+async def _cargar(base: str, concurrencia: int, segundos: float, estudiantes: int, cursos: int) -> dict:
+    latencias = []
+    errores = 0
+    fin = time.perf_counter() + segundos
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=30) as client:
+        async def trabajador(semilla: int):
+            nonlocal errores
+            azar = random.Random(semilla)
+            while time.perf_counter() < fin:
+                tipo = azar.random()
+                if tipo < 0.45:
+                    peticion = client.get(f"/cursos/BC{azar.randrange(cursos):05d}/")
+                elif tipo < 0.9:
+                    peticion = client.get(f"/estudiantes/BE{azar.randrange(estudiantes):07d}/")
+                else:
+                    codigo = f"BC{azar.randrange(cursos):05d}"
+                    peticion = client.post(f"/cursos/{codigo}/estudiantes/", json={
+                        "estudiante_cedula": f"BE{azar.randrange(estudiantes):07d}", "curso_codigo": codigo
+                    })
+                inicio = time.perf_counter()
+                respuesta = await peticion
+                latencias.append(time.perf_counter() - inicio)
+                if respuesta.status_code >= 500:
+                    errores += 1
+
+        await asyncio.gather(*(trabajador(i) for i in range(concurrencia)))
+
+    latencias.sort()
+    percentil = lambda p: round(latencias[min(len(latencias) - 1, int(p * len(latencias)))] * 1000, 2)
+    return {
+        "peticiones": len(latencias),
+        "errores_5xx": errores,
+        "peticiones_por_segundo": round(len(latencias) / segundos, 1),
+        "p50_ms": percentil(0.50),
+        "p95_ms": percentil(0.95),
+        "p99_ms": percentil(0.99),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 2),
+    }
+
+
+def medir_modo(modo: str, url: str, args) -> dict:
+    puerto = _puerto_libre()
+    base = f"http://127.0.0.1:{puerto}"
+    entorno = {**os.environ, "DB_MODO": modo, "DATABASE_URL": url, "LOG_LEVEL": "WARNING"}
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto), "--log-level", "warning", "--no-access-log"],
+        env=entorno,
+    )
+    try:
+        asyncio.run(_esperar_servidor(base, proceso))
+        resultado = asyncio.run(_cargar(base, args.concurrencia, args.segundos, args.estudiantes, args.cursos))
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+    return {"modo": modo, "concurrencia": args.concurrencia, **resultado}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--estudiantes", type=int, default=5000)
+    parser.add_argument("--cursos", type=int, default=200)
+    parser.add_argument("--matriculas-por-estudiante", type=int, default=4)
+    parser.add_argument("--concurrencia", type=int, default=64)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as directorio:
+        url = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+        sembrar(url, args.estudiantes, args.cursos, args.matriculas_por_estudiante)
+        for modo in ("sync", "async"):
+            resultado = medir_modo(modo, url, args)
+            resultados.append(resultado)
+            print(
+                f"{modo:>5} | {resultado['peticiones_por_segundo']:>8} pet/s | p50 {resultado['p50_ms']} ms"
+                f" | p95 {resultado['p95_ms']} ms | p99 {resultado['p99_ms']} ms | 5xx: {resultado['errores_5xx']}"
+            )
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
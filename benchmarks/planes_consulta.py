@@ -0,0 +1,148 @@
+"""
+Comprueba los planes de ejecución (EXPLAIN QUERY PLAN de SQLite) de las consultas de las
+rutas frecuentes de la API: ninguna debe recorrer una tabla entera.
+
+Siembra una base temporal con datos sintéticos (ver benchmarks/datos.py), hace una petición
+a cada ruta de RUTAS_FRECUENTES a través de la aplicación ASGI, captura las sentencias
+SELECT que ejecuta y pide su plan. Un SCAN sobre una tabla del modelo (con o sin índice) es
+un fallo; los de tablas virtuales FTS5 y subconsultas materializadas no lo son. Los
+listados completos y la exportación recorren la tabla a propósito y no están en la lista.
+
+La misma comprobación corre con pytest en tests/test_planes_consulta.py, junto con las
+páginas siguientes de los listados; este script la repite sobre bases más grandes y con
+--detalle muestra los planes. Termina con código 1 si alguna consulta recorre una tabla:
+
+    python -m benchmarks.planes_consulta
+    python -m benchmarks.planes_consulta --estudiantes 20000 --detalle
+"""
+import argparse
+import contextvars
+import os
+import re
+import shutil
+import sys
+import tempfile
+from typing import Callable, List, Optional, Tuple
+
+from benchmarks import datos
+
+Peticion = Tuple[str, str, dict]
+
+# (nombre, petición). Los identificadores son de los datos sembrados.
+RUTAS_FRECUENTES: List[Tuple[str, Callable[[], Peticion]]] = [
+    ("estudiantes.listar_semestre", lambda: ("GET", "/estudiantes/?semestre=3&limit=100", {})),
+    ("estudiantes.detalle", lambda: ("GET", f"/estudiantes/{datos.cedula(7)}/", {})),
+    ("estudiantes.cursos", lambda: ("GET", f"/estudiantes/{datos.cedula(7)}/cursos/", {})),
+    ("estudiantes.horario", lambda: ("GET", f"/estudiantes/{datos.cedula(7)}/horario/", {})),
+    ("estudiantes.planes", lambda: ("GET", f"/estudiantes/{datos.cedula(7)}/planes/?" + "&".join(f"codigo={datos.codigo(i)}" for i in range(12)), {})),
+    ("estudiantes.actualizar", lambda: ("PATCH", f"/estudiantes/{datos.cedula(8)}/", {"json": {"nombre": "Renombrado"}})),
+    ("cursos.listar_creditos", lambda: ("GET", "/cursos/?creditos=3&limit=100", {})),
+    ("cursos.buscar_codigo", lambda: ("GET", f"/cursos/?codigo={datos.codigo(5).lower()}", {})),
+    ("cursos.detalle", lambda: ("GET", f"/cursos/{datos.codigo(5)}/", {})),
+    ("cursos.estudiantes", lambda: ("GET", f"/cursos/{datos.codigo(5)}/estudiantes/", {})),
+    ("cursos.estudiantes_varios", lambda: ("GET", f"/cursos/estudiantes/?codigo={datos.codigo(5)}&codigo={datos.codigo(8)}", {})),
+    ("cursos.lista_espera", lambda: ("GET", f"/cursos/{datos.codigo(5)}/lista-espera/", {})),
+    ("cursos.matricular", lambda: ("POST", f"/cursos/{datos.codigo(6)}/estudiantes/", {"json": {"estudiante_cedula": datos.cedula(9), "curso_codigo": datos.codigo(6)}})),
+    ("matriculas.desmatricular", lambda: ("DELETE", "/matriculas/", {"json": {"estudiante_cedula": datos.cedula(9), "curso_codigo": datos.codigo(6)}})),
+    ("buscar", lambda: ("GET", "/buscar/?q=Estudiante 12", {})),
+    ("cambios.desde", lambda: ("GET", "/cambios/?desde=1", {})),
+    ("cambios.curso", lambda: ("GET", f"/cambios/?desde=1&curso={datos.codigo(6)}", {})),
+    ("estudiantes.eliminar", lambda: ("DELETE", f"/estudiantes/{datos.cedula(10)}/", {})),
+    ("cursos.eliminar", lambda: ("DELETE", f"/cursos/{datos.codigo(11)}/", {})),
+]
+
+_SCAN = re.compile(r"SCAN (\S+)")
+
+# Sentencias SELECT de la petición en curso (los hilos del threadpool copian el contexto,
+# así que las ven; la tarea del promotor de listas de espera no).
+_peticion_actual: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("peticion_actual", default=None)
+
+
+def recorridos(plan: List[str], tablas: set) -> List[str]:
+    """
+    Pasos del plan que recorren una tabla del modelo. Las tablas de un joinedload llevan
+    un alias con sufijo numérico (curso_1).
+    """
+    malos = []
+    for paso in plan:
+        coincidencia = _SCAN.match(paso)
+        if coincidencia and re.sub(r"_\d+$", "", coincidencia.group(1)) in tablas:
+            malos.append(paso)
+    return malos
+
+
+def _capturar(aplicacion, capturas: List[list]):
+    """
+    Envuelve la aplicación ASGI: cada petición HTTP agrega a `capturas` la lista de las
+    sentencias que ejecuta.
+    """
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return await aplicacion(scope, receive, send)
+        capturas.append([])
+        token = _peticion_actual.set(capturas[-1])
+        try:
+            await aplicacion(scope, receive, send)
+        finally:
+            _peticion_actual.reset(token)
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Comprueba que las consultas frecuentes no recorran tablas enteras.")
+    parser.add_argument("--estudiantes", type=int, default=5000)
+    parser.add_argument("--cursos", type=int, default=200)
+    parser.add_argument("--matriculas-por-estudiante", type=int, default=5)
+    parser.add_argument("--detalle", action="store_true", help="Muestra el plan de todas las consultas.")
+    args = parser.parse_args(argv)
+
+    directorio = tempfile.mkdtemp(prefix="universidad-planes-")
+    # La configuración se lee al importar la aplicación: hay que fijarla antes.
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directorio, 'universidad.db')}",
+        "DB_MODO": "sync",
+        "LOG_LEVEL": "WARNING",
+        "METRICAS_UMBRAL_LENTO_MS": str(10**9),
+    })
+    try:
+        datos.sembrar(os.environ["DATABASE_URL"], args.estudiantes, args.cursos, args.matriculas_por_estudiante)
+
+        from fastapi.testclient import TestClient
+        from sqlalchemy import event
+        from sqlmodel import SQLModel
+
+        import database
+        import main as aplicacion
+
+        def anotar(conn, cursor, statement, parameters, context, executemany):
+            capturadas = _peticion_actual.get()
+            if capturadas is not None and statement.lstrip().upper().startswith("SELECT"):
+                capturadas.append((statement, parameters))
+
+        event.listen(database.engine, "before_cursor_execute", anotar)
+        tablas = set(SQLModel.metadata.tables)
+        capturas: List[list] = []
+        fallos = 0
+        with TestClient(_capturar(aplicacion.app, capturas)) as cliente, database.engine.connect() as connection:
+            for nombre, generar in RUTAS_FRECUENTES:
+                metodo, url, kwargs = generar()
+                respuesta = cliente.request(metodo, url, **kwargs)
+                consultas = capturas[-1]
+                print(f"{nombre:<28} {metodo} {url} -> {respuesta.status_code}, {len(consultas)} consultas")
+                for sql, parametros in consultas:
+                    plan = [fila[3] for fila in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parametros).all()]
+                    malos = recorridos(plan, tablas)
+                    fallos += bool(malos)
+                    if malos or args.detalle:
+                        print(f"    {'RECORRE TABLA' if malos else 'ok'}: {' '.join(sql.split())[:160]}")
+                        for paso in plan:
+                            print(f"        {paso}")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"\n{fallos} consultas recorren una tabla." if fallos else "\nNinguna consulta frecuente recorre una tabla.")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
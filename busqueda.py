@@ -0,0 +1,163 @@
+"""
+Búsqueda por texto sobre estudiantes (nombre y email) y cursos (código y nombre).
+
+En SQLite cada entidad tiene una tabla virtual FTS5 (`estudiante_fts`, `curso_fts`) que
+mantienen triggers sobre `estudiante` y `curso`: cualquier escritura (la API, la carga
+masiva o SQL directo) actualiza el índice en la misma transacción. El tokenizador
+`unicode61` ignora mayúsculas y tildes, así que "jose perez" encuentra a "José Pérez".
+
+Cada palabra buscada se trata como prefijo ("gon" encuentra "González" y "mat" a "MAT101")
+y los resultados se ordenan por relevancia (bm25), con más peso para el nombre del
+estudiante y el código del curso. Las escrituras pagan el índice: cada fila insertada
+también se tokeniza, lo que hace más lenta la carga masiva.
+
+Las tablas y los triggers se crean con una migración; si la tabla FTS no existía, se llena
+con las filas actuales. En otros motores no hay índice de texto y se filtra con
+ILIKE, que recorre la tabla.
+"""
+import logging
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, func, literal_column, table
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import select, true
+
+from database import engine
+from models import Curso, Estudiante
+
+logger = logging.getLogger("universidad.busqueda")
+
+MAX_PALABRAS = 8
+# bm25 se calcula para cada coincidencia: con un prefijo corto sobre un millón de filas
+# son decenas de miles. Se ordenan solo las primeras MAX_CANDIDATOS (en orden de inserción);
+# escribir más letras acota la búsqueda.
+MAX_CANDIDATOS = 1000
+
+# Prefijos de 2 y 3 letras indexados aparte: son los más frecuentes al escribir y los que
+# más términos abarcan.
+_OPCIONES_FTS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# tabla base -> (tabla FTS, clave, columnas buscables, pesos bm25 en el orden de las columnas)
+_INDICES = {
+    "estudiante": ("estudiante_fts", "cedula", ("nombre", "email"), (0.0, 10.0, 5.0)),
+    "curso": ("curso_fts", "codigo", ("nombre",), (10.0, 5.0)),
+}
+
+_PALABRA = re.compile(r"\w+")
+
+
+def _ddl(tabla: str) -> List[str]:
+    fts, clave, columnas, _ = _INDICES[tabla]
+    todas = ", ".join((clave,) + columnas)
+    nuevas = ", ".join(f"new.{nombre}" for nombre in (clave,) + columnas)
+    # La clave también se indexa en la tabla FTS para ubicar su fila sin recorrerla
+    # (MATCH por la columna); la igualdad descarta coincidencias parciales de la frase.
+    borrar = (
+        f"DELETE FROM {fts} WHERE rowid IN ("
+        f"SELECT rowid FROM {fts} WHERE {fts} MATCH '{clave} : \"' || replace(old.{clave}, '\"', '\"\"') || '\"'"
+        f") AND {clave} = old.{clave};"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({todas}, {_OPCIONES_FTS})",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insertar AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {fts} ({todas}) VALUES ({nuevas}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_eliminar AFTER DELETE ON {tabla} BEGIN {borrar} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_actualizar AFTER UPDATE OF {todas} ON {tabla} BEGIN "
+        f"{borrar} INSERT INTO {fts} ({todas}) VALUES ({nuevas}); END",
+    ]
+
+
+def usa_fts(engine_a_revisar: Engine = engine) -> bool:
+    return engine_a_revisar.dialect.name == "sqlite"
+
+
+def crear_indices(connection: Connection) -> bool:
+    """
+    Crea las tablas FTS y sus triggers si no existen, y llena las tablas recién creadas.
+    Fuera de SQLite no hace nada. Se aplica con la migración 3 (ver migraciones/).
+
+    Returns:
+        bool: True si la búsqueda usa FTS5.
+    """
+    if connection.dialect.name != "sqlite":
+        return False
+    for tabla, (fts, clave, columnas, _) in _INDICES.items():
+        existia = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).first() is not None
+        for sentencia in _ddl(tabla):
+            connection.exec_driver_sql(sentencia)
+        if not existia:
+            todas = ", ".join((clave,) + columnas)
+            filas = connection.exec_driver_sql(f"INSERT INTO {fts} ({todas}) SELECT {todas} FROM {tabla}").rowcount
+            logger.info("Índice de búsqueda %s creado con %s filas", fts, filas)
+    return True
+
+
+def expresion_fts(texto: str) -> Optional[str]:
+    """
+    Convierte el texto del usuario en una consulta FTS5: cada palabra, entre comillas (así
+    no se interpreta la sintaxis de FTS5) y como prefijo. Todas las palabras deben aparecer.
+    Devuelve None si el texto no tiene palabras.
+    """
+    palabras = _PALABRA.findall(texto)[:MAX_PALABRAS]
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+def _consulta_fts(modelo, tabla: str, consulta: str, limite: int):
+    fts, clave, columnas, pesos = _INDICES[tabla]
+    indice = table(fts, column(clave))
+    # Sin filtro de columnas la clave del estudiante (cédula) también sería buscable.
+    filtro = f"{{{' '.join(columnas)}}} : ({consulta})" if tabla == "estudiante" else consulta
+    candidatos = (
+        select(indice.c[clave], func.bm25(literal_column(fts), *pesos).label("relevancia"))
+        .where(literal_column(fts).op("MATCH")(filtro))
+        .limit(MAX_CANDIDATOS)
+        .subquery()
+    )
+    campo_clave = getattr(modelo, clave)
+    return (
+        select(modelo)
+        .join(candidatos, candidatos.c[clave] == campo_clave)
+        .where(modelo.activo == true())
+        .order_by(candidatos.c.relevancia, campo_clave)
+        .limit(limite)
+    )
+
+
+def _consulta_ilike(modelo, campos, texto: str, limite: int):
+    statement = select(modelo).where(modelo.activo == true())
+    for palabra in _PALABRA.findall(texto)[:MAX_PALABRAS]:
+        statement = statement.where(
+            campos[0].icontains(palabra, autoescape=True) | campos[1].icontains(palabra, autoescape=True)
+        )
+    return statement.order_by(campos[0]).limit(limite)
+
+
+def consulta_estudiantes(texto: str, limite: int):
+    """
+    Consulta de los estudiantes cuyo nombre o email contienen todas las palabras del texto
+    (como prefijos), de más a menos relevante. None si el texto no tiene palabras.
+    """
+    consulta = expresion_fts(texto)
+    if consulta is None:
+        return None
+    if usa_fts():
+        return _consulta_fts(Estudiante, "estudiante", consulta, limite)
+    return _consulta_ilike(Estudiante, (Estudiante.nombre, Estudiante.email), texto, limite)
+
+
+def consulta_cursos(texto: str, limite: int):
+    """
+    Consulta de los cursos cuyo código o nombre contienen todas las palabras del texto
+    (como prefijos), de más a menos relevante. None si el texto no tiene palabras.
+    """
+    consulta = expresion_fts(texto)
+    if consulta is None:
+        return None
+    if usa_fts():
+        return _consulta_fts(Curso, "curso", consulta, limite)
+    return _consulta_ilike(Curso, (Curso.codigo, Curso.nombre), texto, limite)
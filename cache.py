@@ -0,0 +1,231 @@
+"""
+Caché en memoria del proceso para las lecturas más frecuentes: el catálogo de cursos,
+el detalle de cursos y estudiantes y las listas de matriculados.
+
+Cada entrada tiene un TTL y el tamaño está acotado con desalojo LRU. Los endpoints que
+escriben invalidan de forma precisa las entradas afectadas justo después del commit.
+Las peticiones concurrentes que no encuentran la misma entrada comparten una sola carga
+(`obtener_o_cargar`), aunque la caché esté deshabilitada.
+La caché es local a cada proceso: con varios workers, la invalidación solo alcanza al
+worker que escribió. Por eso las lecturas con ETag guardan junto al cuerpo la versión del
+recurso con la que lo cargaron (ver etags.verificar_version): si otro worker ya la
+incrementó, la entrada se descarta y se vuelve a cargar, de modo que el cuerpo nunca es
+más viejo que el ETag que lo acompaña. Las entradas sin versión se ven como tarde al
+vencer el TTL.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from config import settings
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    """
+    Diccionario LRU con expiración por entrada y contadores de aciertos y fallos.
+
+    Para evitar guardar datos leídos antes de una invalidación concurrente, quien
+    llena la caché toma `generacion()` antes de consultar la base de datos y la pasa
+    a `guardar()`: si hubo una invalidación entre medio, el valor se descarta.
+
+    Con `version`, una entrada guardada con otra versión se trata como un fallo y se descarta.
+    """
+
+    def __init__(self, nombre: str, max_entradas: int, ttl_segundos: float, habilitada: bool = True):
+        self.nombre = nombre
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.habilitada = habilitada
+        self._entradas: "OrderedDict[Hashable, Tuple[float, Any, Optional[int]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generacion = 0
+        self._en_vuelo: Dict[Hashable, Tuple[int, Optional[int], asyncio.Future]] = {}
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.desactualizados = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+        self.coalescidas = 0
+
+    def generacion(self) -> int:
+        return self._generacion
+
+    def obtener(self, clave: Hashable, version: Optional[int] = None) -> Any:
+        """
+        Devuelve el valor guardado o `None` si no existe, expiró o se guardó con otra versión.
+        """
+        if not self.habilitada:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(clave, _AUSENTE)
+            if entrada is _AUSENTE:
+                self.fallos += 1
+                return None
+            vence, valor, version_guardada = entrada
+            if vence < time.monotonic():
+                del self._entradas[clave]
+                self.expirados += 1
+                self.fallos += 1
+                return None
+            if version is not None and version_guardada != version:
+                del self._entradas[clave]
+                self.desactualizados += 1
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave: Hashable, valor: Any, generacion: Optional[int] = None, version: Optional[int] = None):
+        if not self.habilitada:
+            return
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._entradas[clave] = (time.monotonic() + self.ttl_segundos, valor, version)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    async def obtener_o_cargar(self, clave: Hashable, cargar: Callable[[], Awaitable[Any]], version: Optional[int] = None) -> Any:
+        """
+        Devuelve el valor guardado o lo carga con `cargar()` y lo guarda. Si otra petición
+        del mismo bucle de eventos ya está cargando la misma clave (sin invalidaciones de por
+        medio y para la misma versión), espera su resultado, o su error, en lugar de repetir
+        la consulta.
+        """
+        valor = self.obtener(clave, version)
+        if valor is not None:
+            return valor
+        loop = asyncio.get_running_loop()
+        while True:
+            generacion = self.generacion()
+            en_vuelo = self._en_vuelo.get(clave)
+            if en_vuelo is None or en_vuelo[:2] != (generacion, version) or en_vuelo[2].get_loop() is not loop:
+                break
+            self.coalescidas += 1
+            try:
+                return await asyncio.shield(en_vuelo[2])
+            except asyncio.CancelledError:
+                # Si se canceló la petición que cargaba (el cliente se desconectó), esta
+                # vuelve a intentarlo; si se canceló esta, se propaga.
+                if not en_vuelo[2].cancelled():
+                    raise
+
+        futuro = loop.create_future()
+        self._en_vuelo[clave] = (generacion, version, futuro)
+        try:
+            valor = await cargar()
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as error:
+            futuro.set_exception(error)
+            futuro.exception()  # Sin peticiones esperando, no es un error sin atender.
+            raise
+        else:
+            futuro.set_result(valor)
+        finally:
+            if self._en_vuelo.get(clave, (None, None, None))[2] is futuro:
+                del self._en_vuelo[clave]
+        self.guardar(clave, valor, generacion, version)
+        return valor
+
+    def invalidar(self, *claves: Hashable):
+        with self._lock:
+            self._generacion += 1
+            for clave in claves:
+                if self._entradas.pop(clave, _AUSENTE) is not _AUSENTE:
+                    self.invalidaciones += 1
+
+    def invalidar_si(self, condicion: Callable[[Hashable], bool]):
+        with self._lock:
+            self._generacion += 1
+            for clave in [clave for clave in self._entradas if condicion(clave)]:
+                del self._entradas[clave]
+                self.invalidaciones += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self.invalidaciones += len(self._entradas)
+            self._entradas.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else None,
+                "expirados": self.expirados,
+                "desactualizados": self.desactualizados,
+                "desalojos": self.desalojos,
+                "invalidaciones": self.invalidaciones,
+                "coalescidas": self.coalescidas,
+            }
+
+
+# Claves de cache_cursos: ("detalle", codigo), ("estudiantes", codigo) y ("lista", filtros...).
+cache_cursos = CacheTTL("cursos", settings.cache_max_entradas, settings.cache_ttl_segundos, settings.cache_habilitada)
+# Claves de cache_estudiantes: ("detalle", cedula), ("cursos", cedula) y ("horario", cedula).
+cache_estudiantes = CacheTTL("estudiantes", settings.cache_max_entradas, settings.cache_ttl_segundos, settings.cache_habilitada)
+
+# Respuestas de las escrituras con Idempotency-Key (ver idempotencia.py); ninguna escritura las invalida.
+respuestas_idempotentes = CacheTTL("idempotencia", settings.idempotencia_max_entradas, settings.idempotencia_ttl_segundos)
+
+CACHES = (cache_cursos, cache_estudiantes, respuestas_idempotentes)
+
+
+def invalidar_listas_cursos():
+    """
+    Invalida los listados del catálogo (cualquier curso nuevo o modificado puede cambiarlos).
+    """
+    cache_cursos.invalidar_si(lambda clave: clave[0] == "lista")
+
+
+def invalidar_curso(codigo: str, cedulas: Iterable[str] = ()):
+    """
+    Invalida un curso modificado o eliminado, los listados del catálogo y las entradas
+    de los estudiantes matriculados (su detalle incluye los datos del curso).
+    """
+    cache_cursos.invalidar(("detalle", codigo), ("estudiantes", codigo))
+    invalidar_listas_cursos()
+    claves = [clave for cedula in cedulas for clave in (("detalle", cedula), ("cursos", cedula), ("horario", cedula))]
+    if claves:
+        cache_estudiantes.invalidar(*claves)
+
+
+def invalidar_estudiante(cedula: str, codigos: Iterable[str] = ()):
+    """
+    Invalida un estudiante modificado o eliminado y las entradas de los cursos en los que
+    está matriculado (su detalle y su lista de estudiantes lo incluyen).
+    """
+    cache_estudiantes.invalidar(("detalle", cedula), ("cursos", cedula), ("horario", cedula))
+    claves = [clave for codigo in codigos for clave in (("detalle", codigo), ("estudiantes", codigo))]
+    if claves:
+        cache_cursos.invalidar(*claves)
+
+
+def invalidar_matriculas(pares: Iterable[Tuple[str, str]]):
+    """
+    Invalida lo afectado por matricular o desmatricular pares (cédula, código).
+    """
+    pares = list(pares)
+    if not pares:
+        return
+    cache_estudiantes.invalidar(*[clave for cedula, _ in pares for clave in (("detalle", cedula), ("cursos", cedula), ("horario", cedula))])
+    cache_cursos.invalidar(*[clave for _, codigo in pares for clave in (("detalle", codigo), ("estudiantes", codigo))])
+
+
+def estadisticas() -> dict:
+    return {cache.nombre: cache.estadisticas() for cache in CACHES}
@@ -0,0 +1,291 @@
+"""
+Registro de cambios de cursos, estudiantes y matrículas, y su difusión por Server-Sent Events.
+
+Las escrituras agregan, en la misma transacción que el cambio, una fila a la tabla `cambio`
+(ver eventos.py). `seq` es creciente y, como SQLite serializa las escrituras, también sigue
+el orden de commit. Un cliente que ya leyó hasta `seq` pide GET /cambios/?desde=seq y recibe
+solo lo nuevo, en lugar de volver a descargar las listas completas.
+
+Para los tableros que miran llenarse los cursos, GET /cambios/eventos mantiene abierta una
+conexión SSE. Un único difusor por proceso lee los cambios nuevos y los reparte en memoria a
+todas las conexiones: la base recibe una consulta por commit o por intervalo de sondeo, no
+una por cliente. Los commits de este proceso despiertan al difusor de inmediato; los de
+otros procesos se ven en el siguiente sondeo (CAMBIOS_SONDEO_SEGUNDOS).
+
+Al iniciar se borran las entradas más antiguas que CAMBIOS_RETENCION_DIAS (siempre se
+conserva la última). Un cliente que pide desde una posición ya borrada recibe 410, o el
+evento `reinicio` en SSE, y debe volver a leer el estado completo.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set, Tuple
+
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, insert, select
+
+from config import settings
+from database import engine
+from models import Cambio, CambioRead
+from serializacion import columnas, como_dicts
+
+logger = logging.getLogger("universidad.cambios")
+
+CURSO_CREADO = "curso.creado"
+CURSO_MODIFICADO = "curso.modificado"
+CURSO_ELIMINADO = "curso.eliminado"
+CURSOS_IMPORTADOS = "cursos.importados"
+ESTUDIANTE_CREADO = "estudiante.creado"
+ESTUDIANTE_MODIFICADO = "estudiante.modificado"
+ESTUDIANTE_ELIMINADO = "estudiante.eliminado"
+ESTUDIANTES_IMPORTADOS = "estudiantes.importados"
+MATRICULA_CREADA = "matricula.creada"
+MATRICULA_ELIMINADA = "matricula.eliminada"
+
+TAMANO_LOTE = 500
+MAX_PENDIENTES_POR_CONEXION = 10000
+ESPERA_TRAS_ERROR_SEGUNDOS = 1.0
+
+# (tipo, código del curso, cédula del estudiante)
+EntradaCambio = Tuple[str, Optional[str], Optional[str]]
+
+
+def registrar(session: Session, entradas: Iterable[EntradaCambio]):
+    """
+    Agrega las entradas al registro, en la transacción de la sesión.
+    """
+    momento = datetime.now(timezone.utc)
+    filas = [
+        {"momento": momento, "tipo": tipo, "curso_codigo": codigo, "estudiante_cedula": cedula}
+        for tipo, codigo, cedula in entradas
+    ]
+    if filas:
+        session.exec(insert(Cambio), params=filas)
+
+
+def consulta_desde(desde: int, limite: int, curso: Optional[str] = None):
+    """
+    Cambios posteriores a `desde`, en orden, como columnas de CambioRead.
+    """
+    statement = select(*columnas(CambioRead, Cambio)).where(Cambio.seq > desde)
+    if curso is not None:
+        statement = statement.where(Cambio.curso_codigo == curso)
+    return statement.order_by(Cambio.seq).limit(limite)
+
+
+def consulta_primero():
+    return select(func.min(Cambio.seq))
+
+
+def perdido(desde: int, primero: Optional[int]) -> bool:
+    """
+    Indica si los cambios siguientes a `desde` ya se borraron del registro.
+    """
+    return desde > 0 and primero is not None and desde < primero - 1
+
+
+def _leer(desde: int, limite: int, curso: Optional[str] = None) -> List[dict]:
+    with Session(engine) as session:
+        return como_dicts(session.exec(consulta_desde(desde, limite, curso)).all())
+
+
+def _ultimo() -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.max(Cambio.seq))).one() or 0
+
+
+def _primero() -> Optional[int]:
+    with Session(engine) as session:
+        return session.exec(consulta_primero()).one()
+
+
+def formato_sse(cambio: dict) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (cambio["seq"], cambio["tipo"].encode("utf-8"), orjson.dumps(cambio))
+
+
+def purgar(engine_a_usar: Engine = engine) -> int:
+    """
+    Borra las entradas más antiguas que CAMBIOS_RETENCION_DIAS, salvo la última, que
+    permite reconocer después si un cliente pide desde una posición ya borrada.
+
+    Returns:
+        int: Cantidad de entradas borradas.
+    """
+    limite = datetime.now(timezone.utc) - timedelta(days=settings.cambios_retencion_dias)
+    with engine_a_usar.begin() as connection:
+        ultimo = connection.execute(select(func.max(Cambio.seq))).scalar()
+        if ultimo is None:
+            return 0
+        borradas = connection.execute(delete(Cambio).where(Cambio.momento < limite, Cambio.seq < ultimo)).rowcount
+    if borradas:
+        logger.info("Borradas %d entradas del registro de cambios.", borradas)
+    return borradas
+
+
+class Suscripcion:
+    """
+    Conexión SSE: recibe en `cola` los cambios del curso indicado (o todos). Un None en la
+    cola indica que la conexión se quedó atrás y debe cerrarse; el cliente se reconecta con
+    Last-Event-ID y se pone al día desde la base.
+    """
+
+    def __init__(self, curso: Optional[str]):
+        self.curso = curso
+        self.cola: asyncio.Queue = asyncio.Queue()
+
+    def recibe(self, cambio: dict) -> bool:
+        return self.curso is None or cambio["curso_codigo"] == self.curso
+
+
+class DifusorCambios:
+    """
+    Tarea en segundo plano que lee los cambios nuevos y los reparte a las suscripciones.
+    Corre solo mientras hay suscripciones.
+    """
+
+    def __init__(self):
+        self._suscripciones: Set[Suscripcion] = set()
+        self._tarea: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._despertar: Optional[asyncio.Event] = None
+        self._inicio: Optional[asyncio.Lock] = None
+        # Último `seq` repartido; None mientras la tarea no corre.
+        self.ultimo: Optional[int] = None
+        self.repartidos = 0
+
+    def _preparar(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._despertar = asyncio.Event()
+            self._inicio = asyncio.Lock()
+            self._suscripciones.clear()
+            self._tarea, self.ultimo = None, None
+
+    async def suscribir(self, curso: Optional[str] = None) -> Suscripcion:
+        """
+        Registra una suscripción. Al volver, toda entrada posterior a la última de la base
+        en ese momento llegará a su cola.
+        """
+        self._preparar()
+        suscripcion = Suscripcion(curso)
+        self._suscripciones.add(suscripcion)
+        async with self._inicio:
+            if self.ultimo is None:
+                self.ultimo = await run_in_threadpool(_ultimo)
+        if self._tarea is None or self._tarea.done():
+            self._tarea = self._loop.create_task(self._ejecutar(), name="difusor-cambios")
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion):
+        self._suscripciones.discard(suscripcion)
+        if not self._suscripciones and self._despertar is not None:
+            self._despertar.set()
+
+    def avisar(self):
+        """
+        Despierta al difusor. Se llama después de cada commit que registró cambios, desde
+        el bucle de eventos o desde un hilo del threadpool.
+        """
+        loop, despertar = self._loop, self._despertar
+        if loop is None or self._tarea is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(despertar.set)
+        except RuntimeError:
+            pass
+
+    async def _ejecutar(self):
+        while True:
+            if not self._suscripciones:
+                self._tarea, self.ultimo = None, None
+                return
+            try:
+                await asyncio.wait_for(self._despertar.wait(), settings.cambios_sondeo_segundos)
+            except asyncio.TimeoutError:
+                pass
+            self._despertar.clear()
+            if not self._suscripciones:
+                continue
+            try:
+                nuevos = await run_in_threadpool(_leer, self.ultimo, TAMANO_LOTE)
+            except Exception:
+                logger.exception("No se pudo leer el registro de cambios; se reintentará.")
+                await asyncio.sleep(ESPERA_TRAS_ERROR_SEGUNDOS)
+                continue
+            if nuevos:
+                self._repartir(nuevos)
+                self.ultimo = nuevos[-1]["seq"]
+            if len(nuevos) == TAMANO_LOTE:
+                self._despertar.set()
+
+    def _repartir(self, nuevos: List[dict]):
+        for suscripcion in list(self._suscripciones):
+            for cambio in nuevos:
+                if not suscripcion.recibe(cambio):
+                    continue
+                if suscripcion.cola.qsize() >= MAX_PENDIENTES_POR_CONEXION:
+                    self._suscripciones.discard(suscripcion)
+                    suscripcion.cola.put_nowait(None)
+                    break
+                suscripcion.cola.put_nowait(cambio)
+                self.repartidos += 1
+
+    async def detener(self):
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self._tarea, self.ultimo = None, None
+        # Cierra las conexiones abiertas para que el servidor pueda terminar.
+        for suscripcion in self._suscripciones:
+            suscripcion.cola.put_nowait(None)
+        self._suscripciones.clear()
+
+
+difusor = DifusorCambios()
+
+
+async def eventos_sse(curso: Optional[str], desde: Optional[int], latido_segundos: float):
+    """
+    Genera el flujo SSE de los cambios de `curso` (o de todos): primero los guardados
+    posteriores a `desde` (si se indica), después los que reparte el difusor. Envía un
+    comentario cada `latido_segundos` para que los proxies no cierren la conexión inactiva.
+    """
+    suscripcion = await difusor.suscribir(curso)
+    try:
+        yield b"retry: 3000\n\n"
+        enviado = 0
+        if desde is not None:
+            if perdido(desde, await run_in_threadpool(_primero)):
+                yield b"event: reinicio\ndata: {}\n\n"
+            else:
+                enviado = desde
+                while True:
+                    lote = await run_in_threadpool(_leer, enviado, TAMANO_LOTE, curso)
+                    for cambio in lote:
+                        yield formato_sse(cambio)
+                    if lote:
+                        enviado = lote[-1]["seq"]
+                    if len(lote) < TAMANO_LOTE:
+                        break
+        while True:
+            try:
+                cambio = await asyncio.wait_for(suscripcion.cola.get(), latido_segundos)
+            except asyncio.TimeoutError:
+                yield b": latido\n\n"
+                continue
+            if cambio is None:
+                return
+            # La puesta al día puede haber enviado ya lo que el difusor repartió después.
+            if cambio["seq"] <= enviado:
+                continue
+            enviado = cambio["seq"]
+            yield formato_sse(cambio)
+    finally:
+        difusor.cancelar(suscripcion)
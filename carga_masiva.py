@@ -0,0 +1,325 @@
+"""
+Importación y exportación masiva de estudiantes y cursos en CSV o NDJSON.
+
+Se usa desde los endpoints `/estudiantes/importar`, `/cursos/importar` y sus
+equivalentes `/exportar`, y también como herramienta de línea de comandos:
+
+    python carga_masiva.py importar estudiantes estudiantes.csv
+    python carga_masiva.py exportar cursos --formato ndjson > cursos.ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, TextIO, Tuple, Type
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, insert, select, true
+
+import eventos
+import horarios
+import migraciones
+from database import BaseDeDatosOcupada, engine, iniciar_escritura_sincrona, reintentar_escritura
+from models import (
+    Curso, CursoCreate, CursoRead, Estudiante, EstudianteCreate, EstudianteRead,
+    FilaRechazada, FranjaHoraria, ImportacionReport
+)
+
+FORMATOS = ("csv", "ndjson")
+TAMANO_LOTE = 1000
+TAMANO_LOTE_EXPORTACION = 1000
+MAX_BUFFER_EN_MEMORIA = 8 * 1024 * 1024
+TIPOS_MEDIA = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+ERROR_BASE_OCUPADA = "La base de datos siguió ocupada con otras escrituras: la fila no se importó."
+
+
+@dataclass(frozen=True)
+class Entidad:
+    tabla: Type[SQLModel]
+    esquema_create: Type[SQLModel]
+    esquema_read: Type[SQLModel]
+    clave: str
+    unicos: Tuple[str, ...] = ()
+    # Filas dependientes que se insertan junto a cada fila (en la misma transacción).
+    dependientes: Optional[Tuple[Type[SQLModel], Callable[[dict], List[dict]]]] = None
+
+
+ENTIDADES: Dict[str, Entidad] = {
+    "estudiantes": Entidad(Estudiante, EstudianteCreate, EstudianteRead, "cedula", ("email",)),
+    "cursos": Entidad(
+        Curso, CursoCreate, CursoRead, "codigo",
+        dependientes=(FranjaHoraria, lambda datos: horarios.filas_franjas(datos["codigo"], datos["horario"])),
+    ),
+}
+
+
+def _leer_filas(archivo: TextIO, formato: str, opcionales: FrozenSet[str] = frozenset()) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Recorre el archivo fila a fila y entrega (número de fila, datos, error de lectura).
+
+    En CSV no hay forma de escribir un nulo: las celdas vacías de los campos `opcionales`
+    (como el `cupo` de un curso sin límite, que la exportación escribe vacío) se leen como None.
+    """
+    if formato == "csv":
+        lector = csv.DictReader(archivo)
+        for numero, fila in enumerate(lector, start=2):
+            if None in fila:
+                yield numero, None, "La fila tiene más columnas que el encabezado."
+            else:
+                yield numero, {campo: None if campo in opcionales and valor == "" else valor for campo, valor in fila.items()}, None
+        return
+
+    for numero, linea in enumerate(archivo, start=1):
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError as e:
+            yield numero, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(datos, dict):
+            yield numero, None, "Cada línea debe ser un objeto JSON."
+        else:
+            yield numero, datos, None
+
+
+def _describir_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalle['loc']) or 'fila'}: {detalle['msg']}"
+        for detalle in error.errors()
+    )
+
+
+def _insertar_filas(session: Session, entidad: Entidad, filas: List[dict]):
+    session.exec(insert(entidad.tabla), params=filas)
+    if entidad.dependientes:
+        tabla_dependiente, generar = entidad.dependientes
+        filas_dependientes = [fila for datos in filas for fila in generar(datos)]
+        if filas_dependientes:
+            session.exec(insert(tabla_dependiente), params=filas_dependientes)
+
+
+def _escribir(session: Session, nombre_entidad: str, entidad: Entidad, lote: List[Tuple[int, dict]]) -> Tuple[int, List[FilaRechazada]]:
+    """
+    Transacción de escritura de un lote: descarta las filas cuya clave (o campo único) ya
+    existe y escribe el resto con un único INSERT de múltiples filas.
+
+    Returns:
+        Tuple[int, List[FilaRechazada]]: Filas insertadas y filas descartadas.
+    """
+    iniciar_escritura_sincrona(session)
+    tabla = entidad.tabla
+    rechazadas = []
+    for campo in (entidad.clave,) + entidad.unicos:
+        columna = getattr(tabla, campo)
+        valores = [datos[campo] for _, datos in lote]
+        existentes = set(session.exec(select(columna).where(columna.in_(valores))).all())
+        if existentes:
+            rechazadas += [FilaRechazada(fila=numero, error=f"Ya existe un registro con ese {campo}.") for numero, datos in lote if datos[campo] in existentes]
+            lote = [(numero, datos) for numero, datos in lote if datos[campo] not in existentes]
+
+    if lote:
+        _insertar_filas(session, entidad, [datos for _, datos in lote])
+        eventos.entidades_importadas(session, nombre_entidad)
+    session.commit()
+    return len(lote), rechazadas
+
+
+def _aplicar(session: Session, nombre_entidad: str, entidad: Entidad, lote: List[Tuple[int, dict]], reporte: ImportacionReport):
+    try:
+        insertados, rechazadas = reintentar_escritura(session, lambda: _escribir(session, nombre_entidad, entidad, lote))
+    except BaseDeDatosOcupada:
+        insertados, rechazadas = 0, [FilaRechazada(fila=numero, error=ERROR_BASE_OCUPADA) for numero, _ in lote]
+    reporte.insertados += insertados
+    reporte.errores.extend(rechazadas)
+
+
+def _insertar_lote(session: Session, nombre_entidad: str, entidad: Entidad, lote: List[Tuple[int, dict]], reporte: ImportacionReport):
+    """
+    Escribe el lote en su propia transacción, con los reintentos de las escrituras bloqueadas
+    (ver database.reintentar_escritura). Si la base sigue ocupada, las filas del lote se
+    informan como rechazadas y la importación sigue con el siguiente.
+    """
+    try:
+        _aplicar(session, nombre_entidad, entidad, lote, reporte)
+    except IntegrityError:
+        # Otra escritura concurrente ganó alguna clave: se reintenta fila a fila.
+        for fila in lote:
+            try:
+                _aplicar(session, nombre_entidad, entidad, [fila], reporte)
+            except IntegrityError:
+                reporte.errores.append(FilaRechazada(fila=fila[0], error="Conflicto de unicidad al insertar."))
+
+
+def importar(session: Session, nombre_entidad: str, archivo: TextIO, formato: str, tamano_lote: int = TAMANO_LOTE) -> ImportacionReport:
+    """
+    Importa estudiantes o cursos desde un archivo CSV o NDJSON.
+
+    Cada fila se valida con las mismas reglas de `EstudianteCreate`/`CursoCreate`; las filas
+    válidas se escriben en lotes con inserciones `executemany` y se confirma cada lote.
+    Las filas inválidas, repetidas dentro del archivo o ya existentes se informan en el reporte.
+
+    La importación no es atómica: cada lote es una transacción de escritura con reintentos y
+    los lotes confirmados quedan aunque otro falle. Las filas de un lote que no se pudo
+    escribir porque la base siguió ocupada se informan con ERROR_BASE_OCUPADA, así que las
+    filas importadas son exactamente las que no aparecen en el reporte. Si la importación se
+    interrumpe por otro error, quedan los lotes anteriores.
+
+    Args:
+        session: Sesión de base de datos.
+        nombre_entidad: `estudiantes` o `cursos`.
+        archivo: Archivo de texto abierto para lectura.
+        formato: `csv` o `ndjson`.
+        tamano_lote: Filas por cada inserción.
+
+    Returns:
+        ImportacionReport: Totales y filas rechazadas con su motivo.
+    """
+    entidad = ENTIDADES[nombre_entidad]
+    reporte = ImportacionReport(insertados=0, rechazados=0)
+    vistos = {campo: set() for campo in (entidad.clave,) + entidad.unicos}
+    opcionales = frozenset(campo for campo, info in entidad.esquema_create.model_fields.items() if not info.is_required())
+    lote: List[Tuple[int, dict]] = []
+
+    for numero, datos, error in _leer_filas(archivo, formato, opcionales):
+        if error is None:
+            try:
+                datos = entidad.esquema_create.model_validate(datos).model_dump()
+            except ValidationError as e:
+                error = _describir_error(e)
+        if error is None:
+            repetido = next((campo for campo in vistos if datos[campo] in vistos[campo]), None)
+            if repetido:
+                error = f"El {repetido} está repetido en el archivo."
+        if error is not None:
+            reporte.errores.append(FilaRechazada(fila=numero, error=error))
+            continue
+
+        for campo in vistos:
+            vistos[campo].add(datos[campo])
+        lote.append((numero, datos))
+        if len(lote) >= tamano_lote:
+            _insertar_lote(session, nombre_entidad, entidad, lote, reporte)
+            lote = []
+
+    if lote:
+        _insertar_lote(session, nombre_entidad, entidad, lote, reporte)
+
+    reporte.errores.sort(key=lambda fila: fila.fila)
+    reporte.rechazados = len(reporte.errores)
+    return reporte
+
+
+def exportar(nombre_entidad: str, formato: str, engine_a_usar: Engine = engine) -> Iterator[str]:
+    """
+    Genera el contenido de la exportación a medida que el cursor de la base de datos
+    entrega las filas, ordenadas por su clave.
+
+    Usa su propia sesión para poder consumirse desde una respuesta en streaming.
+    """
+    entidad = ENTIDADES[nombre_entidad]
+    campos = list(entidad.esquema_read.model_fields)
+    columnas = [getattr(entidad.tabla, campo) for campo in campos]
+    statement = (
+        select(*columnas)
+        .where(entidad.tabla.activo == true())
+        .order_by(getattr(entidad.tabla, entidad.clave))
+        .execution_options(yield_per=TAMANO_LOTE_EXPORTACION)
+    )
+
+    with Session(engine_a_usar) as session:
+        filas = session.exec(statement)
+        if formato == "ndjson":
+            for fila in filas:
+                yield json.dumps(dict(zip(campos, fila)), ensure_ascii=False) + "\n"
+            return
+
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(campos)
+        for fila in filas:
+            escritor.writerow(fila)
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+
+def _importar_con_sesion_propia(nombre_entidad: str, archivo: TextIO, formato: str) -> ImportacionReport:
+    with Session(engine) as session:
+        return importar(session, nombre_entidad, archivo, formato)
+
+
+async def importar_desde_peticion(request: Request, nombre_entidad: str, formato: str) -> ImportacionReport:
+    """
+    Vuelca el cuerpo de la petición a un archivo temporal a medida que llega (en memoria
+    hasta 8 MB, en disco a partir de ahí) y lo importa en el threadpool con una sesión
+    síncrona propia, sea cual sea el DB_MODO de la aplicación.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=MAX_BUFFER_EN_MEMORIA) as temporal:
+        async for fragmento in request.stream():
+            temporal.write(fragmento)
+        temporal.seek(0)
+        archivo = io.TextIOWrapper(temporal, encoding="utf-8", newline="")
+        return await run_in_threadpool(_importar_con_sesion_propia, nombre_entidad, archivo, formato)
+
+
+def respuesta_exportacion(nombre_entidad: str, formato: str, engine_a_usar: Engine = engine) -> StreamingResponse:
+    """
+    Construye la respuesta en streaming de una exportación, lista para descargarse como archivo.
+    """
+    return StreamingResponse(
+        exportar(nombre_entidad, formato, engine_a_usar),
+        media_type=TIPOS_MEDIA[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre_entidad}.{formato}"'}
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importación y exportación masiva de estudiantes y cursos.")
+    subparsers = parser.add_subparsers(dest="accion", required=True)
+
+    parser_importar = subparsers.add_parser("importar", help="Importa un archivo CSV o NDJSON.")
+    parser_importar.add_argument("entidad", choices=ENTIDADES)
+    parser_importar.add_argument("archivo", help="Ruta del archivo, o '-' para leer de la entrada estándar.")
+    parser_importar.add_argument("--formato", choices=FORMATOS, help="Por defecto se deduce de la extensión.")
+    parser_importar.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por inserción.")
+
+    parser_exportar = subparsers.add_parser("exportar", help="Exporta a la salida estándar.")
+    parser_exportar.add_argument("entidad", choices=ENTIDADES)
+    parser_exportar.add_argument("--formato", choices=FORMATOS, default="csv")
+
+    args = parser.parse_args(argv)
+    migraciones.verificar()
+
+    if args.accion == "exportar":
+        for fragmento in exportar(args.entidad, args.formato):
+            sys.stdout.write(fragmento)
+        return 0
+
+    formato = args.formato or ("ndjson" if args.archivo.endswith((".ndjson", ".jsonl")) else "csv")
+    archivo = sys.stdin if args.archivo == "-" else open(args.archivo, encoding="utf-8", newline="")
+    try:
+        with Session(engine) as session:
+            reporte = importar(session, args.entidad, archivo, formato, args.lote)
+    finally:
+        if archivo is not sys.stdin:
+            archivo.close()
+
+    for rechazo in reporte.errores:
+        print(f"Fila {rechazo.fila}: {rechazo.error}", file=sys.stderr)
+    print(f"Insertados: {reporte.insertados}. Rechazados: {reporte.rechazados}.")
+    return 0 if reporte.rechazados == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Configuración de la aplicación, leída de variables de entorno.
+
+Todas las opciones tienen un valor por defecto apto para desarrollo local, de modo que
+`uvicorn main:app --reload` sigue funcionando sin configurar nada (una vez aplicadas las
+migraciones con `python -m migraciones`).
+"""
+import os
+from dataclasses import dataclass
+
+
+def _texto(nombre: str, defecto: str) -> str:
+    return os.environ.get(nombre, defecto)
+
+
+def _entero(nombre: str, defecto: int) -> int:
+    valor = os.environ.get(nombre)
+    if valor is None or valor == "":
+        return defecto
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValueError(f"La variable de entorno {nombre} debe ser un número entero (valor actual: {valor!r}).")
+
+
+def _lista(nombre: str) -> tuple:
+    valor = os.environ.get(nombre, "")
+    return tuple(parte.strip() for parte in valor.split(",") if parte.strip())
+
+
+def _opcion(nombre: str, defecto: str, opciones: tuple) -> str:
+    valor = os.environ.get(nombre, defecto).strip().upper()
+    if valor not in opciones:
+        raise ValueError(f"La variable de entorno {nombre} debe ser una de {', '.join(opciones)} (valor actual: {valor!r}).")
+    return valor
+
+
+def _booleano(nombre: str, defecto: bool) -> bool:
+    valor = os.environ.get(nombre)
+    if valor is None or valor == "":
+        return defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    log_level: str
+    db_modo: str
+    database_url: str
+    database_url_async: str
+    database_urls_lectura: tuple
+    db_lectura_sqlite: bool
+    db_lectura_pegajosa_segundos: int
+    db_retraso_maximo_segundos: int
+    db_revision_lectura_segundos: int
+    db_echo: bool
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: int
+    db_pool_recycle: int
+    sqlite_journal_mode: str
+    sqlite_synchronous: str
+    sqlite_busy_timeout_ms: int
+    sqlite_cache_size_kb: int
+    sqlite_mmap_size: int
+    sqlite_temp_store: str
+    cache_habilitada: bool
+    cache_ttl_segundos: int
+    cache_max_entradas: int
+    idempotencia_ttl_segundos: int
+    idempotencia_max_entradas: int
+    cambios_retencion_dias: int
+    cambios_sondeo_segundos: int
+    metricas_habilitadas: bool
+    metricas_umbral_lento_ms: int
+    reportes_materializados: bool
+    migrar_al_iniciar: bool
+    inicio_preparado: bool
+    servidor_workers: int
+    servidor_drenaje_segundos: int
+    servidor_arranque_segundos: int
+
+
+def cargar_settings() -> Settings:
+    """
+    Construye la configuración a partir de las variables de entorno.
+    """
+    return Settings(
+        log_level=_opcion("LOG_LEVEL", "INFO", ("DEBUG", "INFO", "WARNING", "ERROR")),
+        db_modo=_opcion("DB_MODO", "SYNC", ("SYNC", "ASYNC")).lower(),
+        database_url=_texto("DATABASE_URL", "sqlite:///./universidad.db"),
+        database_url_async=_texto("DATABASE_URL_ASYNC", ""),
+        database_urls_lectura=_lista("DATABASE_URLS_LECTURA"),
+        db_lectura_sqlite=_booleano("DB_LECTURA_SQLITE", False),
+        db_lectura_pegajosa_segundos=_entero("DB_LECTURA_PEGAJOSA_SEGUNDOS", 5),
+        db_retraso_maximo_segundos=_entero("DB_RETRASO_MAXIMO_SEGUNDOS", 10),
+        db_revision_lectura_segundos=_entero("DB_REVISION_LECTURA_SEGUNDOS", 2),
+        db_echo=_booleano("DB_ECHO", False),
+        db_pool_size=_entero("DB_POOL_SIZE", 10),
+        db_max_overflow=_entero("DB_MAX_OVERFLOW", 20),
+        db_pool_timeout=_entero("DB_POOL_TIMEOUT", 30),
+        db_pool_recycle=_entero("DB_POOL_RECYCLE", 3600),
+        sqlite_journal_mode=_opcion("SQLITE_JOURNAL_MODE", "WAL", ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")),
+        sqlite_synchronous=_opcion("SQLITE_SYNCHRONOUS", "NORMAL", ("OFF", "NORMAL", "FULL", "EXTRA")),
+        sqlite_busy_timeout_ms=_entero("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        sqlite_cache_size_kb=_entero("SQLITE_CACHE_SIZE_KB", 64 * 1024),
+        sqlite_mmap_size=_entero("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        sqlite_temp_store=_opcion("SQLITE_TEMP_STORE", "MEMORY", ("DEFAULT", "FILE", "MEMORY")),
+        cache_habilitada=_booleano("CACHE_HABILITADA", True),
+        cache_ttl_segundos=_entero("CACHE_TTL_SEGUNDOS", 60),
+        cache_max_entradas=_entero("CACHE_MAX_ENTRADAS", 10000),
+        idempotencia_ttl_segundos=_entero("IDEMPOTENCIA_TTL_SEGUNDOS", 24 * 3600),
+        idempotencia_max_entradas=_entero("IDEMPOTENCIA_MAX_ENTRADAS", 10000),
+        cambios_retencion_dias=_entero("CAMBIOS_RETENCION_DIAS", 7),
+        cambios_sondeo_segundos=_entero("CAMBIOS_SONDEO_SEGUNDOS", 1),
+        metricas_habilitadas=_booleano("METRICAS_HABILITADAS", True),
+        metricas_umbral_lento_ms=_entero("METRICAS_UMBRAL_LENTO_MS", 500),
+        reportes_materializados=_booleano("REPORTES_MATERIALIZADOS", False),
+        migrar_al_iniciar=_booleano("MIGRAR_AL_INICIAR", False),
+        inicio_preparado=_booleano("INICIO_PREPARADO", False),
+        servidor_workers=_entero("SERVIDOR_WORKERS", 0),
+        servidor_drenaje_segundos=_entero("SERVIDOR_DRENAJE_SEGUNDOS", 30),
+        servidor_arranque_segundos=_entero("SERVIDOR_ARRANQUE_SEGUNDOS", 30),
+    )
+
+
+settings = cargar_settings()
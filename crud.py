@@ -1,235 +1,247 @@
-from sqlmodel import Session, select
-from models import Estudiante, Curso, Matricula, EstudianteCreate, CursoCreate, MatriculaCreate, EstudianteUpdate, CursoUpdate, CursoRead, EstudianteRead
-from typing import Optional, List
-
-
-def crear_estudiante(session: Session, data: EstudianteCreate):
-
-    existing_estudiante = session.exec(select(Estudiante).where(Estudiante.cedula == data.cedula)).first()
-    if existing_estudiante:
-        
-        return None 
-        
-    estudiante = Estudiante.model_validate(data)
-    session.add(estudiante)
-    session.commit()
-    session.refresh(estudiante)
-    return estudiante
-
-
-def listar_estudiantes(session: Session, semestre: Optional[int] = None) -> List[Estudiante]:
-   
-    query = select(Estudiante)
-    if semestre is not None:
-        query = query.where(Estudiante.semestre == semestre)
-    return session.exec(query).all()
-
-
-def obtener_estudiante(session: Session, estudiante_id: int):
-    return session.get(Estudiante, estudiante_id)
-
-
-def obtener_estudiante_con_cursos(session: Session, estudiante_id: int):
-  
-    estudiante = session.get(Estudiante, estudiante_id)
-    if not estudiante:
-        return None
-        
-    cursos = [
-        CursoRead.model_validate(matricula.curso)
-        for matricula in estudiante.matriculas
-        if matricula.curso
-    ]
-    
-  
-    return {
-        "id": estudiante.id,
-        "nombre": estudiante.nombre,
-        "cedula": estudiante.cedula,
-        "email": estudiante.email,
-        "semestre": estudiante.semestre,
-        "cursos": cursos
-    }
-
-
-def actualizar_estudiante(session: Session, estudiante_id: int, data: EstudianteUpdate):
-    estudiante = session.get(Estudiante, estudiante_id)
-    if not estudiante:
-        return None
-   
-    for key, value in data.model_dump(exclude_unset=True).items(): 
-        setattr(estudiante, key, value)
-    session.add(estudiante)
-    session.commit()
-    session.refresh(estudiante)
-    return estudiante
-
-
-def eliminar_estudiante(session: Session, estudiante_id: int):
-    
-    estudiante = session.get(Estudiante, estudiante_id)
-    if estudiante:
-        session.delete(estudiante)
-        session.commit()
-        return True
-    return False
-
-
-
-def crear_curso(session: Session, data: CursoCreate):
-   
-    existing_curso = session.exec(select(Curso).where(Curso.codigo == data.codigo)).first()
-    if existing_curso:
-        
-        return None 
-        
-    curso = Curso.model_validate(data)
-    session.add(curso)
-    session.commit()
-    session.refresh(curso)
-    return curso
-
-
-def listar_cursos(session: Session, creditos: Optional[int] = None, codigo: Optional[str] = None) -> List[Curso]:
-   
-    query = select(Curso)
-    if creditos is not None:
-        query = query.where(Curso.creditos == creditos)
-    if codigo is not None:
-        query = query.where(Curso.codigo == codigo)
-        
-    return session.exec(query).all()
-
-
-def obtener_curso(session: Session, curso_id: int):
-    return session.get(Curso, curso_id)
-
-def obtener_curso_con_estudiantes(session: Session, curso_id: int):
- 
-    curso = session.get(Curso, curso_id)
-    if not curso:
-        return None
-        
-    estudiantes = [
-        EstudianteRead.model_validate(matricula.estudiante)
-        for matricula in curso.matriculas
-        if matricula.estudiante
-    ]
-
-    return {
-        "id": curso.id,
-        "nombre": curso.nombre,
-        "codigo": curso.codigo,
-        "creditos": curso.creditos,
-        "horario": curso.horario,
-        "estudiantes": estudiantes
-    }
-
-
-def actualizar_curso(session: Session, curso_id: int, data: CursoUpdate):
-    curso = session.get(Curso, curso_id)
-    if not curso:
-        return None
-    for key, value in data.model_dump(exclude_unset=True).items(): 
-        setattr(curso, key, value)
-    session.add(curso)
-    session.commit()
-    session.refresh(curso)
-    return curso
-
-
-def eliminar_curso(session: Session, curso_id: int):
-   
-    curso = session.get(Curso, curso_id)
-    if curso:
-        session.delete(curso)
-        session.commit()
-        return True
-    return False
-
-
-def crear_matricula(session: Session, data: MatriculaCreate):
- 
-    
-
-    nuevo_curso = session.get(Curso, data.curso_id)
-    if not nuevo_curso:
-        return {"error": "Curso no existe"} 
-
-    
-    horario_conflicto = session.exec(
-        select(Matricula)
-        .join(Curso)
-        .where(Matricula.estudiante_id == data.estudiante_id)
-        .where(Curso.horario == nuevo_curso.horario)
-    ).first()
-
-    if horario_conflicto:
-        return {"error": "Conflicto de horario: el estudiante ya tiene un curso a esa hora."} 
-        
-   
-    matricula_existente = session.exec(
-        select(Matricula)
-        .where(Matricula.estudiante_id == data.estudiante_id)
-        .where(Matricula.curso_id == data.curso_id)
-    ).first()
-
-    if matricula_existente:
-        return {"error": "El estudiante ya está matriculado en este curso."}
-
-
-  
-    matricula = Matricula.model_validate(data)
-    session.add(matricula)
-    session.commit()
-    session.refresh(matricula)
-    return matricula
-
-
-def listar_cursos_de_estudiante(session: Session, estudiante_id: int) -> List[CursoRead]:
-
-    cursos = session.exec(
-        select(Curso)
-        .join(Matricula)
-        .where(Matricula.estudiante_id == estudiante_id)
-    ).all()
-    return [CursoRead.model_validate(c) for c in cursos]
-
-
-def listar_estudiantes_de_curso(session: Session, curso_id: int) -> List[EstudianteRead]:
-   
-    estudiantes = session.exec(
-        select(Estudiante)
-        .join(Matricula)
-        .where(Matricula.curso_id == curso_id)
-    ).all()
-    return [EstudianteRead.model_validate(e) for e in estudiantes]
-
-
-def listar_matriculas(session: Session):
-    return session.exec(select(Matricula)).all()
-
-
-def obtener_matricula(session: Session, matricula_id: int):
-    return session.get(Matricula, matricula_id)
-
-
-def actualizar_matricula(session: Session, matricula_id: int, data: MatriculaCreate):
-    matricula = session.get(Matricula, matricula_id)
-    if not matricula:
-        return None
-    for key, value in data.model_dump(exclude_unset=True).items():
-        setattr(matricula, key, value)
-    session.add(matricula)
-    session.commit()
-    session.refresh(matricula)
-    return matricula
-
-
-def eliminar_matricula(session: Session, matricula_id: int):
-    matricula = session.get(Matricula, matricula_id)
-    if matricula:
-        session.delete(matricula)
-        session.commit()
-        return True
-    return False
\ No newline at end of file
+"""
+Capa de acceso a datos: las consultas de lectura y las búsquedas por clave que usan los routers.
+
+Las sentencias se construyen una sola vez, al importar el módulo, con parámetros
+(`bindparam`) en lugar de valores. Cada llamada solo ejecuta la sentencia ya armada y
+SQLAlchemy reutiliza su SQL compilado, sin volver a construir la consulta ni las columnas
+del modelo de lectura en cada petición (ver benchmarks/consultas.py). Las listas de claves
+usan un IN "expanding", que se completa al ejecutar según la cantidad de valores.
+
+Las variantes por lotes (`estudiantes_por_cedula`, `cursos_por_codigo`,
+`estudiantes_de_cursos`, `matriculas_de_estudiantes`) resuelven muchas claves con una
+consulta IN por cada TAMANO_LOTE_IN claves, en lugar de una consulta por clave.
+
+Las lecturas solo ven estudiantes y cursos activos: los eliminados siguen en su tabla
+hasta que limpieza.py borra sus matrículas y la fila. Mientras tanto esas matrículas
+siguen ocupando cupo, horario y créditos, así que las consultas de matrículas propias de
+la validación (`MATRICULAS_DE_ESTUDIANTES` y la agenda de `horario_ocupado`) no los filtran.
+
+Las funciones reciben la sesión de `SessionDep` (AsyncSession o database.SesionSincrona).
+Las sentencias son públicas para el código que trabaja con una Session síncrona (por
+ejemplo eventos.py). Las escrituras siguen en los routers, porque dependen de la
+transacción (database.iniciar_escritura, con_reintentos) y de los efectos de eventos.py.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import bindparam
+from sqlalchemy.engine import Row
+from sqlmodel import select, true
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import horarios
+from models import AgendaEstudiante, Curso, CursoRead, Estudiante, EstudianteRead, Matricula
+from serializacion import columnas, como_dicts
+
+TAMANO_LOTE_IN = 500
+
+
+def en_lotes(valores: Sequence[str], tamano: int = TAMANO_LOTE_IN) -> Iterator[Sequence[str]]:
+    """
+    Divide una lista de claves en trozos para no superar el límite de parámetros de una cláusula IN.
+    """
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+
+# Con `true()` SQLite recibe `activo = 1` literal, que le permite usar los índices
+# parciales de las filas activas (ver models.py).
+ESTUDIANTE_ACTIVO = Estudiante.activo == true()
+CURSO_ACTIVO = Curso.activo == true()
+
+# Listados: los routers les agregan filtros y paginación.
+LISTADO_ESTUDIANTES = select(*columnas(EstudianteRead, Estudiante)).where(ESTUDIANTE_ACTIVO)
+LISTADO_CURSOS = select(*columnas(CursoRead, Curso)).where(CURSO_ACTIVO)
+
+ESTUDIANTE = LISTADO_ESTUDIANTES.where(Estudiante.cedula == bindparam("cedula"))
+CURSO = LISTADO_CURSOS.where(Curso.codigo == bindparam("codigo"))
+EXISTE_ESTUDIANTE = select(Estudiante.cedula).where(Estudiante.cedula == bindparam("cedula"), ESTUDIANTE_ACTIVO)
+EXISTE_CURSO = select(Curso.codigo).where(Curso.codigo == bindparam("codigo"), CURSO_ACTIVO)
+# Incluyen las filas eliminadas que aún no se limpiaron, que siguen ocupando la clave.
+ESTADO_ESTUDIANTE = select(Estudiante.activo).where(Estudiante.cedula == bindparam("cedula"))
+ESTADO_CURSO = select(Curso.activo).where(Curso.codigo == bindparam("codigo"))
+EXISTE_MATRICULA = select(Matricula.curso_codigo).where(
+    Matricula.estudiante_cedula == bindparam("cedula"), Matricula.curso_codigo == bindparam("codigo")
+)
+
+# En el orden de la clave primaria de la matrícula (estudiante, curso).
+CURSOS_DE_ESTUDIANTE = (
+    LISTADO_CURSOS.join(Matricula)
+    .where(Matricula.estudiante_cedula == bindparam("cedula"))
+    .order_by(Matricula.curso_codigo)
+)
+# En el orden del índice (curso_codigo, estudiante_cedula), que resuelve la consulta sin ordenar aparte.
+ESTUDIANTES_DE_CURSO = (
+    LISTADO_ESTUDIANTES.join(Matricula)
+    .where(Matricula.curso_codigo == bindparam("codigo"))
+    .order_by(Matricula.estudiante_cedula)
+)
+CODIGOS_DE_ESTUDIANTE = select(Matricula.curso_codigo).where(Matricula.estudiante_cedula == bindparam("cedula"))
+CEDULAS_DE_CURSO = select(Matricula.estudiante_cedula).where(Matricula.curso_codigo == bindparam("codigo"))
+
+ESTUDIANTES_POR_CEDULA = LISTADO_ESTUDIANTES.where(Estudiante.cedula.in_(bindparam("cedulas", expanding=True)))
+CURSOS_POR_CODIGO = LISTADO_CURSOS.where(Curso.codigo.in_(bindparam("codigos", expanding=True)))
+_ESTUDIANTES_POR_CEDULA_BLOQUEO = ESTUDIANTES_POR_CEDULA.with_for_update()
+_CURSOS_POR_CODIGO_BLOQUEO = CURSOS_POR_CODIGO.with_for_update()
+ESTUDIANTES_DE_CURSOS = (
+    select(Matricula.curso_codigo, *columnas(EstudianteRead, Estudiante))
+    .join(Matricula)
+    .where(Matricula.curso_codigo.in_(bindparam("codigos", expanding=True)), ESTUDIANTE_ACTIVO)
+    .order_by(Matricula.curso_codigo, Matricula.estudiante_cedula)
+)
+AGENDA_ESTUDIANTE = select(AgendaEstudiante.cursos, AgendaEstudiante.ocupacion).where(AgendaEstudiante.cedula == bindparam("cedula"))
+MATRICULAS_DE_ESTUDIANTES = (
+    select(Matricula.estudiante_cedula, Curso.codigo, Curso.nombre, Curso.horario, Curso.creditos)
+    .join(Curso)
+    .where(Matricula.estudiante_cedula.in_(bindparam("cedulas", expanding=True)))
+)
+
+
+async def estudiante(session: AsyncSession, cedula: str) -> Optional[dict]:
+    """
+    Columnas de `EstudianteRead` del estudiante, o None si no existe.
+    """
+    fila = (await session.exec(ESTUDIANTE, params={"cedula": cedula})).first()
+    return fila._asdict() if fila else None
+
+
+async def curso(session: AsyncSession, codigo: str) -> Optional[dict]:
+    """
+    Columnas de `CursoRead` del curso, o None si no existe.
+    """
+    fila = (await session.exec(CURSO, params={"codigo": codigo})).first()
+    return fila._asdict() if fila else None
+
+
+async def existe_estudiante(session: AsyncSession, cedula: str) -> bool:
+    return (await session.exec(EXISTE_ESTUDIANTE, params={"cedula": cedula})).first() is not None
+
+
+async def existe_curso(session: AsyncSession, codigo: str) -> bool:
+    return (await session.exec(EXISTE_CURSO, params={"codigo": codigo})).first() is not None
+
+
+async def estado_estudiante(session: AsyncSession, cedula: str) -> Optional[bool]:
+    """
+    True si el estudiante existe, False si se eliminó y su limpieza está pendiente, o None
+    si la cédula está libre.
+    """
+    return (await session.exec(ESTADO_ESTUDIANTE, params={"cedula": cedula})).first()
+
+
+async def estado_curso(session: AsyncSession, codigo: str) -> Optional[bool]:
+    """
+    True si el curso existe, False si se eliminó y su limpieza está pendiente, o None si el
+    código está libre.
+    """
+    return (await session.exec(ESTADO_CURSO, params={"codigo": codigo})).first()
+
+
+async def existe_matricula(session: AsyncSession, cedula: str, codigo: str) -> bool:
+    return (await session.exec(EXISTE_MATRICULA, params={"cedula": cedula, "codigo": codigo})).first() is not None
+
+
+async def cursos_de_estudiante(session: AsyncSession, cedula: str) -> List[dict]:
+    return como_dicts((await session.exec(CURSOS_DE_ESTUDIANTE, params={"cedula": cedula})).all())
+
+
+async def estudiantes_de_curso(session: AsyncSession, codigo: str) -> List[dict]:
+    return como_dicts((await session.exec(ESTUDIANTES_DE_CURSO, params={"codigo": codigo})).all())
+
+
+async def estudiante_con_cursos(session: AsyncSession, cedula: str) -> Optional[dict]:
+    """
+    El estudiante con sus cursos (`EstudianteReadWithCursos`) en dos sentencias, sin
+    importar cuántos cursos tenga, o None si no existe.
+    """
+    resultado = await estudiante(session, cedula)
+    if resultado is not None:
+        resultado["cursos"] = await cursos_de_estudiante(session, cedula)
+    return resultado
+
+
+async def curso_con_estudiantes(session: AsyncSession, codigo: str) -> Optional[dict]:
+    """
+    El curso con sus estudiantes (`CursoReadWithEstudiantes`) en dos sentencias, sin
+    importar cuántos inscritos tenga, o None si no existe.
+    """
+    resultado = await curso(session, codigo)
+    if resultado is not None:
+        resultado["estudiantes"] = await estudiantes_de_curso(session, codigo)
+    return resultado
+
+
+async def codigos_de_estudiante(session: AsyncSession, cedula: str) -> List[str]:
+    return list((await session.exec(CODIGOS_DE_ESTUDIANTE, params={"cedula": cedula})).all())
+
+
+async def cedulas_de_curso(session: AsyncSession, codigo: str) -> List[str]:
+    return list((await session.exec(CEDULAS_DE_CURSO, params={"codigo": codigo})).all())
+
+
+async def estudiantes_por_cedula(session: AsyncSession, cedulas: Iterable[str], bloquear: bool = False) -> Dict[str, Row]:
+    """
+    Filas (columnas de `EstudianteRead`) de los estudiantes dados que existen, por cédula.
+    Con `bloquear`, las filas quedan bloqueadas (FOR UPDATE) fuera de SQLite.
+    """
+    statement = _ESTUDIANTES_POR_CEDULA_BLOQUEO if bloquear else ESTUDIANTES_POR_CEDULA
+    encontrados: Dict[str, Row] = {}
+    for lote in en_lotes(sorted(set(cedulas))):
+        for fila in (await session.exec(statement, params={"cedulas": list(lote)})).all():
+            encontrados[fila.cedula] = fila
+    return encontrados
+
+
+async def cursos_por_codigo(session: AsyncSession, codigos: Iterable[str], bloquear: bool = False) -> Dict[str, Row]:
+    """
+    Filas (columnas de `CursoRead`) de los cursos dados que existen, por código.
+    Con `bloquear`, las filas quedan bloqueadas (FOR UPDATE) fuera de SQLite.
+    """
+    statement = _CURSOS_POR_CODIGO_BLOQUEO if bloquear else CURSOS_POR_CODIGO
+    encontrados: Dict[str, Row] = {}
+    for lote in en_lotes(sorted(set(codigos))):
+        for fila in (await session.exec(statement, params={"codigos": list(lote)})).all():
+            encontrados[fila.codigo] = fila
+    return encontrados
+
+
+async def estudiantes_de_cursos(session: AsyncSession, codigos: Iterable[str]) -> Dict[str, List[dict]]:
+    """
+    Estudiantes matriculados (columnas de `EstudianteRead`) de varios cursos a la vez, por
+    código y en el mismo orden que `estudiantes_de_curso`. Los cursos sin matrículas no aparecen.
+    """
+    matriculados: Dict[str, List[dict]] = {}
+    for lote in en_lotes(sorted(set(codigos))):
+        for fila in (await session.exec(ESTUDIANTES_DE_CURSOS, params={"codigos": list(lote)})).all():
+            datos = fila._asdict()
+            matriculados.setdefault(datos.pop("curso_codigo"), []).append(datos)
+    return matriculados
+
+
+async def matriculas_de_estudiantes(session: AsyncSession, cedulas: Iterable[str]) -> List[Row]:
+    """
+    (cédula, código, nombre, horario, créditos) de los cursos matriculados de los estudiantes dados.
+    """
+    filas: List[Row] = []
+    for lote in en_lotes(sorted(set(cedulas))):
+        filas.extend((await session.exec(MATRICULAS_DE_ESTUDIANTES, params={"cedulas": list(lote)})).all())
+    return filas
+
+
+async def horario_ocupado(session: AsyncSession, cedula: str) -> horarios.HorarioOcupado:
+    """
+    Horario ocupado por las matrículas del estudiante, de su fila de agenda_estudiante
+    (vacío si no tiene matrículas).
+    """
+    fila = (await session.exec(AGENDA_ESTUDIANTE, params={"cedula": cedula})).first()
+    return horarios.HorarioOcupado.de_fila(*fila) if fila else horarios.HorarioOcupado({})
+
+
+async def curso_en_conflicto(session: AsyncSession, cedula: str, codigo: str, horario: str) -> Optional[Curso]:
+    """
+    Un curso del estudiante, distinto de `codigo`, cuyo horario se cruza con `horario`, o None.
+    Se resuelve con la máscara de la agenda del estudiante (ver agendas.py), sin JOIN; solo
+    si hay choque se carga el curso. Un horario que no se pudo interpretar solo choca con
+    otro idéntico.
+    """
+    conflicto = (await horario_ocupado(session, cedula)).choque(horario, excluir=codigo)
+    return await session.get(Curso, conflicto) if conflicto else None
@@ -0,0 +1,107 @@
+"""
+Límites de la matrícula: cupo de cada curso y créditos máximos por estudiante.
+
+`Curso.cupo` es la cantidad máxima de estudiantes del curso (sin valor, ilimitado) y los
+créditos que un estudiante puede tener matriculados a la vez dependen de su semestre.
+
+Las comprobaciones solo son fiables dentro de una transacción iniciada con
+`database.iniciar_escritura` (y con las filas del estudiante y del curso bloqueadas con
+`with_for_update` fuera de SQLite): así dos matrículas concurrentes no pueden contar los
+mismos cupos o créditos libres.
+"""
+from typing import Iterable, Optional
+
+from sqlmodel import func, select
+
+from models import Curso, ListaEspera, Matricula
+
+# (último semestre del tramo, créditos máximos)
+CREDITOS_MAXIMOS_POR_TRAMO = ((2, 18), (8, 21), (12, 24))
+
+
+def creditos_maximos(semestre: int) -> int:
+    for ultimo_semestre, creditos in CREDITOS_MAXIMOS_POR_TRAMO:
+        if semestre <= ultimo_semestre:
+            return creditos
+    return CREDITOS_MAXIMOS_POR_TRAMO[-1][1]
+
+
+def consulta_ocupados(codigos: Iterable[str]):
+    """
+    (código, matriculados) de los cursos dados que tienen al menos una matrícula.
+    """
+    return (
+        select(Matricula.curso_codigo, func.count())
+        .where(Matricula.curso_codigo.in_(list(codigos)))
+        .group_by(Matricula.curso_codigo)
+    )
+
+
+def consulta_en_espera(codigos: Iterable[str]):
+    """
+    (código, estudiantes en espera) de los cursos dados que tienen lista de espera. Quienes
+    esperan tienen prioridad: sus cupos no se ofrecen a la matrícula directa.
+    """
+    return (
+        select(ListaEspera.curso_codigo, func.count())
+        .where(ListaEspera.curso_codigo.in_(list(codigos)))
+        .group_by(ListaEspera.curso_codigo)
+    )
+
+
+def consulta_creditos(cedulas: Iterable[str]):
+    """
+    (cédula, créditos matriculados) de los estudiantes dados que tienen alguna matrícula.
+    """
+    return (
+        select(Matricula.estudiante_cedula, func.sum(Curso.creditos))
+        .join(Curso, Curso.codigo == Matricula.curso_codigo)
+        .where(Matricula.estudiante_cedula.in_(list(cedulas)))
+        .group_by(Matricula.estudiante_cedula)
+    )
+
+
+def sin_cupo(curso: Curso, ocupados: int) -> Optional[str]:
+    """
+    Devuelve el motivo de rechazo si el curso ya no tiene cupos, o None si aún tiene.
+    `ocupados` incluye, para la matrícula directa, a quienes están en la lista de espera.
+    """
+    if curso.cupo is not None and ocupados >= curso.cupo:
+        return f"El curso '{curso.nombre}' no tiene cupos disponibles (cupo: {curso.cupo}); puede unirse a la lista de espera."
+    return None
+
+
+def cupo_insuficiente(curso: Curso, cupo: int, ocupados: int) -> Optional[str]:
+    """
+    Devuelve el motivo de rechazo si el nuevo `cupo` del curso lo baja por debajo de
+    `ocupados` (matriculados más quienes están en la lista de espera), o None si se puede
+    aplicar. Dejar el cupo igual o subirlo siempre se puede.
+    """
+    if (curso.cupo is None or cupo < curso.cupo) and cupo < ocupados:
+        return f"El cupo del curso '{curso.nombre}' no puede ser menor que sus {ocupados} estudiantes matriculados o en lista de espera."
+    return None
+
+
+def choque_de_horario(curso_en_conflicto: Curso) -> str:
+    """
+    Motivo de rechazo cuando el estudiante ya tiene matriculado `curso_en_conflicto` y su
+    horario se cruza con el del curso pedido. Sirve cualquier objeto con `nombre` y `horario`.
+    """
+    return (
+        f"Lógica de negocio: El estudiante ya está matriculado en el curso '{curso_en_conflicto.nombre}' "
+        f"con un horario que se cruza: {curso_en_conflicto.horario}."
+    )
+
+
+def excede_creditos(semestre: int, creditos_actuales: int, curso: Curso) -> Optional[str]:
+    """
+    Devuelve el motivo de rechazo si matricular el curso supera los créditos máximos del
+    semestre del estudiante, o None si cabe.
+    """
+    maximo = creditos_maximos(semestre)
+    if creditos_actuales + curso.creditos > maximo:
+        return (
+            f"Lógica de negocio: El estudiante tiene {creditos_actuales} créditos matriculados y el curso "
+            f"'{curso.nombre}' suma {curso.creditos}; el máximo para el semestre {semestre} es {maximo}."
+        )
+    return None
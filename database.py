@@ -1,23 +1,503 @@
-from typing import Generator, Annotated
-from sqlmodel import SQLModel, create_engine, Session
-from fastapi import Depends
+import asyncio
+import contextlib
+import itertools
+import logging
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import AsyncGenerator, Awaitable, Callable, Dict, Generator, Annotated, List, Optional, TypeVar
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 
-DATABASE_URL = "sqlite:///./universidad.db"
-engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+from config import Settings, settings
 
-def create_db_and_tables():
+logger = logging.getLogger("universidad.database")
+
+DATABASE_URL = settings.database_url
+
+# Opción de ejecución con la que una sesión pide que su transacción tome el bloqueo de
+# escritura desde el inicio (ver iniciar_escritura).
+OPCION_ESCRITURA_INMEDIATA = "escritura_inmediata"
+MAX_REINTENTOS_BLOQUEO = 5
+ESPERA_BASE_REINTENTO = 0.05
+
+T = TypeVar("T")
+
+def _es_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def es_sqlite_en_memoria(url: str) -> bool:
+    database = make_url(url).database
+    return _es_sqlite(url) and (not database or database == ":memory:" or "mode=memory" in url)
+
+# Driver asíncrono equivalente a cada driver síncrono, para derivar la URL del modo async.
+DRIVERS_ASYNC = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def url_async(config: Settings = settings) -> str:
+    """
+    URL del engine asíncrono: `DATABASE_URL_ASYNC` si está definida, o `DATABASE_URL`
+    con el driver asíncrono equivalente (aiosqlite, asyncpg...).
+    """
+    if config.database_url_async:
+        return config.database_url_async
+    return _con_driver_async(config.database_url)
+
+def _con_driver_async(url: str) -> str:
+    url = make_url(url)
+    return url.set(drivername=DRIVERS_ASYNC.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+def _pragmas_sqlite(config: Settings) -> list:
+    """
+    PRAGMAs aplicados a cada conexión SQLite nueva.
+
+    WAL permite lectores concurrentes mientras hay una escritura en curso, y con
+    synchronous=NORMAL solo se hace fsync en los checkpoints (seguro en WAL).
+    busy_timeout hace que las escrituras concurrentes esperen el bloqueo en lugar
+    de fallar de inmediato con "database is locked".
+    """
+    return [
+        f"PRAGMA journal_mode={config.sqlite_journal_mode}",
+        f"PRAGMA synchronous={config.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={int(config.sqlite_busy_timeout_ms)}",
+        f"PRAGMA cache_size=-{int(config.sqlite_cache_size_kb)}",
+        f"PRAGMA mmap_size={int(config.sqlite_mmap_size)}",
+        f"PRAGMA temp_store={config.sqlite_temp_store}",
+    ]
+
+def _argumentos_engine(config: Settings, url: str) -> dict:
+    kwargs = {"echo": config.db_echo, "pool_pre_ping": not _es_sqlite(url)}
+    if _es_sqlite(url):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if es_sqlite_en_memoria(url):
+        # Una base en memoria solo existe dentro de su conexión: todos comparten la misma.
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            pool_size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
+            pool_timeout=config.db_pool_timeout,
+            pool_recycle=config.db_pool_recycle,
+        )
+    return kwargs
+
+def _configurar_sqlite(config: Settings, sync_engine: Engine):
+    pragmas = _pragmas_sqlite(config)
+
+    @event.listens_for(sync_engine, "connect")
+    def _aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def _controlar_transacciones_sqlite(sync_engine: Engine):
+    """
+    Permite iniciar transacciones SQLite con BEGIN IMMEDIATE.
+
+    El driver abre la transacción (BEGIN diferido) justo antes del primer INSERT/UPDATE/DELETE,
+    así que las lecturas previas de una escritura no la protegen: dos peticiones concurrentes
+    pueden validar sobre el mismo estado. Las transacciones iniciadas con
+    OPCION_ESCRITURA_INMEDIATA emiten BEGIN IMMEDIATE, que toma el bloqueo de escritura
+    (esperando hasta `busy_timeout`) antes de leer. Las demás siguen como siempre.
+    """
+    @event.listens_for(sync_engine, "begin")
+    def _begin_inmediato(connection):
+        if connection.get_execution_options().get(OPCION_ESCRITURA_INMEDIATA):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def crear_engine(config: Settings = settings, url: Optional[str] = None, ajustar_sqlite: bool = True) -> Engine:
+    """
+    Crea un engine a partir de la configuración.
+
+    Args:
+        config: Configuración de la aplicación (pool y PRAGMAs de SQLite).
+        url: URL de la base de datos; por defecto `config.database_url`.
+        ajustar_sqlite: Si es False no se aplican los PRAGMAs (útil para comparar en benchmarks).
+
+    Returns:
+        Engine: Engine con el pool configurado.
+    """
+    url = url or config.database_url
+    nuevo_engine = create_engine(url, **_argumentos_engine(config, url))
+    if _es_sqlite(url):
+        _controlar_transacciones_sqlite(nuevo_engine)
+        if ajustar_sqlite:
+            _configurar_sqlite(config, nuevo_engine)
+    return nuevo_engine
+
+def crear_engine_async(config: Settings = settings, url: Optional[str] = None) -> AsyncEngine:
+    """
+    Crea el engine asíncrono (aiosqlite, asyncpg...) con el mismo pool y PRAGMAs que el síncrono.
+    """
+    url = url or url_async(config)
+    nuevo_engine = create_async_engine(url, **_argumentos_engine(config, url))
+    if _es_sqlite(url):
+        _controlar_transacciones_sqlite(nuevo_engine.sync_engine)
+        _configurar_sqlite(config, nuevo_engine.sync_engine)
+    return nuevo_engine
+
+def _solo_lectura_sqlite(sync_engine: Engine):
+    """
+    Las conexiones SQLite de un engine de lectura no pueden escribir (PRAGMA query_only):
+    una escritura enrutada por error a una réplica falla en lugar de divergir de la primaria.
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _query_only(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+# El engine síncrono existe siempre: lo usan las migraciones, las herramientas de
+# consola y las respuestas en streaming. El asíncrono solo se crea con DB_MODO=async.
+engine = crear_engine()
+async_engine: Optional[AsyncEngine] = crear_engine_async() if settings.db_modo == "async" else None
+
+@dataclass
+class MotorLectura:
+    """
+    Base de datos de solo lectura a la que se enrutan las peticiones GET: una réplica
+    (DATABASE_URLS_LECTURA) o conexiones de solo lectura al mismo archivo SQLite de la
+    primaria (DB_LECTURA_SQLITE), que nunca tienen retraso.
+
+    `sano` y `retraso_segundos` los actualiza el monitor de replicas.py; hasta su primera
+    revisión el motor no recibe lecturas.
+    """
+    nombre: str
+    engine: Engine
+    async_engine: Optional[AsyncEngine]
+    local: bool
+    sano: bool = False
+    retraso_segundos: Optional[float] = None
+    ultimo_error: Optional[str] = None
+    revisado: Optional[float] = None
+
+def crear_motores_lectura(config: Settings = settings) -> List[MotorLectura]:
+    """
+    Crea los engines de lectura configurados, síncrono y (con DB_MODO=async) asíncrono.
+    """
+    urls = []
+    if config.db_lectura_sqlite:
+        if not _es_sqlite(config.database_url) or es_sqlite_en_memoria(config.database_url):
+            logger.warning("DB_LECTURA_SQLITE solo aplica a una base SQLite en archivo; se ignora.")
+        else:
+            urls.append(("local", config.database_url, url_async(config), True))
+    for numero, url in enumerate(config.database_urls_lectura, start=1):
+        urls.append((f"replica-{numero}", url, _con_driver_async(url), False))
+
+    motores = []
+    for nombre, url, url_asincrona, local in urls:
+        sincrono = crear_engine(config, url)
+        asincrono = crear_engine_async(config, url_asincrona) if config.db_modo == "async" else None
+        if _es_sqlite(url):
+            _solo_lectura_sqlite(sincrono)
+            if asincrono is not None:
+                _solo_lectura_sqlite(asincrono.sync_engine)
+        motores.append(MotorLectura(nombre, sincrono, asincrono, local))
+    return motores
+
+motores_lectura: List[MotorLectura] = crear_motores_lectura()
+_turno_de_lectura = itertools.count()
+
+# Cookie con la que un cliente lee de la primaria durante unos segundos después de una
+# escritura propia, para ver sus cambios aunque las réplicas estén atrasadas (ver replicas.py).
+COOKIE_LECTURA_PRIMARIA = "leer_primaria"
+METODOS_LECTURA = ("GET", "HEAD")
+_CLAVE_MOTOR_LECTURA = "motor_lectura"
+
+# Sesiones abiertas por motor ("primaria" o el nombre del motor de lectura).
+sesiones_por_motor: Dict[str, int] = {}
+_lock_sesiones = threading.Lock()
+
+def elegir_motor_lectura() -> Optional[MotorLectura]:
+    """
+    Reparte las lecturas entre los motores sanos por turnos; None si no hay ninguno.
+    """
+    sanos = [motor for motor in motores_lectura if motor.sano]
+    if not sanos:
+        return None
+    return sanos[next(_turno_de_lectura) % len(sanos)]
+
+def _motor_para(request: Request) -> Optional[MotorLectura]:
+    if not motores_lectura or request.method not in METODOS_LECTURA or COOKIE_LECTURA_PRIMARIA in request.cookies:
+        return None
+    return elegir_motor_lectura()
+
+def _contar_sesion(motor: Optional[MotorLectura]):
+    nombre = motor.nombre if motor else "primaria"
+    with _lock_sesiones:
+        sesiones_por_motor[nombre] = sesiones_por_motor.get(nombre, 0) + 1
+
+def engine_de_lectura(session: AsyncSession) -> Engine:
+    """
+    Engine síncrono de la base a la que se enrutó la sesión, para las respuestas en
+    streaming que abren su propia sesión.
+    """
+    motor = session.info.get(_CLAVE_MOTOR_LECTURA)
+    return motor.engine if motor else engine
+
+def describir_configuracion(engine_a_revisar: Engine = engine) -> dict:
+    """
+    Devuelve la configuración efectiva del engine: URL (sin contraseña), pool y,
+    en SQLite, los PRAGMAs tal como los reporta la propia conexión.
     """
-    Crea la base de datos y todas las tablas definidas en SQLModel.
-    Esta función se ejecuta al iniciar la aplicación.
+    pool = engine_a_revisar.pool
+    descripcion = {
+        "url": engine_a_revisar.url.render_as_string(hide_password=True),
+        "pool": type(pool).__name__,
+    }
+    if isinstance(pool, QueuePool):
+        descripcion.update(
+            pool_size=pool.size(),
+            max_overflow=getattr(pool, "_max_overflow", None),
+            pool_timeout=getattr(pool, "_timeout", None),
+            pool_recycle=getattr(pool, "_recycle", None),
+        )
+    if engine_a_revisar.dialect.name == "sqlite":
+        with engine_a_revisar.connect() as connection:
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store"):
+                descripcion[pragma] = connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+    return descripcion
+
+def reportar_configuracion():
+    """
+    Registra en el log la configuración efectiva de la base de datos al iniciar.
+    """
+    logger.info("Base de datos - modo: %s", settings.db_modo)
+    if async_engine is not None:
+        logger.info("Base de datos - url async: %s", async_engine.url.render_as_string(hide_password=True))
+    for clave, valor in describir_configuracion().items():
+        logger.info("Base de datos - %s: %s", clave, valor)
+    for motor in motores_lectura:
+        logger.info("Base de datos - lectura %s: %s", motor.nombre, motor.engine.url.render_as_string(hide_password=True))
+
+def _conexiones_a_calentar(pool) -> int:
+    return pool.size() if isinstance(pool, QueuePool) else 1
+
+def _calentar_engine(engine_a_calentar: Engine):
+    with contextlib.ExitStack() as pila:
+        for _ in range(_conexiones_a_calentar(engine_a_calentar.pool)):
+            pila.enter_context(engine_a_calentar.connect())
+
+async def _calentar_engine_async(engine_a_calentar: AsyncEngine):
+    async with contextlib.AsyncExitStack() as pila:
+        for _ in range(_conexiones_a_calentar(engine_a_calentar.pool)):
+            await pila.enter_async_context(engine_a_calentar.connect())
+
+async def calentar_conexiones():
+    """
+    Abre a la vez DB_POOL_SIZE conexiones de cada engine que atiende peticiones (la primaria
+    y los motores de lectura, del modo de DB_MODO) y las devuelve al pool, ya con los PRAGMAs
+    aplicados, para que las primeras peticiones del proceso no paguen la conexión.
+    """
+    if async_engine is not None:
+        for engine_a_calentar in [async_engine, *(motor.async_engine for motor in motores_lectura)]:
+            await _calentar_engine_async(engine_a_calentar)
+    else:
+        for engine_a_calentar in [engine, *(motor.engine for motor in motores_lectura)]:
+            await run_in_threadpool(_calentar_engine, engine_a_calentar)
+
+class SesionSincrona:
+    """
+    Envuelve una Session síncrona con la misma interfaz awaitable que AsyncSession,
+    para que los endpoints `async def` funcionen igual en los dos modos.
+
+    Cada operación que toca la base de datos se ejecuta en el threadpool, y los
+    resultados se cargan completos (igual que hace AsyncSession) antes de volver
+    al bucle de eventos.
+    """
+
+    _OPCIONES_EJECUCION = {"prebuffer_rows": True}
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    @property
+    def info(self) -> dict:
+        return self.sync_session.info
+
+    def add(self, instancia):
+        self.sync_session.add(instancia)
+
+    def add_all(self, instancias):
+        self.sync_session.add_all(instancias)
+
+    async def exec(self, statement, *, execution_options=None, **kwargs):
+        opciones = {**(execution_options or {}), **self._OPCIONES_EJECUCION}
+        return await run_in_threadpool(self.sync_session.exec, statement, execution_options=opciones, **kwargs)
+
+    async def connection(self, **kwargs):
+        return await run_in_threadpool(self.sync_session.connection, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, instancia):
+        await run_in_threadpool(self.sync_session.delete, instancia)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instancia, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, instancia, *args, **kwargs)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+def get_session_sync(request: Request) -> Generator[SesionSincrona, None, None]:
+    """
+    Dependencia que genera y cierra una sesión de base de datos síncrona (DB_MODO=sync).
+    La Session se entrega envuelta en SesionSincrona para usarse con `await`.
+    Las peticiones GET van a un motor de lectura si hay alguno sano; el resto, a la primaria.
     """
-    SQLModel.metadata.create_all(engine)
+    motor = _motor_para(request)
+    _contar_sesion(motor)
+    with Session(motor.engine if motor else engine, expire_on_commit=False) as session:
+        session.info[_CLAVE_MOTOR_LECTURA] = motor
+        yield SesionSincrona(session)
 
-def get_session() -> Generator[Session, None, None]:
+async def get_session_async(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """
-    Dependencia que genera y cierra una sesión de base de datos.
-    Se utiliza para la inyección de dependencias en los endpoints de FastAPI.
+    Dependencia que genera y cierra una AsyncSession sobre el engine asíncrono (DB_MODO=async),
+    enrutada como en `get_session_sync`.
     """
-    with Session(engine) as session:
+    motor = _motor_para(request)
+    _contar_sesion(motor)
+    async with AsyncSession(motor.async_engine if motor else async_engine, expire_on_commit=False) as session:
+        session.info[_CLAVE_MOTOR_LECTURA] = motor
         yield session
 
-SessionDep = Annotated[Session, Depends(get_session)]
\ No newline at end of file
+async def iniciar_escritura(session: AsyncSession):
+    """
+    Abre la transacción de la sesión tomando de entrada el bloqueo de escritura
+    (BEGIN IMMEDIATE en SQLite). Debe llamarse antes de cualquier consulta de la sesión.
+
+    En PostgreSQL o MySQL no cambia nada: allí las filas que se validan se bloquean
+    con `with_for_update`.
+    """
+    await session.connection(execution_options={OPCION_ESCRITURA_INMEDIATA: True})
+
+def _es_bloqueo(error: OperationalError) -> bool:
+    mensaje = str(error.orig).lower()
+    return "database is locked" in mensaje or "busy" in mensaje or "deadlock" in mensaje
+
+# SQLite admite un solo escritor: si varias peticiones del proceso esperan el bloqueo dentro
+# de `busy_timeout`, SQLite las despierta con pausas crecientes y el bloqueo queda libre
+# entre tanto. Las escrituras del proceso hacen fila en un asyncio.Lock (uno por bucle de
+# eventos) y solo compiten en SQLite con las de otros procesos.
+_ESCRITURAS_EN_FILA = _es_sqlite(DATABASE_URL)
+_filas_de_escritura: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+def _turno_de_escritura():
+    if not _ESCRITURAS_EN_FILA:
+        return contextlib.nullcontext()
+    return _filas_de_escritura.setdefault(asyncio.get_running_loop(), asyncio.Lock())
+
+async def con_reintentos(session: AsyncSession, operacion: Callable[[], Awaitable[T]]) -> T:
+    """
+    Ejecuta `operacion` (que abre su transacción con `iniciar_escritura`, valida, escribe
+    y hace commit) y, si la base de datos sigue bloqueada por otras escrituras al agotar
+    `busy_timeout`, deshace y vuelve a intentarlo con una espera exponencial. Cualquier
+    otro error deshace la transacción antes de propagarse, para no retener el bloqueo.
+
+    Raises:
+        HTTPException 503: Si la base de datos sigue bloqueada tras MAX_REINTENTOS_BLOQUEO intentos.
+    """
+    for intento in range(MAX_REINTENTOS_BLOQUEO):
+        async with _turno_de_escritura():
+            try:
+                return await operacion()
+            except OperationalError as error:
+                await session.rollback()
+                if not _es_bloqueo(error):
+                    raise
+                bloqueo = error
+            except BaseException:
+                await session.rollback()
+                raise
+        logger.warning("Escritura bloqueada (intento %d de %d): %s", intento + 1, MAX_REINTENTOS_BLOQUEO, bloqueo.orig)
+        await asyncio.sleep(ESPERA_BASE_REINTENTO * 2 ** intento * (1 + random.random()))
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="La base de datos está ocupada con otras escrituras. Intente de nuevo.",
+        headers={"Retry-After": "1"},
+    )
+
+class BaseDeDatosOcupada(Exception):
+    """
+    La base de datos siguió bloqueada por otras escrituras tras MAX_REINTENTOS_BLOQUEO intentos
+    (ver `reintentar_escritura`).
+    """
+
+def iniciar_escritura_sincrona(session: Session):
+    """
+    `iniciar_escritura` para una Session síncrona.
+    """
+    session.connection(execution_options={OPCION_ESCRITURA_INMEDIATA: True})
+
+def reintentar_escritura(session: Session, operacion: Callable[[], T]) -> T:
+    """
+    `con_reintentos` para una Session síncrona fuera del bucle de eventos (la carga masiva,
+    en el threadpool o por consola): `operacion` abre su transacción con
+    `iniciar_escritura_sincrona`, valida, escribe y hace commit. Estas escrituras no hacen
+    fila con las de las peticiones del proceso (ver `_turno_de_escritura`): compiten con
+    ellas en SQLite, con `busy_timeout` y estos reintentos.
+
+    Raises:
+        BaseDeDatosOcupada: Si la base de datos sigue bloqueada tras MAX_REINTENTOS_BLOQUEO intentos.
+    """
+    for intento in range(MAX_REINTENTOS_BLOQUEO):
+        try:
+            return operacion()
+        except OperationalError as error:
+            session.rollback()
+            if not _es_bloqueo(error):
+                raise
+            bloqueo = error
+        except BaseException:
+            session.rollback()
+            raise
+        logger.warning("Escritura bloqueada (intento %d de %d): %s", intento + 1, MAX_REINTENTOS_BLOQUEO, bloqueo.orig)
+        time.sleep(ESPERA_BASE_REINTENTO * 2 ** intento * (1 + random.random()))
+    raise BaseDeDatosOcupada("La base de datos está ocupada con otras escrituras.") from bloqueo
+
+@contextlib.asynccontextmanager
+async def sesion_independiente() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Sesión para tareas fuera de una petición (por ejemplo en segundo plano), con la misma
+    interfaz que la de los endpoints según DB_MODO.
+    """
+    if async_engine is not None:
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    else:
+        with Session(engine, expire_on_commit=False) as session:
+            yield SesionSincrona(session)
+
+# Dependencia que genera y cierra una sesión de base de datos según DB_MODO.
+# Se utiliza para la inyección de dependencias en los endpoints de FastAPI.
+get_session = get_session_async if async_engine is not None else get_session_sync
+
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
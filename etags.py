@@ -0,0 +1,121 @@
+"""
+Peticiones condicionales (ETag / If-None-Match) para los endpoints de lectura.
+
+El ETag se deriva de la versión del recurso guardada en `version_recurso`, que los
+endpoints de escritura incrementan en la misma transacción del cambio (ver eventos.py).
+Comprobarlo cuesta una lectura por clave primaria; si el cliente ya tiene la versión
+vigente se responde 304 sin consultar el resto de datos ni serializar nada.
+"""
+import hashlib
+from typing import Dict, Optional, Sequence, Tuple
+
+from fastapi import Request, Response, status
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import VersionRecurso
+
+CACHE_CONTROL = "no-cache"
+
+
+def calcular_etag(recurso: str, version: int, variante: str = "") -> str:
+    """
+    ETag fuerte para una representación de un recurso. La variante distingue las distintas
+    representaciones de la misma versión (ruta, filtros, formato).
+    """
+    etiqueta = f"{recurso}-v{version}"
+    if variante:
+        etiqueta += "-" + hashlib.sha1(variante.encode("utf-8")).hexdigest()[:12]
+    return f'"{etiqueta}"'
+
+
+def _coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = [candidato.strip() for candidato in if_none_match.split(",")]
+    # If-None-Match usa comparación débil: se ignora el prefijo W/.
+    return "*" in candidatos or any(candidato.removeprefix("W/") == etag for candidato in candidatos)
+
+
+def calcular_etag_de_varios(versiones: Sequence[Tuple[str, int]], variante: str = "") -> str:
+    """
+    ETag fuerte para una representación que combina varios recursos, en el orden dado:
+    cambia si cambia cualquiera de sus versiones.
+    """
+    huella = ",".join(f"{recurso}-v{version}" for recurso, version in versiones) + "|" + variante
+    return f'"varios-{hashlib.sha1(huella.encode("utf-8")).hexdigest()[:16]}"'
+
+
+def _responder(request: Request, response: Response, etag: str) -> Optional[Response]:
+    if _coincide(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
+
+
+async def version_de(session: AsyncSession, recurso: str) -> int:
+    fila = await session.get(VersionRecurso, recurso)
+    return fila.version if fila else 0
+
+
+async def versiones_de(session: AsyncSession, recursos: Sequence[str]) -> Dict[str, int]:
+    """
+    Versiones de varios recursos con una sola consulta; los que nunca cambiaron no aparecen.
+    """
+    statement = select(VersionRecurso.recurso, VersionRecurso.version).where(VersionRecurso.recurso.in_(list(recursos)))
+    return dict((await session.exec(statement)).all())
+
+
+async def verificar_version(
+    session: AsyncSession, request: Request, response: Response, recurso: str, variante: str = ""
+) -> Tuple[int, Optional[Response]]:
+    """
+    Como `verificar_etag`, pero devuelve también la versión leída. Los endpoints que
+    responden desde la caché la guardan junto al cuerpo (ver cache.py), para no servir con
+    este ETag un cuerpo cargado antes de una escritura hecha en otro worker.
+    """
+    version = await version_de(session, recurso)
+    return version, _responder(request, response, calcular_etag(recurso, version, variante))
+
+
+async def verificar_etag(
+    session: AsyncSession, request: Request, response: Response, recurso: str, variante: str = ""
+) -> Optional[Response]:
+    """
+    Calcula el ETag vigente del recurso. Si coincide con `If-None-Match` devuelve la
+    respuesta 304 que el endpoint debe retornar; si no, lo agrega a `response` y devuelve None.
+    """
+    _, no_modificado = await verificar_version(session, request, response, recurso, variante)
+    return no_modificado
+
+
+async def verificar_etag_de_varios(
+    session: AsyncSession, request: Request, response: Response, recursos: Sequence[str], variante: str = ""
+) -> Optional[Response]:
+    """
+    Como `verificar_etag`, para una respuesta que reúne varios recursos (por ejemplo los
+    estudiantes de varios cursos): el ETag se calcula con las versiones de todos, leídas con
+    una sola consulta.
+    """
+    versiones = await versiones_de(session, recursos)
+    etag = calcular_etag_de_varios([(recurso, versiones.get(recurso, 0)) for recurso in recursos], variante)
+    return _responder(request, response, etag)
+
+
+def copiar_etag(origen: Response, destino: Response) -> Response:
+    """
+    Copia las cabeceras de caché HTTP a una respuesta que el endpoint devuelve directamente
+    (por ejemplo un StreamingResponse), ya que FastAPI no le traslada las de `response`.
+    """
+    for cabecera in ("ETag", "Cache-Control"):
+        if cabecera in origen.headers:
+            destino.headers[cabecera] = origen.headers[cabecera]
+    return destino
+
+
+def variante_de_consulta(request: Request, ruta: str) -> str:
+    """
+    Variante para listados: la ruta más los parámetros de consulta en orden estable.
+    """
+    return ruta + "?" + "&".join(f"{clave}={valor}" for clave, valor in sorted(request.query_params.multi_items()))
@@ -0,0 +1,184 @@
+"""
+Efectos secundarios de las escrituras sobre cursos, estudiantes y matrículas.
+
+Los endpoints llaman a estas funciones antes del commit. Lo que vive en la base de datos
+(las versiones que alimentan los ETag, las tablas de resumen de los reportes, el horario
+ocupado de los estudiantes y el registro de cambios) se escribe en la misma transacción que el cambio; lo que vive en memoria (la
+caché de lecturas y el aviso al difusor de cambios) se aplica solo cuando el commit
+termina bien.
+"""
+from typing import Callable, Iterable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import agendas
+import cache
+import cambios
+import crud
+import resumenes
+from models import VersionRecurso
+
+_CLAVE_PENDIENTES = "acciones_despues_del_commit"
+
+
+def recurso_curso(codigo: str) -> str:
+    return f"curso:{codigo}"
+
+
+def recurso_estudiante(cedula: str) -> str:
+    return f"estudiante:{cedula}"
+
+
+RECURSO_CURSOS = "cursos"
+RECURSO_ESTUDIANTES = "estudiantes"
+
+
+def despues_del_commit(session: Session, accion: Callable[[], None]):
+    """
+    Programa una acción en memoria para cuando la transacción actual se confirme.
+    Si la transacción se revierte, la acción se descarta.
+    """
+    session.info.setdefault(_CLAVE_PENDIENTES, []).append(accion)
+
+
+@event.listens_for(Session, "after_commit")
+def _ejecutar_pendientes(session: Session):
+    for accion in session.info.pop(_CLAVE_PENDIENTES, []):
+        accion()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session: Session):
+    session.info.pop(_CLAVE_PENDIENTES, None)
+
+
+def _upsert_versiones(dialecto: str):
+    if dialecto in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialecto == "sqlite" else postgresql.insert
+        return insert(VersionRecurso).values(version=1).on_conflict_do_update(
+            index_elements=[VersionRecurso.recurso],
+            set_={"version": VersionRecurso.version + 1},
+        )
+    if dialecto in ("mysql", "mariadb"):
+        return mysql.insert(VersionRecurso).values(version=1).on_duplicate_key_update(version=VersionRecurso.version + 1)
+    raise RuntimeError(f"incrementar_versiones no admite la base de datos {dialecto!r} (solo SQLite, PostgreSQL y MySQL).")
+
+
+def incrementar_versiones(session: Session, recursos: Iterable[str]):
+    """
+    Incrementa (o crea en 1) la versión de cada recurso con un único UPSERT.
+
+    Raises:
+        RuntimeError: Si el motor no es SQLite, PostgreSQL ni MySQL, que tienen cada uno su UPSERT.
+    """
+    recursos = sorted(set(recursos))
+    if not recursos:
+        return
+    statement = _upsert_versiones(session.get_bind().dialect.name)
+    session.exec(statement, params=[{"recurso": recurso} for recurso in recursos])
+
+
+def _registrar_cambios(session: Session, entradas: List[cambios.EntradaCambio]):
+    cambios.registrar(session, entradas)
+    despues_del_commit(session, cambios.difusor.avisar)
+
+
+def _cedulas_de_curso(session: Session, codigo: str) -> List[str]:
+    return list(session.exec(crud.CEDULAS_DE_CURSO, params={"codigo": codigo}).all())
+
+
+def _codigos_de_estudiante(session: Session, cedula: str) -> List[str]:
+    return list(session.exec(crud.CODIGOS_DE_ESTUDIANTE, params={"cedula": cedula}).all())
+
+
+def _curso_creado(session: Session, codigo: str):
+    incrementar_versiones(session, [recurso_curso(codigo), RECURSO_CURSOS])
+    _registrar_cambios(session, [(cambios.CURSO_CREADO, codigo, None)])
+    despues_del_commit(session, cache.invalidar_listas_cursos)
+
+
+def _curso_modificado(session: Session, codigo: str, eliminado: bool, horario_modificado: bool):
+    cedulas = _cedulas_de_curso(session, codigo)
+    incrementar_versiones(session, [recurso_curso(codigo), RECURSO_CURSOS] + [recurso_estudiante(c) for c in cedulas])
+    resumenes.marcar(session, cedulas, [codigo])
+    if horario_modificado:
+        agendas.marcar(session, cedulas)
+    _registrar_cambios(session, [(cambios.CURSO_ELIMINADO if eliminado else cambios.CURSO_MODIFICADO, codigo, None)])
+    despues_del_commit(session, lambda: cache.invalidar_curso(codigo, cedulas))
+
+
+def _estudiante_creado(session: Session, cedula: str):
+    incrementar_versiones(session, [recurso_estudiante(cedula), RECURSO_ESTUDIANTES])
+    _registrar_cambios(session, [(cambios.ESTUDIANTE_CREADO, None, cedula)])
+
+
+def _estudiante_modificado(session: Session, cedula: str, eliminado: bool):
+    codigos = _codigos_de_estudiante(session, cedula)
+    incrementar_versiones(session, [recurso_estudiante(cedula), RECURSO_ESTUDIANTES] + [recurso_curso(c) for c in codigos])
+    resumenes.marcar(session, [cedula], codigos)
+    # Las matrículas de un estudiante eliminado las borra después limpieza.py, que registra
+    # entonces `matricula.eliminada` para cada curso.
+    _registrar_cambios(session, [(cambios.ESTUDIANTE_ELIMINADO if eliminado else cambios.ESTUDIANTE_MODIFICADO, None, cedula)])
+    despues_del_commit(session, lambda: cache.invalidar_estudiante(cedula, codigos))
+
+
+def _matriculas_cambiadas(session: Session, pares: List[Tuple[str, str]], eliminadas: bool):
+    recursos = [recurso for cedula, codigo in pares for recurso in (recurso_estudiante(cedula), recurso_curso(codigo))]
+    incrementar_versiones(session, recursos)
+    resumenes.marcar(session, [cedula for cedula, _ in pares], [codigo for _, codigo in pares])
+    agendas.marcar(session, [cedula for cedula, _ in pares])
+    tipo = cambios.MATRICULA_ELIMINADA if eliminadas else cambios.MATRICULA_CREADA
+    _registrar_cambios(session, [(tipo, codigo, cedula) for cedula, codigo in pares])
+    despues_del_commit(session, lambda: cache.invalidar_matriculas(pares))
+
+
+def entidades_importadas(session: Session, nombre_entidad: str):
+    """
+    Registra una importación masiva: cambian los listados de la colección importada.
+    """
+    if nombre_entidad == "cursos":
+        incrementar_versiones(session, [RECURSO_CURSOS])
+        _registrar_cambios(session, [(cambios.CURSOS_IMPORTADOS, None, None)])
+        despues_del_commit(session, cache.invalidar_listas_cursos)
+    else:
+        incrementar_versiones(session, [RECURSO_ESTUDIANTES])
+        _registrar_cambios(session, [(cambios.ESTUDIANTES_IMPORTADOS, None, None)])
+
+
+async def curso_creado(session: AsyncSession, codigo: str):
+    await session.run_sync(_curso_creado, codigo)
+
+
+async def curso_modificado(session: AsyncSession, codigo: str, eliminado: bool = False, horario_modificado: bool = False):
+    """
+    Registra la modificación o eliminación (lógica) de un curso. Invalida también los datos
+    de los estudiantes matriculados, que dejan de verlo aunque sus matrículas sigan en la
+    base hasta la limpieza. Con `horario_modificado` se recalcula su horario ocupado (ver
+    agendas.py).
+    """
+    await session.run_sync(_curso_modificado, codigo, eliminado, horario_modificado)
+
+
+async def estudiante_creado(session: AsyncSession, cedula: str):
+    await session.run_sync(_estudiante_creado, cedula)
+
+
+async def estudiante_modificado(session: AsyncSession, cedula: str, eliminado: bool = False):
+    """
+    Registra la modificación o eliminación (lógica) de un estudiante. Invalida también los
+    datos de sus cursos, que dejan de listarlo aunque sus matrículas sigan en la base hasta
+    la limpieza.
+    """
+    await session.run_sync(_estudiante_modificado, cedula, eliminado)
+
+
+async def matriculas_cambiadas(session: AsyncSession, pares: Iterable[Tuple[str, str]], eliminadas: bool = False):
+    """
+    Registra matrículas creadas (o eliminadas, con `eliminadas`), como pares (cédula, código).
+    """
+    pares = list(pares)
+    if pares:
+        await session.run_sync(_matriculas_cambiadas, pares, eliminadas)
@@ -0,0 +1,268 @@
+"""
+Interpretación de los horarios de los cursos como franjas semanales (día, inicio, fin).
+
+`Curso.horario` sigue siendo texto libre, pero al guardarlo se descompone en filas de
+`franja_horaria`, indexadas por curso y día, para detectar choques parciales
+("Lun 8-10" y "Lun 9-11") en lugar de comparar cadenas. Los choques con los cursos que
+ya tiene un estudiante se comprueban contra su agenda, una máscara de bloques de la
+semana (ver `HorarioOcupado` y agendas.py).
+
+Formatos reconocidos (sin distinguir mayúsculas ni tildes):
+
+    Lun 8-10
+    Lunes 08:00 - 10:30
+    Lun y Mie 14-16        Lun, Mie 14-16        Lun/Mie 14-16
+    Lun-Vie 7-8            Lun a Vie 7:00 a 8:00
+    Lun 8-10; Jue 14-16
+
+Los horarios que no siguen ninguno de estos formatos se conservan tal cual y, como
+hasta ahora, solo chocan con otro curso que tenga exactamente el mismo texto.
+"""
+import logging
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import orjson
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, insert, select
+
+from database import engine
+from models import Curso, FranjaHoraria
+
+logger = logging.getLogger("universidad.horarios")
+
+DIAS = ("Lun", "Mar", "Mie", "Jue", "Vie", "Sab", "Dom")
+MINUTOS_POR_DIA = 24 * 60
+# Resolución de las máscaras de horario ocupado (ver `mascara`).
+MINUTOS_POR_BLOQUE = 5
+BLOQUES_POR_DIA = MINUTOS_POR_DIA // MINUTOS_POR_BLOQUE
+
+_NOMBRES_DIA = {
+    "lunes": 0, "lun": 0, "lu": 0,
+    "martes": 1, "mar": 1, "ma": 1,
+    "miercoles": 2, "mie": 2, "mi": 2,
+    "jueves": 3, "jue": 3, "ju": 3,
+    "viernes": 4, "vie": 4, "vi": 4,
+    "sabado": 5, "sab": 5, "sa": 5,
+    "domingo": 6, "dom": 6, "do": 6,
+}
+_DIA = "(?:" + "|".join(sorted(_NOMBRES_DIA, key=len, reverse=True)) + r")\.?"
+_HORA = r"\d{1,2}(?::\d{2})?"
+_BLOQUE = re.compile(
+    rf"(?P<dias>\b{_DIA}(?:\s*(?:,|/|-|\by\b|\ba\b)\s*{_DIA})*)\s+"
+    rf"(?P<inicio>{_HORA})\s*(?:-|\ba\b)\s*(?P<fin>{_HORA})\b"
+)
+_DIAS_DEL_BLOQUE = re.compile(rf"({_DIA})|(-|\ba\b)")
+_SEPARADORES = re.compile(r"[\s,;/|y]*")
+
+
+class Franja(NamedTuple):
+    dia: int
+    inicio: int
+    fin: int
+
+    def se_solapa(self, otra: "Franja") -> bool:
+        return self.dia == otra.dia and self.inicio < otra.fin and otra.inicio < self.fin
+
+    def __str__(self) -> str:
+        return f"{DIAS[self.dia]} {hora(self.inicio)}-{hora(self.fin)}"
+
+
+def hora(minutos: int) -> str:
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def _normalizar(texto: str) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return sin_tildes.lower()
+
+
+def _minutos(hora: str) -> Optional[int]:
+    horas, _, minutos = hora.partition(":")
+    horas, minutos = int(horas), int(minutos or 0)
+    if minutos >= 60 or horas * 60 + minutos > MINUTOS_POR_DIA:
+        return None
+    return horas * 60 + minutos
+
+
+def _dias(texto: str) -> List[int]:
+    """
+    Expande la lista de días de un bloque: "lun, mie" -> [0, 2] y "lun-vie" -> [0..4].
+    """
+    dias: List[int] = []
+    rango = False
+    for nombre, guion in _DIAS_DEL_BLOQUE.findall(texto):
+        if guion:
+            rango = True
+            continue
+        dia = _NOMBRES_DIA[nombre.rstrip(".")]
+        if rango and dias and dias[-1] < dia:
+            dias.extend(range(dias[-1] + 1, dia + 1))
+        else:
+            dias.append(dia)
+        rango = False
+    return dias
+
+
+@lru_cache(maxsize=4096)
+def interpretar(horario: Optional[str]) -> Optional[Tuple[Franja, ...]]:
+    """
+    Convierte un horario en sus franjas semanales, ordenadas y sin repetir.
+
+    Returns:
+        Las franjas, o None si el texto no sigue ninguno de los formatos reconocidos.
+    """
+    if not horario:
+        return None
+    texto = _normalizar(horario)
+    franjas = set()
+    posicion = 0
+    for bloque in _BLOQUE.finditer(texto):
+        if _SEPARADORES.fullmatch(texto, posicion, bloque.start()) is None:
+            return None
+        inicio, fin = _minutos(bloque["inicio"]), _minutos(bloque["fin"])
+        if inicio is None or fin is None or inicio >= fin:
+            return None
+        franjas.update(Franja(dia, inicio, fin) for dia in _dias(bloque["dias"]))
+        posicion = bloque.end()
+    if not franjas or _SEPARADORES.fullmatch(texto, posicion) is None:
+        return None
+    return tuple(sorted(franjas))
+
+
+class Agenda:
+    """
+    Horario ocupado de un estudiante, para validar varias matrículas en memoria
+    (por ejemplo un lote) con las mismas reglas que `HorarioOcupado.choque`, la
+    comprobación de la matrícula individual sobre agenda_estudiante (ver agendas.py).
+    Guarda los cursos que se le agregan (cualquier objeto con `horario`, como una fila de
+    crud.py).
+    """
+
+    def __init__(self):
+        self._franjas: Dict[int, List[Tuple[Franja, Any]]] = {}
+        self._textos: Dict[str, Any] = {}
+
+    def choque(self, horario: str) -> Optional[Any]:
+        """
+        Devuelve el curso agregado con el que choca el horario, o None si está libre.
+        """
+        franjas = interpretar(horario)
+        if franjas is None:
+            return self._textos.get(horario)
+        for franja in franjas:
+            for ocupada, curso in self._franjas.get(franja.dia, ()):
+                if franja.se_solapa(ocupada):
+                    return curso
+        return None
+
+    def agregar(self, curso: Any):
+        franjas = interpretar(curso.horario)
+        if franjas is None:
+            self._textos.setdefault(curso.horario, curso)
+            return
+        for franja in franjas:
+            self._franjas.setdefault(franja.dia, []).append((franja, curso))
+
+
+def mascara(franjas: Iterable[Franja]) -> int:
+    """
+    Bloques de MINUTOS_POR_BLOQUE minutos de la semana que tocan las franjas, como bits de
+    un entero (el bit i es el bloque i contado desde el lunes a medianoche). Un bloque
+    tocado en parte cuenta como ocupado: si dos máscaras no comparten bits, las franjas
+    no se cruzan; si comparten alguno, hay que confirmarlo con las franjas.
+    """
+    bits = 0
+    for franja in franjas:
+        primero = franja.dia * BLOQUES_POR_DIA + franja.inicio // MINUTOS_POR_BLOQUE
+        ultimo = franja.dia * BLOQUES_POR_DIA - (-franja.fin // MINUTOS_POR_BLOQUE)
+        bits |= ((1 << (ultimo - primero)) - 1) << primero
+    return bits
+
+
+class HorarioOcupado(NamedTuple):
+    """
+    Horario semanal ocupado de un estudiante tal como lo guarda agenda_estudiante (ver
+    agendas.py): el horario de cada curso matriculado, por código, y la máscara de los
+    bloques que ocupan.
+    """
+    cursos: Dict[str, str]
+    ocupacion: int = 0
+
+    @classmethod
+    def de_cursos(cls, cursos: Dict[str, str]) -> "HorarioOcupado":
+        return cls(cursos, mascara(franja for horario in cursos.values() for franja in interpretar(horario) or ()))
+
+    @classmethod
+    def de_fila(cls, cursos: str, ocupacion: bytes) -> "HorarioOcupado":
+        return cls(orjson.loads(cursos), int.from_bytes(ocupacion, "little"))
+
+    def a_fila(self) -> dict:
+        return {
+            "cursos": orjson.dumps(self.cursos, option=orjson.OPT_SORT_KEYS).decode(),
+            "ocupacion": self.ocupacion.to_bytes((self.ocupacion.bit_length() + 7) // 8, "little"),
+        }
+
+    def choque(self, horario: str, excluir: Optional[str] = None) -> Optional[str]:
+        """
+        Código del curso, distinto de `excluir`, cuyo horario se cruza con `horario`, o
+        None. Si la máscara no coincide, no recorre los cursos. Como en la consulta por
+        índice, un horario que no se pudo interpretar solo choca con otro idéntico.
+        """
+        franjas = interpretar(horario)
+        if franjas is None:
+            return next((codigo for codigo, otro in self.cursos.items() if otro == horario and codigo != excluir), None)
+        if not self.ocupacion & mascara(franjas):
+            return None
+        for codigo, otro in self.cursos.items():
+            if codigo != excluir and any(f.se_solapa(o) for f in franjas for o in interpretar(otro) or ()):
+                return codigo
+        return None
+
+    def franjas(self) -> List[Tuple[Franja, str]]:
+        """
+        Franjas de los cursos con horario interpretable, con su código, en orden semanal.
+        """
+        return sorted((franja, codigo) for codigo, horario in self.cursos.items() for franja in interpretar(horario) or ())
+
+
+def filas_franjas(codigo: str, horario: Optional[str]) -> List[dict]:
+    """
+    Filas de `franja_horaria` para un curso, listas para un INSERT masivo.
+    """
+    return [franja._asdict() | {"curso_codigo": codigo} for franja in interpretar(horario) or []]
+
+
+def crear_franjas(codigo: str, horario: Optional[str]) -> List[FranjaHoraria]:
+    return [FranjaHoraria(**fila) for fila in filas_franjas(codigo, horario)]
+
+
+def migrar_horarios(engine_a_migrar: Union[Engine, Connection] = engine) -> int:
+    """
+    Genera las franjas de los cursos que aún no tienen ninguna (los creados antes de
+    existir la tabla, o insertados sin pasar por la API). Los horarios que no se pueden
+    interpretar se dejan sin franjas. Si no hay nada que migrar, no escribe nada.
+    Con una conexión, escribe dentro de su transacción (ver migraciones/).
+
+    Returns:
+        int: Número de cursos migrados.
+    """
+    sin_franjas = select(Curso.codigo, Curso.horario).where(
+        ~select(FranjaHoraria.id).where(FranjaHoraria.curso_codigo == Curso.codigo).exists()
+    )
+    with Session(engine_a_migrar) as session:
+        filas = []
+        migrados = 0
+        for codigo, horario in session.exec(sin_franjas):
+            nuevas = filas_franjas(codigo, horario)
+            if nuevas:
+                filas.extend(nuevas)
+                migrados += 1
+        if filas:
+            session.exec(insert(FranjaHoraria), params=filas)
+            session.commit()
+    if migrados:
+        logger.info("Horarios migrados a franjas: %s cursos", migrados)
+    return migrados
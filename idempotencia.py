@@ -0,0 +1,141 @@
+"""
+Claves de idempotencia (cabecera `Idempotency-Key`) para las peticiones que escriben.
+
+Un cliente que reintenta una escritura (por ejemplo POST /estudiantes/ o la matrícula tras
+un timeout) envía la misma clave en cada intento. La primera petición con la clave se
+ejecuta normalmente y su respuesta se guarda; los reintentos reciben la respuesta guardada,
+con la cabecera `Idempotent-Replayed: true`, sin ejecutar el endpoint ni consultar la base
+de datos. Si llega un reintento mientras la primera sigue en curso, espera su resultado.
+
+- La clave vale para el mismo método y ruta. Reutilizarla con otro cuerpo responde 422.
+- Se guardan las respuestas definitivas (2xx y 4xx). Las 5xx y las 429 no se guardan: el
+  reintento vuelve a ejecutarse.
+- Las respuestas se guardan en memoria del proceso (cache.respuestas_idempotentes) durante
+  IDEMPOTENCIA_TTL_SEGUNDOS. Con varios workers, un reintento que llega a otro worker se
+  ejecuta de nuevo y obtiene la respuesta que corresponda (por ejemplo 409 si ya existe).
+"""
+import asyncio
+import hashlib
+import json
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from cache import respuestas_idempotentes
+
+CABECERA_CLAVE = b"idempotency-key"
+CABECERA_REPETIDA = (b"idempotent-replayed", b"true")
+METODOS = ("POST", "PUT", "PATCH", "DELETE")
+LARGO_MAXIMO_CLAVE = 255
+MAX_BYTES_RESPUESTA = 1024 * 1024
+
+# (huella del cuerpo de la petición, estado, cabeceras, cuerpo de la respuesta)
+RespuestaGuardada = Tuple[str, int, List[Tuple[bytes, bytes]], bytes]
+
+
+def _se_guarda(estado: int) -> bool:
+    return estado < 500 and estado != 429
+
+
+async def _responder(send, estado: int, cabeceras: List[Tuple[bytes, bytes]], cuerpo: bytes):
+    await send({"type": "http.response.start", "status": estado, "headers": cabeceras})
+    await send({"type": "http.response.body", "body": cuerpo})
+
+
+async def _error(send, estado: int, detalle: str):
+    cuerpo = json.dumps({"detail": detalle}, ensure_ascii=False).encode("utf-8")
+    await _responder(send, estado, [(b"content-type", b"application/json"), (b"content-length", str(len(cuerpo)).encode())], cuerpo)
+
+
+async def _huella_del_cuerpo(receive, huella) -> str:
+    """
+    Termina de leer el cuerpo de la petición y devuelve su huella.
+    """
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] != "http.request":
+            break
+        huella.update(mensaje.get("body", b""))
+        if not mensaje.get("more_body", False):
+            break
+    return huella.hexdigest()
+
+
+class MiddlewareIdempotencia:
+    """
+    Middleware ASGI que guarda y repite las respuestas de las escrituras con `Idempotency-Key`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._en_curso: Dict[Hashable, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METODOS:
+            await self.app(scope, receive, send)
+            return
+        clave_cliente = next((valor for nombre, valor in scope["headers"] if nombre == CABECERA_CLAVE), None)
+        if clave_cliente is None:
+            await self.app(scope, receive, send)
+            return
+        if not clave_cliente.strip() or len(clave_cliente) > LARGO_MAXIMO_CLAVE:
+            await _error(send, 400, f"La cabecera Idempotency-Key debe tener entre 1 y {LARGO_MAXIMO_CLAVE} caracteres.")
+            return
+
+        clave = (scope["method"], scope["path"], clave_cliente)
+        loop = asyncio.get_running_loop()
+        while True:
+            guardada: Optional[RespuestaGuardada] = respuestas_idempotentes.obtener(clave)
+            if guardada is not None:
+                await self._repetir(guardada, receive, send)
+                return
+            en_curso = self._en_curso.get(clave)
+            if en_curso is None or en_curso.get_loop() is not loop:
+                break
+            # La primera petición con la clave sigue en curso: se espera y se vuelve a mirar.
+            # Si su respuesta no se guardó (5xx), esta se ejecuta.
+            await asyncio.shield(en_curso)
+
+        futuro = loop.create_future()
+        self._en_curso[clave] = futuro
+        try:
+            await self._ejecutar(clave, scope, receive, send)
+        finally:
+            del self._en_curso[clave]
+            futuro.set_result(None)
+
+    async def _repetir(self, guardada: RespuestaGuardada, receive, send):
+        huella_guardada, estado, cabeceras, cuerpo = guardada
+        if await _huella_del_cuerpo(receive, hashlib.sha256()) != huella_guardada:
+            await _error(send, 422, "La Idempotency-Key ya se usó con otro cuerpo de petición.")
+            return
+        await _responder(send, estado, cabeceras + [CABECERA_REPETIDA], cuerpo)
+
+    async def _ejecutar(self, clave: Hashable, scope, receive, send):
+        huella = hashlib.sha256()
+        cuerpo_leido = False
+        respuesta = {"estado": 500, "cabeceras": [], "partes": [], "bytes": 0}
+
+        async def recibir():
+            nonlocal cuerpo_leido
+            mensaje = await receive()
+            if mensaje["type"] == "http.request":
+                huella.update(mensaje.get("body", b""))
+                cuerpo_leido = not mensaje.get("more_body", False)
+            return mensaje
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["estado"] = mensaje["status"]
+                respuesta["cabeceras"] = list(mensaje.get("headers", []))
+            elif mensaje["type"] == "http.response.body":
+                cuerpo = mensaje.get("body", b"")
+                respuesta["bytes"] += len(cuerpo)
+                if respuesta["bytes"] <= MAX_BYTES_RESPUESTA:
+                    respuesta["partes"].append(cuerpo)
+            await send(mensaje)
+
+        await self.app(scope, recibir, enviar)
+        if not _se_guarda(respuesta["estado"]) or respuesta["bytes"] > MAX_BYTES_RESPUESTA:
+            return
+        # Si el endpoint respondió sin leer todo el cuerpo, se lee el resto para la huella.
+        huella_final = huella.hexdigest() if cuerpo_leido else await _huella_del_cuerpo(receive, huella)
+        respuestas_idempotentes.guardar(clave, (huella_final, respuesta["estado"], respuesta["cabeceras"], b"".join(respuesta["partes"])))
@@ -0,0 +1,194 @@
+"""
+Limpieza en segundo plano de los estudiantes y cursos eliminados (borrado lógico).
+
+DELETE /estudiantes/{cedula}/ y DELETE /cursos/{codigo}/ solo ponen `activo` en falso y
+responden: las lecturas dejan de ver la fila de inmediato (ver crud.py), sin cargar ni
+borrar dentro de la petición las matrículas, que pueden ser cientos. El limpiador borra
+después, con DELETE por conjuntos de hasta TAMANO_LOTE filas por transacción, las
+matrículas, las entradas de lista de espera y las franjas horarias que dependen de las
+filas inactivas y, cuando ya no queda ninguna, las propias filas. Cada lote es una
+transacción de escritura corta (database.iniciar_escritura), así que las matrículas
+concurrentes esperan a lo sumo un lote, no el borrado completo.
+
+Hasta que se borran, las matrículas de una fila inactiva siguen ocupando cupo, horario y
+créditos. Cada lote registra sus matrículas como eliminadas (eventos.py: versiones, caché,
+resúmenes y `matricula.eliminada` en el registro de cambios) y ofrece los cupos y créditos
+liberados a las listas de espera.
+
+Las eliminaciones avisan con `eliminacion_pendiente` antes del commit; el aviso solo llega
+si la transacción se confirma. Al iniciar la aplicación se limpia lo que haya quedado
+pendiente (por ejemplo, si el proceso se detuvo a mitad de una limpieza).
+"""
+import asyncio
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, false, tuple_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import eventos
+import lista_espera
+from crud import TAMANO_LOTE_IN
+from database import con_reintentos, iniciar_escritura, sesion_independiente
+from models import Curso, Estudiante, FranjaHoraria, ListaEspera, Matricula
+
+logger = logging.getLogger("universidad.limpieza")
+
+# Filas dependientes (matrículas, entradas de lista de espera, franjas) borradas por transacción.
+TAMANO_LOTE = 1000
+ESPERA_AGRUPAR_SEGUNDOS = 0.05
+ESPERA_TRAS_ERROR_SEGUNDOS = 1.0
+
+
+def pendientes(session: Session) -> Tuple[List[str], List[str]]:
+    """
+    Cédulas y códigos de hasta TAMANO_LOTE_IN estudiantes y cursos inactivos, por los
+    índices parciales de las filas inactivas.
+    """
+    cedulas = session.exec(select(Estudiante.cedula).where(Estudiante.activo == false()).limit(TAMANO_LOTE_IN)).all()
+    codigos = session.exec(select(Curso.codigo).where(Curso.activo == false()).limit(TAMANO_LOTE_IN)).all()
+    return list(cedulas), list(codigos)
+
+
+def limpiar_lote(session: Session, cedulas: Sequence[str], codigos: Sequence[str]) -> Tuple[List[Tuple[str, str]], bool]:
+    """
+    Borra, en la transacción de escritura de la sesión, hasta TAMANO_LOTE filas que dependen
+    de los estudiantes y cursos inactivos dados. Si no queda ninguna, borra esos estudiantes
+    y cursos.
+
+    Returns:
+        Tuple[List[Tuple[str, str]], bool]: Matrículas borradas, como pares (cédula, código),
+            e indicación de si ya se borraron los estudiantes y cursos.
+    """
+    restantes = TAMANO_LOTE
+    pares: List[Tuple[str, str]] = []
+    clave_matricula = tuple_(Matricula.estudiante_cedula, Matricula.curso_codigo)
+    for campo, valores in ((Matricula.estudiante_cedula, cedulas), (Matricula.curso_codigo, codigos)):
+        if not valores or not restantes:
+            continue
+        encontrados = [tuple(fila) for fila in session.exec(
+            select(Matricula.estudiante_cedula, Matricula.curso_codigo).where(campo.in_(valores)).limit(restantes)
+        ).all()]
+        if encontrados:
+            session.exec(delete(Matricula).where(clave_matricula.in_(encontrados)))
+            pares += encontrados
+            restantes -= len(encontrados)
+
+    dependientes = (
+        (ListaEspera, ListaEspera.estudiante_cedula, cedulas),
+        (ListaEspera, ListaEspera.curso_codigo, codigos),
+        (FranjaHoraria, FranjaHoraria.curso_codigo, codigos),
+    )
+    for tabla, campo, valores in dependientes:
+        if not valores or not restantes:
+            continue
+        ids = session.exec(select(tabla.id).where(campo.in_(valores)).limit(restantes)).all()
+        if ids:
+            session.exec(delete(tabla).where(tabla.id.in_(ids)))
+            restantes -= len(ids)
+
+    if restantes < TAMANO_LOTE:
+        return pares, False
+    if cedulas:
+        session.exec(delete(Estudiante).where(Estudiante.cedula.in_(cedulas), Estudiante.activo == false()))
+    if codigos:
+        session.exec(delete(Curso).where(Curso.codigo.in_(codigos), Curso.activo == false()))
+    return pares, True
+
+
+class LimpiadorEliminados:
+    """
+    Tarea en segundo plano que borra lo que dejaron pendiente las eliminaciones. Se crea al
+    recibir el primer aviso en el bucle de eventos en curso (o al iniciar la aplicación).
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hay_trabajo: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self.estudiantes = 0
+        self.cursos = 0
+        self.matriculas = 0
+
+    def revisar(self):
+        """
+        Busca y limpia las filas inactivas pendientes. Debe llamarse desde el bucle de eventos.
+        """
+        loop = asyncio.get_running_loop()
+        if self._tarea is None or self._tarea.done() or self._loop is not loop:
+            self._loop = loop
+            self._hay_trabajo = asyncio.Event()
+            self._tarea = loop.create_task(self._ejecutar(), name="limpiador-eliminados")
+        self._hay_trabajo.set()
+
+    def avisar(self, loop: asyncio.AbstractEventLoop):
+        """
+        Avisa que hay filas inactivas nuevas. Puede llamarse desde cualquier hilo.
+        """
+        if loop.is_closed():
+            # La aplicación ya se detuvo: al volver a iniciar se limpia lo pendiente.
+            return
+        loop.call_soon_threadsafe(self.revisar)
+
+    async def _ejecutar(self):
+        while True:
+            await self._hay_trabajo.wait()
+            await asyncio.sleep(ESPERA_AGRUPAR_SEGUNDOS)
+            self._hay_trabajo.clear()
+            try:
+                await self._limpiar()
+            except Exception:
+                logger.exception("No se pudo completar la limpieza de eliminados; se reintentará.")
+                await asyncio.sleep(ESPERA_TRAS_ERROR_SEGUNDOS)
+                self._hay_trabajo.set()
+
+    async def _limpiar(self):
+        async with sesion_independiente() as session:
+            while True:
+                cedulas, codigos = await session.run_sync(pendientes)
+                await session.rollback()
+                if not cedulas and not codigos:
+                    return
+                terminado = False
+                while not terminado:
+                    terminado = await con_reintentos(session, lambda: self._lote(session, cedulas, codigos))
+                self.estudiantes += len(cedulas)
+                self.cursos += len(codigos)
+                logger.info("Eliminados definitivamente %d estudiantes y %d cursos.", len(cedulas), len(codigos))
+
+    async def _lote(self, session: AsyncSession, cedulas: List[str], codigos: List[str]) -> bool:
+        await iniciar_escritura(session)
+        pares, terminado = await session.run_sync(limpiar_lote, cedulas, codigos)
+        await eventos.matriculas_cambiadas(session, pares, eliminadas=True)
+        # Los cupos de los cursos y el horario y los créditos de los estudiantes que siguen activos.
+        cedulas_inactivas, codigos_inactivos = set(cedulas), set(codigos)
+        await lista_espera.cupos_liberados(
+            session,
+            cedulas=sorted({cedula for cedula, _ in pares if cedula not in cedulas_inactivas}),
+            codigos=sorted({codigo for _, codigo in pares if codigo not in codigos_inactivos}),
+        )
+        await session.commit()
+        self.matriculas += len(pares)
+        return terminado
+
+    async def detener(self):
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self._tarea = None
+
+
+limpiador = LimpiadorEliminados()
+
+
+async def eliminacion_pendiente(session: AsyncSession):
+    """
+    Avisa al limpiador, cuando la transacción actual se confirme, que hay estudiantes o
+    cursos inactivos por limpiar.
+    """
+    loop = asyncio.get_running_loop()
+    eventos.despues_del_commit(session, lambda: limpiador.avisar(loop))
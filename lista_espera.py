@@ -0,0 +1,243 @@
+"""
+Listas de espera de los cursos llenos y promoción automática cuando se libera un cupo.
+
+Cada curso tiene una cola FIFO persistente (`lista_espera`, ordenada por `id`). Las
+escrituras que pueden liberar cupos o créditos (desmatricular, modificar un curso o un
+estudiante y la limpieza de los eliminados, ver limpieza.py) avisan con `cupos_liberados`
+antes del commit; el aviso solo llega al promotor si la transacción se confirma, y la
+petición no espera a la promoción.
+
+El promotor es una tarea asyncio del proceso: junta los avisos que llegan durante
+`ESPERA_AGRUPAR_SEGUNDOS` y promueve en una sola transacción de escritura (la misma de la
+matrícula, ver database.iniciar_escritura). En cada curso avanza la cola en orden de
+llegada mientras haya cupo, volviendo a validar horario y créditos; a quien le llega el
+turno y no cumple se le retira de la cola, para que su cupo pase al siguiente.
+
+Mientras haya estudiantes en espera, sus cupos no se ofrecen a la matrícula directa (ver
+cupos.consulta_en_espera): un cupo liberado es para la lista, aunque la promoción tarde
+unos milisegundos en llegar.
+Al iniciar la aplicación se revisan todas las listas, por si quedó algo pendiente.
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, or_
+from sqlmodel import Session, insert, select, true
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import cupos
+import eventos
+from crud import MATRICULAS_DE_ESTUDIANTES, en_lotes
+from database import con_reintentos, iniciar_escritura, sesion_independiente
+from horarios import Agenda
+from models import Curso, Estudiante, ListaEspera, Matricula
+
+logger = logging.getLogger("universidad.lista_espera")
+
+ESPERA_AGRUPAR_SEGUNDOS = 0.05
+ESPERA_TRAS_ERROR_SEGUNDOS = 1.0
+
+
+def _cursos_a_revisar(session: Session, cedulas: Optional[Set[str]], codigos: Optional[Set[str]]) -> List[str]:
+    """
+    Cursos con lista de espera entre los dados y aquellos en los que esperan los estudiantes
+    dados. Con ambos en None, todos los cursos con lista de espera.
+    """
+    statement = select(ListaEspera.curso_codigo).distinct()
+    if cedulas is None and codigos is None:
+        return sorted(session.exec(statement).all())
+    encontrados = set()
+    for campo, valores in ((ListaEspera.curso_codigo, codigos), (ListaEspera.estudiante_cedula, cedulas)):
+        for lote in en_lotes(sorted(valores or ())):
+            encontrados.update(session.exec(statement.where(campo.in_(lote))).all())
+    return sorted(encontrados)
+
+
+def _promover_cursos(session: Session, codigos: Sequence[str]) -> List[Tuple[str, str]]:
+    """
+    Promueve la lista de espera de los cursos dados. Devuelve las matrículas creadas.
+    """
+    entradas = session.exec(
+        select(ListaEspera).where(ListaEspera.curso_codigo.in_(codigos)).order_by(ListaEspera.id)
+    ).all()
+    if not entradas:
+        return []
+    cedulas = sorted({entrada.estudiante_cedula for entrada in entradas})
+
+    # Mismo orden de bloqueo que la matrícula: primero estudiantes y después cursos.
+    semestres: Dict[str, int] = {}
+    for lote in en_lotes(cedulas):
+        semestres.update(session.exec(
+            select(Estudiante.cedula, Estudiante.semestre).where(Estudiante.cedula.in_(lote), Estudiante.activo == true()).with_for_update()
+        ).all())
+    cursos = {curso.codigo: curso for curso in session.exec(select(Curso).where(Curso.codigo.in_(codigos)).with_for_update()).all()}
+    ocupados: Dict[str, int] = dict(session.exec(cupos.consulta_ocupados(codigos)).all())
+
+    cedulas = [cedula for cedula in cedulas if cedula in semestres]
+    cursos_por_estudiante: Dict[str, set] = {cedula: set() for cedula in cedulas}
+    agendas: Dict[str, Agenda] = {cedula: Agenda() for cedula in cedulas}
+    creditos: Dict[str, int] = {cedula: 0 for cedula in cedulas}
+    for lote in en_lotes(cedulas):
+        for fila in session.exec(MATRICULAS_DE_ESTUDIANTES, params={"cedulas": list(lote)}).all():
+            cedula = fila.estudiante_cedula
+            cursos_por_estudiante[cedula].add(fila.codigo)
+            agendas[cedula].agregar(fila)
+            creditos[cedula] += fila.creditos
+
+    promovidas: List[Tuple[str, str]] = []
+    atendidas: List[int] = []
+    for entrada in entradas:
+        cedula, curso = entrada.estudiante_cedula, cursos[entrada.curso_codigo]
+        if cedula not in semestres or not curso.activo:
+            # Estudiante o curso eliminado: limpieza.py borra la entrada.
+            continue
+        if curso.codigo in cursos_por_estudiante[cedula]:
+            # Se matriculó por otra vía: sale de la cola.
+            atendidas.append(entrada.id)
+            continue
+        if cupos.sin_cupo(curso, ocupados.get(curso.codigo, 0)):
+            continue
+        if agendas[cedula].choque(curso.horario) is not None or cupos.excede_creditos(semestres[cedula], creditos[cedula], curso):
+            # Le llegó el turno pero no puede tomar el cupo: sale de la cola para no retenerlo.
+            atendidas.append(entrada.id)
+            continue
+
+        cursos_por_estudiante[cedula].add(curso.codigo)
+        agendas[cedula].agregar(curso)
+        creditos[cedula] += curso.creditos
+        ocupados[curso.codigo] = ocupados.get(curso.codigo, 0) + 1
+        promovidas.append((cedula, curso.codigo))
+        atendidas.append(entrada.id)
+
+    if promovidas:
+        session.exec(insert(Matricula), params=[{"estudiante_cedula": cedula, "curso_codigo": codigo} for cedula, codigo in promovidas])
+    if atendidas:
+        session.exec(delete(ListaEspera).where(ListaEspera.id.in_(atendidas)))
+    return promovidas
+
+
+def promover(session: Session, cedulas: Optional[Set[str]] = None, codigos: Optional[Set[str]] = None) -> List[Tuple[str, str]]:
+    """
+    Promueve, dentro de la transacción de escritura de la sesión, las listas de espera de los
+    cursos dados y de aquellos en los que esperan los estudiantes dados (todas con ambos en None).
+
+    Returns:
+        List[Tuple[str, str]]: Matrículas creadas, como pares (cédula, código).
+    """
+    promovidas = []
+    for lote in en_lotes(_cursos_a_revisar(session, cedulas, codigos)):
+        promovidas += _promover_cursos(session, lote)
+    return promovidas
+
+
+def _hay_espera(session: Session, cedulas: Optional[Set[str]], codigos: Optional[Set[str]]) -> bool:
+    statement = select(ListaEspera.id)
+    if cedulas is not None or codigos is not None:
+        statement = statement.where(or_(
+            ListaEspera.curso_codigo.in_(sorted(codigos or ())),
+            ListaEspera.estudiante_cedula.in_(sorted(cedulas or ())),
+        ))
+    return session.exec(statement.limit(1)).first() is not None
+
+
+class PromotorListaEspera:
+    """
+    Tarea en segundo plano que atiende los avisos de cupos liberados. Se crea al recibir
+    el primer aviso en el bucle de eventos en curso (o al iniciar la aplicación).
+    """
+
+    def __init__(self):
+        self._cedulas: Set[str] = set()
+        self._codigos: Set[str] = set()
+        self._revisar_todo = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hay_trabajo: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self.promovidas = 0
+
+    def _asegurar_tarea(self):
+        loop = asyncio.get_running_loop()
+        if self._tarea is None or self._tarea.done() or self._loop is not loop:
+            self._loop = loop
+            self._hay_trabajo = asyncio.Event()
+            self._tarea = loop.create_task(self._ejecutar(), name="promotor-lista-espera")
+
+    def _encolar(self, cedulas: Iterable[str] = (), codigos: Iterable[str] = (), todo: bool = False):
+        self._cedulas.update(cedulas)
+        self._codigos.update(codigos)
+        self._revisar_todo = self._revisar_todo or todo
+        self._asegurar_tarea()
+        self._hay_trabajo.set()
+
+    def avisar(self, loop: asyncio.AbstractEventLoop, cedulas: Iterable[str], codigos: Iterable[str]):
+        """
+        Encola un aviso de cupos liberados. Puede llamarse desde cualquier hilo.
+        """
+        if loop.is_closed():
+            # La aplicación ya se detuvo: al volver a iniciar se revisan todas las listas.
+            return
+        loop.call_soon_threadsafe(self._encolar, list(cedulas), list(codigos))
+
+    def revisar_todo(self):
+        """
+        Encola una revisión de todas las listas de espera (se usa al iniciar).
+        """
+        self._encolar(todo=True)
+
+    async def _ejecutar(self):
+        while True:
+            await self._hay_trabajo.wait()
+            await asyncio.sleep(ESPERA_AGRUPAR_SEGUNDOS)
+            self._hay_trabajo.clear()
+            cedulas, codigos, todo = self._cedulas, self._codigos, self._revisar_todo
+            self._cedulas, self._codigos, self._revisar_todo = set(), set(), False
+            try:
+                await self._promover(None if todo else cedulas, None if todo else codigos)
+            except Exception:
+                logger.exception("No se pudo promover la lista de espera; se reintentará.")
+                await asyncio.sleep(ESPERA_TRAS_ERROR_SEGUNDOS)
+                self._encolar(cedulas, codigos, todo)
+
+    async def _promover(self, cedulas: Optional[Set[str]], codigos: Optional[Set[str]]):
+        async with sesion_independiente() as session:
+            # La mayoría de los cupos liberados no tienen a nadie esperando: se comprueba
+            # antes de tomar el bloqueo de escritura.
+            if not await session.run_sync(_hay_espera, cedulas, codigos):
+                return
+            await session.rollback()
+
+            async def operacion():
+                await iniciar_escritura(session)
+                promovidas = await session.run_sync(promover, cedulas, codigos)
+                await eventos.matriculas_cambiadas(session, promovidas)
+                await session.commit()
+                return promovidas
+
+            promovidas = await con_reintentos(session, operacion)
+        if promovidas:
+            self.promovidas += len(promovidas)
+            logger.info("Promovidas %d matrículas desde la lista de espera.", len(promovidas))
+
+    async def detener(self):
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self._tarea = None
+
+
+promotor = PromotorListaEspera()
+
+
+async def cupos_liberados(session: AsyncSession, cedulas: Iterable[str] = (), codigos: Iterable[str] = ()):
+    """
+    Avisa al promotor, cuando la transacción actual se confirme, que pueden haberse liberado
+    cupos en los cursos dados o horario y créditos de los estudiantes dados.
+    """
+    cedulas, codigos = list(cedulas), list(codigos)
+    if cedulas or codigos:
+        loop = asyncio.get_running_loop()
+        eventos.despues_del_commit(session, lambda: promotor.avisar(loop, cedulas, codigos))
@@ -1,7 +1,25 @@
+import logging
+
 from fastapi import FastAPI
-from database import create_db_and_tables
+from fastapi.responses import PlainTextResponse
+from config import settings
+from database import calentar_conexiones, reportar_configuracion
+import migraciones
+import resumenes
+import cache
+import limpieza
+import lista_espera
+import metricas
+import replicas
+import idempotencia
+import cambios
+
+from routers import estudiantes, cursos, matriculas, reportes
+from routers import busqueda as rutas_busqueda
+from routers import lista_espera as rutas_lista_espera
+from routers import cambios as rutas_cambios
 
-from routers import estudiantes, cursos, matriculas 
+logging.basicConfig(level=settings.log_level, format="%(levelname)s:     %(name)s - %(message)s")
 
 app = FastAPI(
     title="Sistema de Gestión de Universidad - Modular", 
@@ -9,13 +27,94 @@ app = FastAPI(
     docs_url="/docs" 
 )
 
+if settings.metricas_habilitadas:
+    metricas.instalar(app)
+    metricas.registro.agregar_fuente(replicas.series_metricas)
+
+if replicas.monitor.motores and settings.db_lectura_pegajosa_segundos > 0:
+    app.add_middleware(replicas.MiddlewareLecturaPrimaria)
+
+app.add_middleware(idempotencia.MiddlewareIdempotencia)
+
 @app.on_event("startup")
 def on_startup():
-    create_db_and_tables()
+    # Con servidor.py estas tareas ya las hizo una vez el proceso padre; cada worker
+    # solo comprueba que la base tenga todas las migraciones.
+    if settings.inicio_preparado:
+        migraciones.verificar()
+    else:
+        migraciones.al_iniciar()
+        if settings.reportes_materializados:
+            resumenes.reconstruir()
+        cambios.purgar()
+    reportar_configuracion()
+
+@app.on_event("startup")
+async def calentar():
+    # uvicorn acepta conexiones solo cuando terminan todos los eventos de inicio.
+    await calentar_conexiones()
+    await cursos.precargar_catalogo()
+
+@app.on_event("startup")
+async def iniciar_lista_espera():
+    lista_espera.promotor.revisar_todo()
+
+@app.on_event("shutdown")
+async def detener_lista_espera():
+    await lista_espera.promotor.detener()
+
+@app.on_event("startup")
+async def iniciar_limpieza():
+    limpieza.limpiador.revisar()
+
+@app.on_event("shutdown")
+async def detener_limpieza():
+    await limpieza.limpiador.detener()
+
+@app.on_event("startup")
+async def iniciar_monitor_replicas():
+    replicas.monitor.iniciar()
+
+@app.on_event("shutdown")
+async def detener_monitor_replicas():
+    await replicas.monitor.detener()
+
+@app.on_event("shutdown")
+async def detener_difusor_cambios():
+    await cambios.difusor.detener()
 
 app.include_router(estudiantes.router)
 app.include_router(cursos.router)
 app.include_router(matriculas.router)
+app.include_router(reportes.router)
+app.include_router(rutas_lista_espera.router)
+app.include_router(rutas_busqueda.router)
+app.include_router(rutas_cambios.router)
+
+@app.get("/cache/estadisticas", tags=["Sistema"])
+def read_cache_estadisticas():
+    """
+    Devuelve el tamaño y los contadores de aciertos, fallos, expiraciones, desalojos,
+    invalidaciones y cargas compartidas de la caché de lecturas de este proceso, y los de
+    las respuestas guardadas por Idempotency-Key.
+    """
+    return cache.estadisticas()
+
+@app.get("/bd/estado", tags=["Sistema"])
+def read_bd_estado():
+    """
+    Devuelve la salud y el retraso de cada motor de lectura y cuántas sesiones abrió
+    este proceso en la primaria y en cada motor de lectura.
+    """
+    return replicas.estado()
+
+@app.get("/metrics", tags=["Sistema"], response_class=PlainTextResponse)
+def read_metrics():
+    """
+    Expone en formato de texto de Prometheus la latencia, el tamaño de respuesta y las
+    sentencias SQL (cantidad, tiempo y filas) de las peticiones atendidas por este proceso.
+    """
+    return PlainTextResponse(metricas.registro.exportar(), media_type=metricas.TIPO_CONTENIDO)
 
 @app.get("/")
 def read_root():
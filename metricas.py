@@ -0,0 +1,292 @@
+"""
+Métricas de las peticiones HTTP y de las sentencias SQL que ejecuta cada una.
+
+Un middleware ASGI abre una medición por petición y la publica en un ContextVar; los
+eventos del engine de SQLAlchemy (síncrono y asíncrono) suman a esa medición cada
+sentencia, su duración y las filas devueltas. Al terminar la respuesta se acumulan,
+por método y ruta, en histogramas que `/metrics` expone en formato de texto de Prometheus.
+
+Las peticiones que superan `METRICAS_UMBRAL_LENTO_MS` se registran en el log junto con
+las sentencias SQL que ejecutaron.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from config import settings
+from database import engine, async_engine, motores_lectura
+
+logger = logging.getLogger("universidad.metricas")
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+RUTA_DESCONOCIDA = "(sin ruta)"
+MAX_SENTENCIAS_REGISTRADAS = 50
+LARGO_MAXIMO_SENTENCIA = 500
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+BUCKETS_SENTENCIAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+@dataclass
+class MedicionPeticion:
+    """
+    Lo que se va acumulando durante una petición.
+    """
+    sentencias: int = 0
+    segundos_sql: float = 0.0
+    filas: int = 0
+    bytes_respuesta: int = 0
+    detalle_sql: List[Tuple[str, float]] = field(default_factory=list)
+
+    def registrar_sentencia(self, sql: str, segundos: float):
+        self.sentencias += 1
+        self.segundos_sql += segundos
+        if len(self.detalle_sql) < MAX_SENTENCIAS_REGISTRADAS:
+            self.detalle_sql.append((sql, segundos))
+
+
+_medicion_actual: ContextVar[Optional[MedicionPeticion]] = ContextVar("medicion_actual", default=None)
+
+
+class Histograma:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.conteos = [0] * len(self.buckets)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.suma += valor
+        self.total += 1
+        for indice, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.conteos[indice] += 1
+
+
+Etiquetas = Tuple[Tuple[str, str], ...]
+# (tipo, nombre, ayuda, serie) de una serie que otro módulo calcula al exportar.
+SerieExterna = Tuple[str, str, str, Dict[Etiquetas, float]]
+
+
+class RegistroMetricas:
+    """
+    Contadores e histogramas en memoria del proceso, agrupados por método y ruta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._peticiones: Dict[Etiquetas, int] = {}
+        self._duracion: Dict[Etiquetas, Histograma] = {}
+        self._bytes: Dict[Etiquetas, Histograma] = {}
+        self._sentencias: Dict[Etiquetas, Histograma] = {}
+        self._segundos_sql: Dict[Etiquetas, float] = {}
+        self._filas: Dict[Etiquetas, int] = {}
+        self._fuentes: List[Callable[[], List[SerieExterna]]] = []
+
+    def agregar_fuente(self, fuente: Callable[[], List[SerieExterna]]):
+        """
+        Registra una función que `exportar` consulta para agregar series propias de otro
+        módulo (por ejemplo el estado de los motores de lectura, ver replicas.py).
+        """
+        self._fuentes.append(fuente)
+
+    def observar(self, metodo: str, ruta: str, estado: int, segundos: float, medicion: MedicionPeticion):
+        etiquetas = (("metodo", metodo), ("ruta", ruta))
+        with self._lock:
+            con_estado = etiquetas + (("estado", str(estado)),)
+            self._peticiones[con_estado] = self._peticiones.get(con_estado, 0) + 1
+            self._duracion.setdefault(etiquetas, Histograma(BUCKETS_SEGUNDOS)).observar(segundos)
+            self._bytes.setdefault(etiquetas, Histograma(BUCKETS_BYTES)).observar(medicion.bytes_respuesta)
+            self._sentencias.setdefault(etiquetas, Histograma(BUCKETS_SENTENCIAS)).observar(medicion.sentencias)
+            self._segundos_sql[etiquetas] = self._segundos_sql.get(etiquetas, 0.0) + medicion.segundos_sql
+            self._filas[etiquetas] = self._filas.get(etiquetas, 0) + medicion.filas
+
+    def por_ruta(self) -> Dict[str, dict]:
+        """
+        Resumen por "MÉTODO ruta": peticiones y promedios de sentencias, tiempo SQL y filas.
+        """
+        with self._lock:
+            resumen = {}
+            for etiquetas, sentencias in self._sentencias.items():
+                metodo, ruta = (valor for _, valor in etiquetas)
+                total = sentencias.total
+                resumen[f"{metodo} {ruta}"] = {
+                    "peticiones": total,
+                    "sentencias_sql_media": round(sentencias.suma / total, 2),
+                    "sql_ms_media": round(self._segundos_sql[etiquetas] * 1000 / total, 3),
+                    "filas_media": round(self._filas[etiquetas] / total, 1),
+                    "bytes_media": round(self._bytes[etiquetas].suma / total, 1),
+                }
+            return resumen
+
+    def limpiar(self):
+        with self._lock:
+            for serie in (self._peticiones, self._duracion, self._bytes, self._sentencias, self._segundos_sql, self._filas):
+                serie.clear()
+
+    def exportar(self) -> str:
+        """
+        Devuelve todas las series en el formato de texto de Prometheus.
+        """
+        lineas: List[str] = []
+        with self._lock:
+            _contador(lineas, "universidad_peticiones_total", "Peticiones HTTP atendidas.", self._peticiones)
+            _histograma(lineas, "universidad_peticion_duracion_segundos", "Duración de las peticiones HTTP.", self._duracion)
+            _histograma(lineas, "universidad_respuesta_bytes", "Tamaño del cuerpo de las respuestas.", self._bytes)
+            _histograma(lineas, "universidad_sql_sentencias_por_peticion", "Sentencias SQL ejecutadas por petición.", self._sentencias)
+            _contador(lineas, "universidad_sql_duracion_segundos_total", "Tiempo total en sentencias SQL.", self._segundos_sql)
+            _contador(lineas, "universidad_sql_filas_total", "Filas devueltas por las consultas.", self._filas)
+        for fuente in self._fuentes:
+            for tipo, nombre, ayuda, serie in fuente():
+                _contador(lineas, nombre, ayuda, serie, tipo)
+        return "\n".join(lineas) + "\n"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas: Etiquetas) -> str:
+    return "{" + ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in etiquetas) + "}"
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _contador(lineas: List[str], nombre: str, ayuda: str, serie: Dict[Etiquetas, float], tipo: str = "counter"):
+    lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+    for etiquetas, valor in sorted(serie.items()):
+        lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+
+
+def _histograma(lineas: List[str], nombre: str, ayuda: str, serie: Dict[Etiquetas, Histograma]):
+    lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+    for etiquetas, histograma in sorted(serie.items()):
+        for limite, conteo in zip(histograma.buckets, histograma.conteos):
+            lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', _numero(limite)),))} {conteo}")
+        lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {histograma.total}")
+        lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(histograma.suma)}")
+        lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {histograma.total}")
+
+
+registro = RegistroMetricas()
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    context._metricas_inicio = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.registrar_sentencia(statement, time.perf_counter() - context._metricas_inicio)
+
+
+def instrumentar_engine(engine_a_medir: Engine):
+    event.listen(engine_a_medir, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(engine_a_medir, "after_cursor_execute", _despues_de_ejecutar)
+
+
+def _contar_filas(estado_orm):
+    """
+    Cuenta las filas de las consultas que se cargan completas en memoria. Las que se
+    recorren por partes (yield_per, usadas en las respuestas en streaming) no se cuentan
+    para no tener que materializarlas.
+    """
+    medicion = _medicion_actual.get()
+    opciones = estado_orm.execution_options
+    if medicion is None or not estado_orm.is_select or opciones.get("yield_per") or opciones.get("stream_results"):
+        return None
+    resultado = estado_orm.invoke_statement().freeze()
+    medicion.filas += len(resultado.data)
+    return resultado()
+
+
+def _plantilla_de_ruta(scope) -> str:
+    ruta = scope.get("route")
+    return getattr(ruta, "path", None) or RUTA_DESCONOCIDA
+
+
+def _registrar_peticion_lenta(metodo: str, ruta: str, estado: int, segundos: float, medicion: MedicionPeticion):
+    lineas = [
+        f"Petición lenta: {metodo} {ruta} -> {estado} en {segundos * 1000:.1f} ms; "
+        f"{medicion.sentencias} sentencias SQL ({medicion.segundos_sql * 1000:.1f} ms), {medicion.filas} filas"
+    ]
+    for sql, segundos_sql in medicion.detalle_sql:
+        sql = " ".join(sql.split())
+        if len(sql) > LARGO_MAXIMO_SENTENCIA:
+            sql = sql[:LARGO_MAXIMO_SENTENCIA] + "..."
+        lineas.append(f"  [{segundos_sql * 1000:.1f} ms] {sql}")
+    if medicion.sentencias > len(medicion.detalle_sql):
+        lineas.append(f"  ... y {medicion.sentencias - len(medicion.detalle_sql)} sentencias más")
+    logger.warning("\n".join(lineas))
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mide cada petición HTTP hasta que termina de enviarse la respuesta
+    (incluidas las respuestas en streaming).
+    """
+
+    def __init__(self, app, umbral_lento_ms: int = settings.metricas_umbral_lento_ms):
+        self.app = app
+        self.umbral_lento = umbral_lento_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionPeticion()
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        estado = 500
+        eventos_sse = False
+
+        async def enviar(mensaje):
+            nonlocal estado, eventos_sse
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                eventos_sse = any(
+                    nombre == b"content-type" and valor.startswith(b"text/event-stream")
+                    for nombre, valor in mensaje.get("headers", [])
+                )
+            elif mensaje["type"] == "http.response.body":
+                medicion.bytes_respuesta += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicion_actual.reset(token)
+            segundos = time.perf_counter() - inicio
+            metodo, ruta = scope["method"], _plantilla_de_ruta(scope)
+            registro.observar(metodo, ruta, estado, segundos, medicion)
+            # Una conexión SSE dura lo que el cliente quiera: no es una petición lenta.
+            if segundos >= self.umbral_lento and not eventos_sse:
+                _registrar_peticion_lenta(metodo, ruta, estado, segundos, medicion)
+
+
+def instalar(app: FastAPI):
+    """
+    Activa la instrumentación: el middleware en la aplicación y los eventos en los engines.
+    """
+    app.add_middleware(MiddlewareMetricas)
+    instrumentar_engine(engine)
+    if async_engine is not None:
+        instrumentar_engine(async_engine.sync_engine)
+    for motor in motores_lectura:
+        instrumentar_engine(motor.engine)
+        if motor.async_engine is not None:
+            instrumentar_engine(motor.async_engine.sync_engine)
+    event.listen(Session, "do_orm_execute", _contar_filas)
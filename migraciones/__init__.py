@@ -0,0 +1,185 @@
+"""
+Migraciones versionadas del esquema de la base de datos.
+
+Cada módulo `mNNNN_descripcion.py` de este paquete es una migración: NNNN es su versión, la
+primera línea de su docstring la describe y su función `aplicar(connection)` hace el cambio.
+Cada migración se aplica en su propia transacción junto con su fila en `version_esquema`,
+así que una migración que falla no deja nada a medias (salvo en motores sin DDL
+transaccional, como MySQL).
+
+Se ejecutan con un comando aparte, una vez, antes de iniciar o actualizar los workers:
+
+    python -m migraciones            # aplica las pendientes
+    python -m migraciones estado     # versión actual y migraciones pendientes
+
+Al iniciar, la aplicación solo comprueba que no falte ninguna (ver `al_iniciar`).
+
+La migración 1 crea el esquema que tenía la aplicación antes de las migraciones y completa
+las bases creadas entonces; cada migración siguiente crea sus propios objetos. Las migraciones
+definen en su módulo las tablas e índices que crean, sin tomarlos de models.py, para que lo
+que hacen no cambie cuando cambia el modelo. Deben ser idempotentes: las bases que aplicaron
+la migración 1 cuando todavía creaba el esquema completo del modelo ya tienen lo que agregan
+las siguientes.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, List, Set
+
+from sqlalchemy import Column, MetaData, Table, inspect
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import Index
+from sqlmodel import insert, select
+
+from config import settings
+from database import OPCION_ESCRITURA_INMEDIATA, engine, es_sqlite_en_memoria
+from models import VersionEsquema
+
+logger = logging.getLogger("universidad.migraciones")
+
+_NOMBRE_MODULO = re.compile(r"m(\d{4})_\w+")
+
+
+@dataclass(frozen=True)
+class Migracion:
+    version: int
+    nombre: str
+    descripcion: str
+    aplicar: Callable[[Connection], None]
+
+
+def descubrir() -> List[Migracion]:
+    """
+    Migraciones del paquete, ordenadas por versión.
+
+    Raises:
+        RuntimeError: Si dos migraciones tienen la misma versión.
+    """
+    migraciones = {}
+    for modulo in pkgutil.iter_modules(__path__):
+        coincidencia = _NOMBRE_MODULO.fullmatch(modulo.name)
+        if not coincidencia:
+            continue
+        version = int(coincidencia.group(1))
+        if version in migraciones:
+            raise RuntimeError(f"Las migraciones {migraciones[version].nombre} y {modulo.name} tienen la misma versión.")
+        importado = importlib.import_module(f"{__name__}.{modulo.name}")
+        descripcion = importado.__doc__.strip().splitlines()[0] if importado.__doc__ else modulo.name
+        migraciones[version] = Migracion(version, modulo.name, descripcion, importado.aplicar)
+    return [migraciones[version] for version in sorted(migraciones)]
+
+
+def _versiones_aplicadas(connection: Connection) -> Set[int]:
+    if not inspect(connection).has_table(VersionEsquema.__tablename__):
+        return set()
+    return set(connection.execute(select(VersionEsquema.version)).scalars())
+
+
+def pendientes(engine_a_revisar: Engine = engine) -> List[Migracion]:
+    with engine_a_revisar.connect() as connection:
+        aplicadas = _versiones_aplicadas(connection)
+    return [migracion for migracion in descubrir() if migracion.version not in aplicadas]
+
+
+def migrar(engine_a_migrar: Engine = engine) -> List[Migracion]:
+    """
+    Aplica las migraciones pendientes, en orden.
+
+    En SQLite cada migración toma el bloqueo de escritura desde el inicio, así que dos
+    procesos que migran a la vez no aplican dos veces la misma.
+
+    Returns:
+        List[Migracion]: Las migraciones aplicadas.
+    """
+    aplicadas = []
+    for migracion in descubrir():
+        with engine_a_migrar.connect() as connection:
+            connection = connection.execution_options(**{OPCION_ESCRITURA_INMEDIATA: True})
+            with connection.begin():
+                VersionEsquema.__table__.create(connection, checkfirst=True)
+                if migracion.version in _versiones_aplicadas(connection):
+                    continue
+                migracion.aplicar(connection)
+                connection.execute(insert(VersionEsquema).values(
+                    version=migracion.version,
+                    descripcion=migracion.descripcion,
+                    aplicada=datetime.now(timezone.utc)
+                ))
+        logger.info("Migración aplicada: %s", migracion.nombre)
+        aplicadas.append(migracion)
+    return aplicadas
+
+
+def verificar(engine_a_revisar: Engine = engine):
+    """
+    Comprueba que la base de datos tenga aplicadas todas las migraciones.
+
+    Raises:
+        RuntimeError: Si falta alguna.
+    """
+    faltantes = pendientes(engine_a_revisar)
+    if faltantes:
+        raise RuntimeError(
+            f"La base de datos no tiene aplicadas las migraciones {', '.join(m.nombre for m in faltantes)}. "
+            "Ejecute `python -m migraciones` antes de iniciar la aplicación."
+        )
+
+
+def al_iniciar(engine_a_revisar: Engine = engine):
+    """
+    Se ejecuta al iniciar la aplicación: comprueba que no falten migraciones. Con
+    MIGRAR_AL_INICIAR=true, o con una base SQLite en memoria (que solo existe en este
+    proceso), las aplica.
+    """
+    if settings.migrar_al_iniciar or es_sqlite_en_memoria(engine_a_revisar.url.render_as_string(hide_password=False)):
+        migrar(engine_a_revisar)
+    else:
+        verificar(engine_a_revisar)
+
+
+# Utilidades para las migraciones.
+
+def indices_de(connection: Connection, tabla: str) -> Set[str]:
+    """
+    Nombres de los índices de una tabla.
+
+    En SQLite se leen con PRAGMA index_list: la reflexión de SQLAlchemy omite, con un aviso,
+    los índices de expresiones (como ix_curso_codigo_lower).
+    """
+    if connection.dialect.name == "sqlite":
+        return {fila[1] for fila in connection.exec_driver_sql(f'PRAGMA index_list("{tabla}")')}
+    return {indice["name"] for indice in inspect(connection).get_indexes(tabla)}
+
+
+def crear_indices(connection: Connection, *indices: Index):
+    """
+    Crea los índices (de tablas definidas en la migración) que no existan.
+    """
+    for indice in indices:
+        if indice.name not in indices_de(connection, indice.table.name):
+            indice.create(connection)
+            logger.info("Índice creado: %s", indice.name)
+
+
+def crear_indice(connection: Connection, nombre: str, tabla: str, *columnas: str):
+    """
+    Crea un índice sobre columnas de una tabla, si no existe. No refleja la tabla: para
+    el DDL bastan los nombres.
+    """
+    definida = Table(tabla, MetaData(), *(Column(columna) for columna in columnas))
+    crear_indices(connection, Index(nombre, *definida.c))
+
+
+def eliminar_indice(connection: Connection, nombre: str, tabla: str):
+    """
+    Elimina un índice de una tabla, si existe.
+    """
+    if nombre not in indices_de(connection, tabla):
+        return
+    indice = Index(nombre)
+    Table(tabla, MetaData(), indice)  # MySQL necesita la tabla en DROP INDEX.
+    indice.drop(connection)
+    logger.info("Índice eliminado: %s", nombre)
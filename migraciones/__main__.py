@@ -0,0 +1,37 @@
+"""
+Aplica las migraciones pendientes o muestra el estado del esquema.
+
+    python -m migraciones [aplicar]
+    python -m migraciones estado
+"""
+import argparse
+import logging
+import sys
+from typing import List, Optional
+
+import migraciones
+from config import settings
+from database import engine
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m migraciones", description="Migraciones del esquema de la base de datos.")
+    parser.add_argument("accion", nargs="?", choices=("aplicar", "estado"), default="aplicar")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=settings.log_level, format="%(levelname)s:     %(name)s - %(message)s")
+
+    print(f"Base de datos: {engine.url.render_as_string(hide_password=True)}")
+    if args.accion == "estado":
+        faltantes = migraciones.pendientes()
+        for migracion in migraciones.descubrir():
+            marca = "pendiente" if migracion in faltantes else "aplicada "
+            print(f"  {marca} {migracion.nombre}: {migracion.descripcion}")
+        return 1 if faltantes else 0
+
+    aplicadas = migraciones.migrar()
+    print(f"Migraciones aplicadas: {len(aplicadas)}." if aplicadas else "El esquema ya estaba al día.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
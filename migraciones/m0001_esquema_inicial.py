@@ -0,0 +1,103 @@
+"""
+Crea el esquema base de la aplicación y completa las bases anteriores a las migraciones.
+
+Hasta que existieron las migraciones la aplicación creaba el esquema al iniciar: las tablas
+que faltaban con `create_all` y, en las que ya existían, las columnas nuevas (que deben
+admitir NULL) y los índices nuevos. Esta migración hace lo mismo una última vez con el
+esquema de entonces, definido aquí; lo que cambió después lo agregan las migraciones
+siguientes.
+"""
+import logging
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, Table, UniqueConstraint, func, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import AutoString
+
+from migraciones import crear_indices
+
+logger = logging.getLogger("universidad.migraciones")
+
+esquema = MetaData()
+
+curso = Table(
+    "curso", esquema,
+    Column("nombre", AutoString(150), nullable=False),
+    Column("creditos", Integer, nullable=False),
+    Column("horario", AutoString, nullable=False),
+    Column("cupo", Integer),
+    Column("codigo", AutoString(10), primary_key=True),
+    Index("ix_curso_codigo", "codigo", unique=True),
+)
+Index("ix_curso_codigo_lower", func.lower(curso.c.codigo))
+
+Table(
+    "estudiante", esquema,
+    Column("nombre", AutoString(100), nullable=False),
+    Column("email", AutoString, nullable=False),
+    Column("semestre", Integer, nullable=False),
+    Column("cedula", AutoString(20), primary_key=True),
+    Index("ix_estudiante_cedula", "cedula", unique=True),
+    Index("ix_estudiante_email", "email", unique=True),
+    Index("ix_estudiante_nombre", "nombre"),
+)
+
+Table(
+    "matricula", esquema,
+    Column("estudiante_cedula", AutoString, ForeignKey("estudiante.cedula"), primary_key=True),
+    Column("curso_codigo", AutoString, ForeignKey("curso.codigo"), primary_key=True),
+    Index("ix_matricula_curso_codigo", "curso_codigo"),
+)
+
+Table(
+    "franja_horaria", esquema,
+    Column("id", Integer, primary_key=True),
+    Column("curso_codigo", AutoString, ForeignKey("curso.codigo"), nullable=False),
+    Column("dia", Integer, nullable=False),
+    Column("inicio", Integer, nullable=False),
+    Column("fin", Integer, nullable=False),
+    Index("ix_franja_horaria_curso_dia_inicio", "curso_codigo", "dia", "inicio"),
+)
+
+Table(
+    "lista_espera", esquema,
+    Column("id", Integer, primary_key=True),
+    Column("curso_codigo", AutoString, ForeignKey("curso.codigo"), nullable=False),
+    Column("estudiante_cedula", AutoString, ForeignKey("estudiante.cedula"), nullable=False),
+    UniqueConstraint("curso_codigo", "estudiante_cedula"),
+    Index("ix_lista_espera_curso_codigo", "curso_codigo"),
+    Index("ix_lista_espera_estudiante_cedula", "estudiante_cedula"),
+)
+
+Table(
+    "version_recurso", esquema,
+    Column("recurso", AutoString, primary_key=True),
+    Column("version", Integer, nullable=False),
+)
+
+Table(
+    "resumen_estudiante", esquema,
+    Column("cedula", AutoString, primary_key=True),
+    Column("cursos", Integer, nullable=False),
+    Column("creditos", Integer, nullable=False),
+)
+
+Table(
+    "resumen_curso", esquema,
+    Column("codigo", AutoString, primary_key=True),
+    Column("matriculados", Integer, nullable=False),
+)
+
+
+def aplicar(connection: Connection):
+    esquema.create_all(connection)
+    inspector = inspect(connection)
+    for tabla in esquema.sorted_tables:
+        existentes = {columna["name"] for columna in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name not in existentes:
+                definicion = CreateColumn(columna).compile(dialect=connection.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {tabla.name} ADD COLUMN {definicion}")
+                logger.info("Columna agregada: %s.%s", tabla.name, columna.name)
+    for tabla in esquema.sorted_tables:
+        crear_indices(connection, *tabla.indexes)
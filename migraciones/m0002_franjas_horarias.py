@@ -0,0 +1,10 @@
+"""
+Genera las franjas horarias de los cursos creados antes de existir la tabla.
+"""
+from sqlalchemy.engine import Connection
+
+import horarios
+
+
+def aplicar(connection: Connection):
+    horarios.migrar_horarios(connection)
@@ -0,0 +1,10 @@
+"""
+Crea los índices de texto completo de la búsqueda y sus triggers (solo en SQLite).
+"""
+from sqlalchemy.engine import Connection
+
+import busqueda
+
+
+def aplicar(connection: Connection):
+    busqueda.crear_indices(connection)
@@ -0,0 +1,22 @@
+"""
+Índices compuestos para las consultas frecuentes de estudiantes, cursos y matrículas.
+
+- matricula (curso_codigo, estudiante_cedula): la clave primaria empieza por el estudiante;
+  con este índice la lista de estudiantes de un curso y los conteos de cupo se resuelven
+  sin leer la tabla. Reemplaza al índice que solo tenía curso_codigo.
+- estudiante (semestre, cedula) y curso (creditos, codigo): los listados filtrados se
+  paginan por la clave; sin estos índices recorren la tabla entera en orden de clave
+  descartando las filas de otros semestres o créditos.
+
+Ver benchmarks/planes_consulta.py, que comprueba los planes de estas consultas.
+"""
+from sqlalchemy.engine import Connection
+
+from migraciones import crear_indice, eliminar_indice
+
+
+def aplicar(connection: Connection):
+    crear_indice(connection, "ix_matricula_curso_estudiante", "matricula", "curso_codigo", "estudiante_cedula")
+    eliminar_indice(connection, "ix_matricula_curso_codigo", "matricula")
+    crear_indice(connection, "ix_estudiante_semestre_cedula", "estudiante", "semestre", "cedula")
+    crear_indice(connection, "ix_curso_creditos_codigo", "curso", "creditos", "codigo")
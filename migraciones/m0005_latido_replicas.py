@@ -0,0 +1,17 @@
+"""
+Crea la tabla `latido`, con la que el monitor de réplicas mide el retraso de las bases de lectura.
+"""
+from sqlalchemy import Column, Float, Integer, MetaData, Table, select
+from sqlalchemy.engine import Connection
+
+latido = Table(
+    "latido", MetaData(),
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("marca", Float, nullable=False),
+)
+
+
+def aplicar(connection: Connection):
+    latido.create(connection, checkfirst=True)
+    if connection.execute(select(latido.c.id)).first() is None:
+        connection.execute(latido.insert().values(id=1, marca=0))
@@ -0,0 +1,23 @@
+"""
+Crea la tabla `cambio`, el registro de cambios que sirve GET /cambios/ y los eventos SSE.
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table
+from sqlalchemy.engine import Connection
+from sqlmodel import AutoString
+
+cambio = Table(
+    "cambio", MetaData(),
+    Column("seq", Integer, primary_key=True),
+    Column("momento", DateTime, nullable=False),
+    Column("tipo", AutoString, nullable=False),
+    Column("curso_codigo", AutoString),
+    Column("estudiante_cedula", AutoString),
+    Index("ix_cambio_curso_codigo_seq", "curso_codigo", "seq"),
+    Index("ix_cambio_momento", "momento"),
+    # `seq` no se reutiliza aunque se borren las últimas entradas.
+    sqlite_autoincrement=True,
+)
+
+
+def aplicar(connection: Connection):
+    cambio.create(connection, checkfirst=True)
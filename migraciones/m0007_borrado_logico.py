@@ -0,0 +1,52 @@
+"""
+Agrega la columna `activo` a estudiante y curso, para el borrado lógico (ver limpieza.py).
+
+- estudiante.activo y curso.activo: las filas existentes quedan activas.
+- Los índices de los listados filtrados, estudiante (semestre, cedula) y curso (creditos,
+  codigo), pasan a ser parciales sobre las filas activas, que son las únicas que leen los
+  listados. Reemplazan a los de la migración 4.
+- estudiante (cedula) y curso (codigo) sobre las filas inactivas: la limpieza encuentra
+  las pendientes sin recorrer la tabla.
+"""
+import logging
+
+from sqlalchemy import Boolean, Column, Index, MetaData, Table, inspect, text, true
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from migraciones import crear_indices, eliminar_indice
+
+logger = logging.getLogger("universidad.migraciones")
+
+_ACTIVOS = {"sqlite_where": text("activo = 1"), "postgresql_where": text("activo")}
+_INACTIVOS = {"sqlite_where": text("activo = 0"), "postgresql_where": text("NOT activo")}
+
+# Solo las columnas que usa la migración.
+estudiante = Table(
+    "estudiante", MetaData(),
+    Column("semestre"),
+    Column("cedula"),
+    Column("activo", Boolean, nullable=False, server_default=true()),
+    Index("ix_estudiante_activos_semestre_cedula", "semestre", "cedula", **_ACTIVOS),
+    Index("ix_estudiante_inactivos", "cedula", **_INACTIVOS),
+)
+curso = Table(
+    "curso", MetaData(),
+    Column("creditos"),
+    Column("codigo"),
+    Column("activo", Boolean, nullable=False, server_default=true()),
+    Index("ix_curso_activos_creditos_codigo", "creditos", "codigo", **_ACTIVOS),
+    Index("ix_curso_inactivos", "codigo", **_INACTIVOS),
+)
+
+
+def aplicar(connection: Connection):
+    inspector = inspect(connection)
+    for tabla in (estudiante, curso):
+        if "activo" not in {columna["name"] for columna in inspector.get_columns(tabla.name)}:
+            definicion = CreateColumn(tabla.c.activo).compile(dialect=connection.dialect)
+            connection.exec_driver_sql(f"ALTER TABLE {tabla.name} ADD COLUMN {definicion}")
+            logger.info("Columna agregada: %s.activo", tabla.name)
+        crear_indices(connection, *tabla.indexes)
+    eliminar_indice(connection, "ix_estudiante_semestre_cedula", "estudiante")
+    eliminar_indice(connection, "ix_curso_creditos_codigo", "curso")
@@ -0,0 +1,20 @@
+"""
+Crea la tabla `agenda_estudiante`, el horario ocupado de cada estudiante, y la llena a partir de las matrículas.
+"""
+from sqlalchemy import Column, LargeBinary, MetaData, Table
+from sqlalchemy.engine import Connection
+from sqlmodel import AutoString
+
+import agendas
+
+agenda_estudiante = Table(
+    "agenda_estudiante", MetaData(),
+    Column("cedula", AutoString, primary_key=True),
+    Column("cursos", AutoString, nullable=False),
+    Column("ocupacion", LargeBinary, nullable=False),
+)
+
+
+def aplicar(connection: Connection):
+    agenda_estudiante.create(connection, checkfirst=True)
+    agendas.reconstruir(connection)
@@ -1,15 +1,28 @@
+from datetime import datetime
 from typing import List, Optional
-from sqlmodel import Field, SQLModel, Relationship
-from sqlalchemy.schema import PrimaryKeyConstraint
+from sqlmodel import Field, SQLModel, Relationship, func, text, true
+from sqlalchemy.schema import Index, PrimaryKeyConstraint, UniqueConstraint
 
 class MatriculaBase(SQLModel):
     estudiante_cedula: str = Field(foreign_key="estudiante.cedula", primary_key=True)
     curso_codigo: str = Field(foreign_key="curso.codigo", primary_key=True)
 
+class MatriculaBulkResult(MatriculaBase):
+    estado: str
+    detalle: Optional[str] = None
+
+class MatriculaBulkReport(SQLModel):
+    matriculados: int
+    rechazados: int
+    resultados: List[MatriculaBulkResult] = []
+
 class Matricula(MatriculaBase, table=True):
     __tablename__ = "matricula"
     __table_args__ = (
         PrimaryKeyConstraint("estudiante_cedula", "curso_codigo"),
+        # La clave primaria empieza por el estudiante; este índice sirve (sin leer la tabla)
+        # las consultas por curso.
+        Index("ix_matricula_curso_estudiante", "curso_codigo", "estudiante_cedula"),
     )
 
     estudiante: "Estudiante" = Relationship(back_populates="matriculas")
@@ -24,10 +37,26 @@ class CursoBase(SQLModel):
     nombre: str = Field(min_length=5, max_length=150)
     creditos: int = Field(ge=1, le=10)
     horario: str 
+    # Cantidad máxima de estudiantes matriculados; sin valor, el curso no tiene límite.
+    cupo: Optional[int] = Field(default=None, ge=1)
+
+# Estudiantes y cursos eliminados: siguen en su tabla con `activo` en falso hasta que
+# limpieza.py borra sus matrículas y la fila. Los índices parciales de los listados solo
+# contienen las filas activas y los de `_inactivos`, las pendientes de limpieza.
+_ACTIVOS = {"sqlite_where": text("activo = 1"), "postgresql_where": text("activo")}
+_INACTIVOS = {"sqlite_where": text("activo = 0"), "postgresql_where": text("NOT activo")}
 
 class Estudiante(EstudianteBase, table=True):
+    __table_args__ = (
+        # Listado filtrado por semestre, paginado por cédula.
+        Index("ix_estudiante_activos_semestre_cedula", "semestre", "cedula", **_ACTIVOS),
+        Index("ix_estudiante_inactivos", "cedula", **_INACTIVOS),
+    )
+
     cedula: str = Field(primary_key=True, index=True, unique=True, min_length=5, max_length=20)
+    activo: bool = Field(default=True, sa_column_kwargs={"server_default": true()})
     matriculas: List[Matricula] = Relationship(back_populates="estudiante", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    en_espera: List["ListaEspera"] = Relationship(back_populates="estudiante", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
 
 class EstudianteRead(EstudianteBase):
     cedula: str
@@ -36,8 +65,62 @@ class EstudianteReadWithCursos(EstudianteRead):
     cursos: List["CursoRead"] = [] 
 
 class Curso(CursoBase, table=True):
+    __table_args__ = (
+        # Listado filtrado por créditos, paginado por código.
+        Index("ix_curso_activos_creditos_codigo", "creditos", "codigo", **_ACTIVOS),
+        Index("ix_curso_inactivos", "codigo", **_INACTIVOS),
+    )
+
     codigo: str = Field(primary_key=True, index=True, unique=True, min_length=3, max_length=10)
-    matriculas: List[Matricula] = Relationship(back_populates="curso")
+    activo: bool = Field(default=True, sa_column_kwargs={"server_default": true()})
+    matriculas: List[Matricula] = Relationship(back_populates="curso", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    en_espera: List["ListaEspera"] = Relationship(back_populates="curso", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+    franjas: List["FranjaHoraria"] = Relationship(back_populates="curso", sa_relationship_kwargs={"cascade": "all, delete-orphan"})
+
+# Para filtrar por código sin distinguir mayúsculas sin recorrer la tabla (ver read_cursos).
+Index("ix_curso_codigo_lower", func.lower(Curso.__table__.c.codigo))
+
+class FranjaHoraria(SQLModel, table=True):
+    """
+    Franja semanal de un curso, en minutos desde la medianoche (ver horarios.py).
+    """
+    __tablename__ = "franja_horaria"
+    __table_args__ = (
+        Index("ix_franja_horaria_curso_dia_inicio", "curso_codigo", "dia", "inicio"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    curso_codigo: str = Field(foreign_key="curso.codigo")
+    dia: int = Field(ge=0, le=6)
+    inicio: int = Field(ge=0, le=1440)
+    fin: int = Field(ge=0, le=1440)
+
+    curso: Curso = Relationship(back_populates="franjas")
+    
+class ListaEspera(SQLModel, table=True):
+    """
+    Estudiante en espera de un cupo en un curso lleno (ver lista_espera.py). El orden de
+    llegada lo da `id`.
+    """
+    __tablename__ = "lista_espera"
+    __table_args__ = (
+        UniqueConstraint("curso_codigo", "estudiante_cedula"),
+        # En SQLite cada entrada del índice lleva el rowid (`id`): recorre la lista de un curso ya en orden de llegada.
+        Index("ix_lista_espera_curso_codigo", "curso_codigo"),
+        Index("ix_lista_espera_estudiante_cedula", "estudiante_cedula"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    curso_codigo: str = Field(foreign_key="curso.codigo")
+    estudiante_cedula: str = Field(foreign_key="estudiante.cedula")
+
+    curso: Curso = Relationship(back_populates="en_espera")
+    estudiante: Estudiante = Relationship(back_populates="en_espera")
+
+class ListaEsperaRead(SQLModel):
+    curso_codigo: str
+    estudiante_cedula: str
+    posicion: int
     
 class CursoRead(CursoBase):
     codigo: str
@@ -61,5 +144,156 @@ class CursoUpdate(CursoBase):
     creditos: Optional[int] = None
     horario: Optional[str] = None
     
+class VersionEsquema(SQLModel, table=True):
+    """
+    Migraciones aplicadas a la base de datos (ver migraciones/).
+    """
+    __tablename__ = "version_esquema"
+
+    version: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    descripcion: str
+    aplicada: datetime
+
+class VersionRecurso(SQLModel, table=True):
+    __tablename__ = "version_recurso"
+
+    recurso: str = Field(primary_key=True)
+    version: int = Field(default=0)
+
+class Latido(SQLModel, table=True):
+    """
+    Marca de tiempo que el monitor de réplicas escribe en la base primaria y lee en cada
+    réplica de lectura para medir su retraso (ver replicas.py). Tiene una sola fila.
+    """
+    __tablename__ = "latido"
+
+    id: int = Field(default=1, primary_key=True, sa_column_kwargs={"autoincrement": False})
+    marca: float = Field(default=0)
+
+class Cambio(SQLModel, table=True):
+    """
+    Entrada del registro de cambios (ver cambios.py). `seq` crece en el orden de commit y
+    no se reutiliza aunque se borren las entradas viejas. No tiene claves foráneas: la
+    entrada sobrevive al curso o estudiante eliminado.
+    """
+    __tablename__ = "cambio"
+    __table_args__ = (
+        # Cambios de un curso desde una posición (GET /cambios/?curso=...).
+        Index("ix_cambio_curso_codigo_seq", "curso_codigo", "seq"),
+        Index("ix_cambio_momento", "momento"),
+        {"sqlite_autoincrement": True},
+    )
+
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    momento: datetime
+    tipo: str
+    curso_codigo: Optional[str] = None
+    estudiante_cedula: Optional[str] = None
+
+class CambioRead(SQLModel):
+    seq: int
+    momento: datetime
+    tipo: str
+    curso_codigo: Optional[str] = None
+    estudiante_cedula: Optional[str] = None
+
+class ResumenEstudiante(SQLModel, table=True):
+    """
+    Totales materializados de matrícula por estudiante (ver resumenes.py).
+    """
+    __tablename__ = "resumen_estudiante"
+
+    cedula: str = Field(primary_key=True)
+    cursos: int = Field(default=0)
+    creditos: int = Field(default=0)
+
+class ResumenCurso(SQLModel, table=True):
+    """
+    Matriculados materializados por curso (ver resumenes.py).
+    """
+    __tablename__ = "resumen_curso"
+
+    codigo: str = Field(primary_key=True)
+    matriculados: int = Field(default=0)
+
+class AgendaEstudiante(SQLModel, table=True):
+    """
+    Horario semanal ocupado por las matrículas de cada estudiante (ver agendas.py).
+    `cursos` es un JSON {código: horario} y `ocupacion`, la máscara de bloques de
+    horarios.mascara en bytes little-endian.
+    """
+    __tablename__ = "agenda_estudiante"
+
+    cedula: str = Field(primary_key=True)
+    cursos: str
+    ocupacion: bytes
+
+class BloqueHorario(SQLModel):
+    dia: str
+    inicio: str
+    fin: str
+    curso_codigo: str
+    nombre: str
+
+class HorarioEstudianteRead(SQLModel):
+    cedula: str
+    bloques: List[BloqueHorario] = []
+    sin_interpretar: List[CursoRead] = []
+
+class PlanMatricula(SQLModel):
+    cursos: List[str]
+    creditos: int
+
+class CursoDescartado(SQLModel):
+    curso_codigo: str
+    detalle: str
+
+class PlanesMatriculaReport(SQLModel):
+    cedula: str
+    creditos_matriculados: int
+    creditos_maximos: int
+    planes: List[PlanMatricula] = []
+    descartados: List[CursoDescartado] = []
+    choques: List[List[str]] = []
+    completo: bool = True
+
+class ReporteCreditosEstudiante(SQLModel):
+    cedula: str
+    nombre: str
+    semestre: int
+    cursos: int
+    creditos: int
+
+class ReporteMatriculadosCurso(SQLModel):
+    codigo: str
+    nombre: str
+    creditos: int
+    matriculados: int
+
+class ReporteCargaSemestre(SQLModel):
+    semestre: int
+    estudiantes: int
+    matriculas: int
+    creditos: int
+    creditos_promedio: float
+
+class RangoOcupacion(SQLModel):
+    desde: int
+    hasta: int
+    cursos: int
+
+class ResultadosBusqueda(SQLModel):
+    estudiantes: List[EstudianteRead] = []
+    cursos: List[CursoRead] = []
+
+class FilaRechazada(SQLModel):
+    fila: int
+    error: str
+
+class ImportacionReport(SQLModel):
+    insertados: int
+    rechazados: int
+    errores: List[FilaRechazada] = []
+
 EstudianteReadWithCursos.model_rebuild()
 CursoReadWithEstudiantes.model_rebuild()
\ No newline at end of file
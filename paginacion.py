@@ -0,0 +1,131 @@
+import base64
+import json
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from database import engine
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+TAMANO_LOTE_STREAMING = 500
+CABECERA_CURSOR = "X-Cursor-Siguiente"
+
+
+def codificar_cursor(clave: str) -> str:
+    """
+    Genera un token de continuación opaco a partir de la última clave entregada.
+    """
+    contenido = json.dumps({"k": clave}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(contenido).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> str:
+    """
+    Recupera la clave a partir de un token de continuación.
+
+    Raises:
+        HTTPException 400: Si el token no es válido.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        contenido = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        clave = contenido["k"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido.")
+    if not isinstance(clave, str):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido.")
+    return clave
+
+
+def paginar(statement, columna, cursor: Optional[str], limite: Optional[int]):
+    """
+    Aplica paginación por clave (keyset) a una consulta ordenada por `columna`.
+
+    Se pide una fila extra para saber si existe una página siguiente sin hacer un COUNT.
+    """
+    if cursor:
+        statement = statement.where(columna > decodificar_cursor(cursor))
+    statement = statement.order_by(columna)
+    if limite is not None:
+        statement = statement.limit(limite + 1)
+    return statement
+
+
+def cortar_pagina(filas: List[Any], limite: int, clave: str) -> Tuple[List[Any], Optional[str]]:
+    """
+    Descarta la fila extra de la consulta y devuelve la página junto con el cursor de la
+    página siguiente (None si no la hay).
+    """
+    if len(filas) > limite:
+        filas = filas[:limite]
+        return filas, codificar_cursor(getattr(filas[-1], clave))
+    return filas, None
+
+
+def recortar_pagina(filas: List[Any], limite: int, clave: str, response: Response) -> List[Any]:
+    """
+    Descarta la fila extra de la consulta y publica el cursor de la página siguiente
+    en la cabecera `X-Cursor-Siguiente`.
+    """
+    filas, cursor = cortar_pagina(filas, limite, clave)
+    if cursor:
+        response.headers[CABECERA_CURSOR] = cursor
+    return filas
+
+
+def _lineas_ndjson(filas: Iterable[Any]) -> bytes:
+    return b"".join(orjson.dumps(fila._asdict(), option=orjson.OPT_APPEND_NEWLINE) for fila in filas)
+
+
+def _leer_pagina(statement, engine_a_usar: Engine) -> List[Any]:
+    with Session(engine_a_usar) as session:
+        return session.exec(statement).all()
+
+
+async def respuesta_ndjson(
+    statement, engine_a_usar: Engine = engine, limite: Optional[int] = None, clave: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Serializa las filas de la consulta como NDJSON a medida que el cursor de la base
+    de datos las entrega, sin cargar la tabla completa en memoria.
+
+    La consulta debe seleccionar las columnas del modelo de lectura (ver
+    serializacion.columnas): cada fila se codifica directamente con orjson y se envía
+    un bloque por lote del cursor.
+
+    Con `limite`, la consulta es una página de `paginar` (con su fila extra): como el
+    cursor de la página siguiente va en la cabecera `X-Cursor-Siguiente`, que sale antes
+    que el cuerpo, la página (como mucho LIMITE_MAXIMO filas) se lee completa antes de
+    responder, se descarta la fila extra y el cursor se calcula con la columna `clave`,
+    igual que en las páginas JSON (ver cortar_pagina).
+
+    Usa su propia sesión (sobre el engine al que se enrutó la petición, ver
+    database.engine_de_lectura) porque el generador se consume después de que la sesión
+    de la petición se haya cerrado.
+    """
+    if limite is not None:
+        filas = await run_in_threadpool(_leer_pagina, statement, engine_a_usar)
+        pagina, cursor = cortar_pagina(filas, limite, clave)
+
+        def generar_pagina() -> Iterator[bytes]:
+            for inicio in range(0, len(pagina), TAMANO_LOTE_STREAMING):
+                yield _lineas_ndjson(pagina[inicio:inicio + TAMANO_LOTE_STREAMING])
+
+        respuesta = StreamingResponse(generar_pagina(), media_type="application/x-ndjson")
+        if cursor:
+            respuesta.headers[CABECERA_CURSOR] = cursor
+        return respuesta
+
+    def generar() -> Iterator[bytes]:
+        with Session(engine_a_usar) as session:
+            resultado = session.exec(statement.execution_options(yield_per=TAMANO_LOTE_STREAMING))
+            for lote in resultado.partitions():
+                yield _lineas_ndjson(lote)
+
+    return StreamingResponse(generar(), media_type="application/x-ndjson")
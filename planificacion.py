@@ -0,0 +1,125 @@
+"""
+Planes de matrícula: combinaciones de cursos pedidos que un estudiante podría matricular
+juntas, sin choques de horario y sin pasar sus créditos máximos (GET /estudiantes/{cedula}/planes/).
+
+Todo se calcula en memoria sobre lo que el endpoint cargó de una vez (los cursos pedidos y
+las matrículas actuales del estudiante); no se escribe nada. Los choques entre los cursos
+pedidos se resuelven una sola vez con las máscaras de horarios.HorarioOcupado y quedan
+como un entero por curso (bit j: choca con el curso j). La búsqueda es un backtracking
+sobre esos enteros que, para cada curso, prueba incluirlo (y descarta a los que chocan con
+él) o dejarlo fuera, y solo conserva los planes maximales: aquellos a los que no se les
+puede agregar ningún otro curso pedido. Se poda la rama que ya no puede superar al peor
+de los `limite` mejores planes encontrados y la que deja fuera un curso que nada impediría
+agregar después.
+
+El número de combinaciones crece de forma exponencial con los cursos pedidos, así que la
+búsqueda se corta a los PRESUPUESTO_SEGUNDOS: entonces devuelve los mejores planes
+encontrados hasta ese momento y `completo` en falso.
+"""
+import heapq
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from horarios import HorarioOcupado
+
+PRESUPUESTO_SEGUNDOS = 0.25
+# Nodos de la búsqueda entre dos consultas del reloj.
+_NODOS_ENTRE_REVISIONES = 256
+
+
+class Candidato(NamedTuple):
+    codigo: str
+    creditos: int
+    horario: str
+
+
+class Planes(NamedTuple):
+    planes: List[Tuple[List[str], int]]
+    choques: List[Tuple[str, str]]
+    completo: bool
+
+
+class _PresupuestoAgotado(Exception):
+    pass
+
+
+def choques(candidatos: Sequence[Candidato]) -> List[int]:
+    """
+    Para cada candidato, los candidatos con los que se cruza su horario, como bits de un entero.
+    """
+    agendas = [HorarioOcupado.de_cursos({c.codigo: c.horario}) for c in candidatos]
+    vecinos = [0] * len(candidatos)
+    for i in range(len(candidatos)):
+        for j in range(i + 1, len(candidatos)):
+            if agendas[i].choque(candidatos[j].horario) is not None:
+                vecinos[i] |= 1 << j
+                vecinos[j] |= 1 << i
+    return vecinos
+
+
+def buscar(candidatos: Sequence[Candidato], creditos_libres: int, limite: int, presupuesto_segundos: Optional[float] = None) -> Planes:
+    """
+    Los hasta `limite` planes maximales con más créditos (y, a igualdad, más cursos) entre
+    los candidatos, que ya deben caber cada uno por separado en el horario y los créditos
+    libres del estudiante.
+    """
+    orden = sorted(candidatos, key=lambda c: (-c.creditos, c.codigo))
+    n = len(orden)
+    creditos = [c.creditos for c in orden]
+    vecinos = choques(orden)
+    # Créditos de los candidatos desde la posición i hasta el final, para acotar las ramas.
+    creditos_desde = [0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        creditos_desde[i] = creditos_desde[i + 1] + creditos[i]
+
+    mejores: List[Tuple[int, int, Tuple[str, ...]]] = []
+    fin = time.perf_counter() + (PRESUPUESTO_SEGUNDOS if presupuesto_segundos is None else presupuesto_segundos)
+    nodos = 0
+
+    def suma_restante(permitidos: int, desde: int) -> int:
+        return sum(creditos[k] for k in range(desde, n) if permitidos >> k & 1)
+
+    def maximal(elegidos: int, total: int) -> bool:
+        bloqueados = elegidos
+        for k in range(n):
+            if elegidos >> k & 1:
+                bloqueados |= vecinos[k]
+        return all(bloqueados >> k & 1 or total + creditos[k] > creditos_libres for k in range(n))
+
+    def explorar(i: int, elegidos: int, total: int, permitidos: int):
+        nonlocal nodos
+        nodos += 1
+        if nodos % _NODOS_ENTRE_REVISIONES == 0 and time.perf_counter() > fin:
+            raise _PresupuestoAgotado()
+        if len(mejores) == limite and min(total + suma_restante(permitidos, i), creditos_libres) < mejores[0][0]:
+            return
+        j = i
+        while j < n and not (permitidos >> j & 1 and total + creditos[j] <= creditos_libres):
+            j += 1
+        if j == n:
+            if elegidos and maximal(elegidos, total):
+                plan = (total, bin(elegidos).count("1"), tuple(sorted(orden[k].codigo for k in range(n) if elegidos >> k & 1)))
+                if len(mejores) < limite:
+                    heapq.heappush(mejores, plan)
+                elif plan > mejores[0]:
+                    heapq.heapreplace(mejores, plan)
+            return
+        explorar(j + 1, elegidos | 1 << j, total + creditos[j], permitidos & ~vecinos[j] & ~(1 << j))
+        # Dejar fuera a j solo tiene sentido si algo puede impedir agregarlo: un curso que
+        # choque con él o que los créditos se acaben antes.
+        restantes = permitidos & ~(1 << j) & ~((1 << (j + 1)) - 1)
+        if vecinos[j] & (elegidos | restantes) or total + creditos_desde[j + 1] + creditos[j] > creditos_libres:
+            explorar(j + 1, elegidos, total, permitidos & ~(1 << j))
+
+    completo = True
+    try:
+        explorar(0, 0, 0, (1 << n) - 1)
+    except _PresupuestoAgotado:
+        completo = False
+
+    planes = [(list(codigos), total) for total, _, codigos in sorted(mejores, key=lambda p: (-p[0], -p[1], p[2]))]
+    pares = [
+        (orden[i].codigo, orden[j].codigo) if orden[i].codigo < orden[j].codigo else (orden[j].codigo, orden[i].codigo)
+        for i in range(n) for j in range(i + 1, n) if vecinos[i] >> j & 1
+    ]
+    return Planes(planes, sorted(pares), completo)
@@ -0,0 +1,178 @@
+"""
+Lecturas desde réplicas: salud y retraso de los motores de lectura, y lectura de la
+primaria después de una escritura propia.
+
+`SessionDep` (ver database.py) envía las peticiones GET a un motor de lectura sano y las
+demás a la primaria. Hay dos tipos de motores de lectura:
+
+- DB_LECTURA_SQLITE: conexiones de solo lectura al mismo archivo SQLite. En modo WAL las
+  lecturas no bloquean las escrituras, y con su propio pool no compiten con ellas por
+  conexiones. Nunca tienen retraso.
+- DATABASE_URLS_LECTURA: réplicas (por ejemplo de PostgreSQL) que se actualizan de forma
+  asíncrona y pueden quedar atrasadas.
+
+Un monitor en segundo plano revisa cada DB_REVISION_LECTURA_SEGUNDOS todos los motores.
+Si hay réplicas, escribe primero en la primaria la hora actual en la tabla `latido` y
+después la lee en cada réplica: la diferencia es su retraso, con la resolución del
+intervalo de revisión. Un motor que falla o cuyo retraso supera DB_RETRASO_MAXIMO_SEGUNDOS
+deja de recibir lecturas hasta que se recupere; sin motores sanos todo va a la primaria.
+
+Después de una escritura que termina bien, la respuesta agrega la cookie `leer_primaria`
+por DB_LECTURA_PEGAJOSA_SEGUNDOS: mientras el cliente la envíe, sus GET se leen de la
+primaria y ve sus propios cambios.
+
+La caché de lecturas (cache.py) es del proceso y se invalida al confirmar en la primaria:
+una lectura de una réplica atrasada justo después de la invalidación puede guardar datos
+viejos hasta que venza el TTL. El límite de retraso acota ese riesgo.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
+
+from config import settings
+from database import (
+    COOKIE_LECTURA_PRIMARIA, METODOS_LECTURA, MotorLectura, engine, motores_lectura, sesiones_por_motor
+)
+from models import Latido
+
+logger = logging.getLogger("universidad.replicas")
+
+
+def _escribir_latido(marca: float):
+    # Con varios procesos cada monitor escribe el suyo: la marca solo avanza.
+    with engine.begin() as connection:
+        connection.execute(update(Latido).where(Latido.id == 1, Latido.marca < marca).values(marca=marca))
+
+
+def _leer_latido(motor: MotorLectura) -> Optional[float]:
+    with motor.engine.connect() as connection:
+        if motor.local:
+            connection.exec_driver_sql("SELECT 1")
+            return None
+        return connection.execute(select(Latido.marca).where(Latido.id == 1)).scalar_one()
+
+
+class MonitorReplicas:
+    """
+    Tarea en segundo plano que revisa la salud y el retraso de los motores de lectura.
+    """
+
+    def __init__(self, motores: List[MotorLectura]):
+        self.motores = motores
+        self.intervalo = settings.db_revision_lectura_segundos
+        self.retraso_maximo = settings.db_retraso_maximo_segundos
+        self._tarea: Optional[asyncio.Task] = None
+
+    def iniciar(self):
+        if self.motores and (self._tarea is None or self._tarea.done()):
+            self._tarea = asyncio.get_running_loop().create_task(self._ejecutar(), name="monitor-replicas")
+
+    async def _ejecutar(self):
+        while True:
+            try:
+                await self.revisar()
+            except Exception:
+                logger.exception("No se pudo revisar los motores de lectura.")
+            await asyncio.sleep(self.intervalo)
+
+    async def revisar(self):
+        """
+        Revisa todos los motores una vez y actualiza su estado.
+        """
+        marca = time.time()
+        if any(not motor.local for motor in self.motores):
+            await run_in_threadpool(_escribir_latido, marca)
+        for motor in self.motores:
+            try:
+                latido = await run_in_threadpool(_leer_latido, motor)
+            except Exception as error:
+                self._actualizar(motor, False, None, str(error))
+                continue
+            retraso = 0.0 if latido is None else max(0.0, marca - latido)
+            if retraso > self.retraso_maximo:
+                self._actualizar(motor, False, retraso, f"Retraso de {retraso:.1f} s (máximo {self.retraso_maximo} s).")
+            else:
+                self._actualizar(motor, True, retraso, None)
+
+    def _actualizar(self, motor: MotorLectura, sano: bool, retraso: Optional[float], error: Optional[str]):
+        if sano and not motor.sano:
+            logger.info("Motor de lectura %s disponible.", motor.nombre)
+        elif not sano and (motor.sano or motor.revisado is None):
+            logger.warning("Motor de lectura %s fuera de servicio: %s", motor.nombre, error)
+        motor.sano, motor.retraso_segundos, motor.ultimo_error = sano, retraso, error
+        motor.revisado = time.time()
+
+    async def detener(self):
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self._tarea = None
+
+
+monitor = MonitorReplicas(motores_lectura)
+
+
+class MiddlewareLecturaPrimaria:
+    """
+    Middleware ASGI que agrega la cookie `leer_primaria` a las respuestas exitosas de las
+    peticiones que escriben, para que las lecturas siguientes del cliente vayan a la primaria.
+    """
+
+    def __init__(self, app, segundos: int = settings.db_lectura_pegajosa_segundos):
+        self.app = app
+        self.cookie = f"{COOKIE_LECTURA_PRIMARIA}=1; Max-Age={segundos}; Path=/; HttpOnly; SameSite=Lax".encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in METODOS_LECTURA:
+            await self.app(scope, receive, send)
+            return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and mensaje["status"] < 400:
+                mensaje = {**mensaje, "headers": [*mensaje.get("headers", []), (b"set-cookie", self.cookie)]}
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
+
+
+def estado() -> Dict[str, object]:
+    """
+    Estado de cada motor de lectura y sesiones abiertas por motor desde que inició el proceso.
+    """
+    return {
+        "motores_lectura": [
+            {
+                "nombre": motor.nombre,
+                "url": motor.engine.url.render_as_string(hide_password=True),
+                "local": motor.local,
+                "sano": motor.sano,
+                "retraso_segundos": None if motor.retraso_segundos is None else round(motor.retraso_segundos, 3),
+                "ultimo_error": motor.ultimo_error,
+                "revisado_hace_segundos": None if motor.revisado is None else round(time.time() - motor.revisado, 1),
+            }
+            for motor in motores_lectura
+        ],
+        "sesiones": dict(sesiones_por_motor),
+    }
+
+
+def series_metricas() -> list:
+    """
+    Series para /metrics (ver metricas.RegistroMetricas.agregar_fuente).
+    """
+    etiqueta = lambda nombre: (("motor", nombre),)
+    return [
+        ("counter", "universidad_bd_sesiones_total", "Sesiones de base de datos abiertas por motor.",
+         {etiqueta(nombre): total for nombre, total in sesiones_por_motor.items()}),
+        ("gauge", "universidad_bd_motor_sano", "1 si el motor de lectura recibe lecturas.",
+         {etiqueta(motor.nombre): int(motor.sano) for motor in motores_lectura}),
+        ("gauge", "universidad_bd_retraso_segundos", "Retraso medido del motor de lectura respecto de la primaria.",
+         {etiqueta(motor.nombre): motor.retraso_segundos for motor in motores_lectura if motor.retraso_segundos is not None}),
+    ]
@@ -0,0 +1,99 @@
+"""
+Tablas de resumen materializadas para los reportes (REPORTES_MATERIALIZADOS=true).
+
+`resumen_estudiante` guarda cuántos cursos y créditos tiene matriculados cada estudiante
+y `resumen_curso` cuántos estudiantes tiene cada curso. Un estudiante o curso sin fila
+en el resumen tiene totales en cero.
+
+Se mantienen de forma incremental: eventos.py marca en la sesión los estudiantes y
+cursos afectados por cada escritura y, justo antes del commit, se recalculan solo esas
+filas dentro de la misma transacción. Al iniciar la aplicación se reconstruyen completas,
+por si hubo cambios mientras estaban desactivadas.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, event, func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, insert, select
+
+from config import settings
+from database import engine
+from models import Curso, Matricula, ResumenCurso, ResumenEstudiante
+
+TAMANO_LOTE_IN = 500
+
+_CLAVE_ESTUDIANTES = "resumen_estudiantes_pendientes"
+_CLAVE_CURSOS = "resumen_cursos_pendientes"
+
+
+def _totales_estudiantes(cedulas: Optional[list] = None):
+    statement = (
+        select(Matricula.estudiante_cedula, func.count(), func.sum(Curso.creditos))
+        .join(Curso, Curso.codigo == Matricula.curso_codigo)
+        .group_by(Matricula.estudiante_cedula)
+    )
+    if cedulas is not None:
+        statement = statement.where(Matricula.estudiante_cedula.in_(cedulas))
+    return statement
+
+
+def _totales_cursos(codigos: Optional[list] = None):
+    statement = (
+        select(Curso.codigo, func.count())
+        .join(Matricula, Matricula.curso_codigo == Curso.codigo)
+        .group_by(Curso.codigo)
+    )
+    if codigos is not None:
+        statement = statement.where(Curso.codigo.in_(codigos))
+    return statement
+
+
+def marcar(session: Session, cedulas: Iterable[str] = (), codigos: Iterable[str] = ()):
+    """
+    Anota los estudiantes y cursos cuyos totales cambian con la transacción actual.
+    """
+    if not settings.reportes_materializados:
+        return
+    session.info.setdefault(_CLAVE_ESTUDIANTES, set()).update(cedulas)
+    session.info.setdefault(_CLAVE_CURSOS, set()).update(codigos)
+
+
+def recalcular(session: Session, cedulas: Iterable[str], codigos: Iterable[str]):
+    """
+    Vuelve a calcular las filas de resumen de los estudiantes y cursos dados.
+    """
+    cedulas, codigos = sorted(set(cedulas)), sorted(set(codigos))
+    for inicio in range(0, len(cedulas), TAMANO_LOTE_IN):
+        lote = cedulas[inicio:inicio + TAMANO_LOTE_IN]
+        session.exec(delete(ResumenEstudiante).where(ResumenEstudiante.cedula.in_(lote)))
+        session.exec(insert(ResumenEstudiante).from_select(["cedula", "cursos", "creditos"], _totales_estudiantes(lote)))
+    for inicio in range(0, len(codigos), TAMANO_LOTE_IN):
+        lote = codigos[inicio:inicio + TAMANO_LOTE_IN]
+        session.exec(delete(ResumenCurso).where(ResumenCurso.codigo.in_(lote)))
+        session.exec(insert(ResumenCurso).from_select(["codigo", "matriculados"], _totales_cursos(lote)))
+
+
+@event.listens_for(Session, "before_commit")
+def _actualizar_pendientes(session: Session):
+    cedulas = session.info.pop(_CLAVE_ESTUDIANTES, None)
+    codigos = session.info.pop(_CLAVE_CURSOS, None)
+    if cedulas or codigos:
+        recalcular(session, cedulas or (), codigos or ())
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session: Session):
+    session.info.pop(_CLAVE_ESTUDIANTES, None)
+    session.info.pop(_CLAVE_CURSOS, None)
+
+
+def reconstruir(engine_a_usar: Engine = engine):
+    """
+    Recalcula por completo las tablas de resumen con dos consultas GROUP BY.
+    """
+    with Session(engine_a_usar) as session:
+        session.exec(delete(ResumenEstudiante))
+        session.exec(delete(ResumenCurso))
+        session.exec(insert(ResumenEstudiante).from_select(["cedula", "cursos", "creditos"], _totales_estudiantes()))
+        session.exec(insert(ResumenCurso).from_select(["codigo", "matriculados"], _totales_cursos()))
+        session.commit()
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Query
+
+import busqueda
+from database import SessionDep
+from models import CursoRead, EstudianteRead, ResultadosBusqueda
+
+router = APIRouter(
+    prefix="/buscar",
+    tags=["Búsqueda"]
+)
+
+@router.get("/", response_model=ResultadosBusqueda)
+async def buscar(
+    *,
+    session: SessionDep,
+    q: str = Query(..., min_length=1, max_length=200),
+    tipo: str = Query("todos", pattern="^(todos|estudiantes|cursos)$"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Busca estudiantes por nombre o email y cursos por código o nombre.
+
+    Cada palabra de `q` se busca como prefijo y sin distinguir mayúsculas ni tildes
+    ("jose per" encuentra a "José Pérez"); deben aparecer todas. Los resultados de cada
+    tipo vienen ordenados de más a menos relevante (ver busqueda.py).
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        q: Texto a buscar.
+        tipo: `todos` (por defecto), `estudiantes` o `cursos`.
+        limit: Cantidad máxima de resultados de cada tipo (20 por defecto).
+
+    Returns:
+        ResultadosBusqueda: Estudiantes y cursos encontrados.
+    """
+    resultados = ResultadosBusqueda()
+    if tipo in ("todos", "estudiantes"):
+        statement = busqueda.consulta_estudiantes(q, limit)
+        if statement is not None:
+            resultados.estudiantes = [EstudianteRead.model_validate(e) for e in (await session.exec(statement)).all()]
+    if tipo in ("todos", "cursos"):
+        statement = busqueda.consulta_cursos(q, limit)
+        if statement is not None:
+            resultados.cursos = [CursoRead.model_validate(c) for c in (await session.exec(statement)).all()]
+    return resultados
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+
+from database import SessionDep
+import cambios
+from models import CambioRead
+from paginacion import LIMITE_MAXIMO, LIMITE_POR_DEFECTO
+from serializacion import como_dicts, respuesta_json
+
+router = APIRouter(
+    prefix="/cambios",
+    tags=["Cambios"]
+)
+
+LATIDO_SSE_SEGUNDOS = 15.0
+
+@router.get("/", response_model=List[CambioRead])
+async def read_cambios(
+    *,
+    session: SessionDep,
+    response: Response,
+    desde: int = Query(0, ge=0),
+    curso: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO)
+):
+    """
+    Obtiene, en orden, los cambios de cursos, estudiantes y matrículas posteriores a `desde`.
+
+    El cliente guarda el `seq` del último cambio recibido y lo envía como `desde` en la
+    siguiente consulta. Si recibe `limit` cambios, hay más y conviene volver a pedir enseguida.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        response: Respuesta HTTP.
+        desde: `seq` del último cambio ya recibido (0 para empezar por el más antiguo guardado).
+        curso: Código de curso para recibir solo sus cambios (matrículas, modificación, eliminación).
+        limit: Cantidad máxima de cambios (100 por defecto).
+
+    Raises:
+        HTTPException 410: Si los cambios siguientes a `desde` ya se borraron del registro;
+            hay que volver a leer el estado completo y seguir desde el último `seq`.
+
+    Returns:
+        List[CambioRead]: Cambios con su `seq`, momento (UTC), tipo, curso y estudiante.
+    """
+    if cambios.perdido(desde, (await session.exec(cambios.consulta_primero())).one()):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Los cambios pedidos ya no están en el registro.")
+
+    filas = (await session.exec(cambios.consulta_desde(desde, limit or LIMITE_POR_DEFECTO, curso))).all()
+    return respuesta_json(como_dicts(filas), response)
+
+@router.get("/eventos", response_class=StreamingResponse)
+async def stream_cambios(
+    *,
+    curso: Optional[str] = Query(None),
+    desde: Optional[int] = Query(None, ge=0),
+    last_event_id: Optional[int] = Header(None, ge=0)
+):
+    """
+    Transmite los cambios como Server-Sent Events a medida que se confirman.
+
+    Cada evento lleva como `id` el `seq` del cambio, como `event` su tipo (por ejemplo
+    `matricula.creada` o `matricula.eliminada`) y como `data` el cambio en JSON. Al
+    reconectarse, el navegador envía `Last-Event-ID` y recibe lo que se perdió. Si eso ya
+    se borró del registro, llega primero un evento `reinicio`.
+
+    Args:
+        curso: Código de curso para recibir solo sus cambios.
+        desde: `seq` desde el que enviar los cambios guardados; sin él (ni `Last-Event-ID`)
+            solo se envían los cambios nuevos.
+        last_event_id: Cabecera `Last-Event-ID` de una reconexión; tiene prioridad sobre `desde`.
+    """
+    inicio = last_event_id if last_event_id is not None else desde
+    return StreamingResponse(
+        cambios.eventos_sse(curso, inicio, LATIDO_SSE_SEGUNDOS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, HTTPException, status, Query
-from sqlmodel import select, func, Session, and_
-from typing import List, Optional
-
-from database import SessionDep
+from fastapi import APIRouter, HTTPException, status, Query, Response, Request
+from sqlmodel import func, update
+from sqlalchemy.orm import selectinload
+from typing import Dict, List, Optional, Tuple
+
+from database import SessionDep, con_reintentos, iniciar_escritura, engine_de_lectura, sesion_independiente
+from cache import cache_cursos
+import crud
+from etags import verificar_etag, verificar_etag_de_varios, verificar_version, version_de, copiar_etag, variante_de_consulta
+import cupos
+import eventos
+import horarios
+import limpieza
+import lista_espera
+from carga_masiva import importar_desde_peticion, respuesta_exportacion
+from paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO, CABECERA_CURSOR, paginar, cortar_pagina, respuesta_ndjson
+from serializacion import codificar, como_dicts, respuesta_json
 from models import (
     Curso, CursoCreate, CursoUpdate, CursoRead, CursoReadWithEstudiantes, 
-    EstudianteRead, MatriculaBase, Matricula, Estudiante
+    EstudianteRead, MatriculaBase, Matricula, Estudiante, ImportacionReport
 )
 
 router = APIRouter(
@@ -13,8 +25,43 @@ router = APIRouter(
     tags=["Cursos"]
 )
 
+MAX_CURSOS_POR_CONSULTA = 100
+# Páginas del catálogo sin filtros que cada worker deja en la caché al iniciar (ver main.py).
+PAGINAS_PRECARGADAS = 20
+
+def _clave_lista(creditos: Optional[int], codigo: Optional[str], cursor: Optional[str], limite: int) -> tuple:
+    return ("lista", creditos, codigo.lower() if codigo is not None else None, cursor, limite)
+
+async def _cargar_pagina(session: SessionDep, statement, cursor: Optional[str], limite: int) -> Tuple[bytes, Optional[str]]:
+    filas = (await session.exec(paginar(statement, Curso.codigo, cursor, limite))).all()
+    pagina, cursor_siguiente = cortar_pagina(filas, limite, "codigo")
+    return codificar(como_dicts(pagina)), cursor_siguiente
+
+async def precargar_catalogo() -> int:
+    """
+    Carga en la caché del catálogo las primeras PAGINAS_PRECARGADAS páginas del listado
+    sin filtros, para que las primeras peticiones de un worker recién iniciado no esperen
+    a la base de datos.
+
+    Returns:
+        int: Cantidad de páginas cargadas.
+    """
+    if not cache_cursos.habilitada:
+        return 0
+    paginas, cursor = 0, None
+    async with sesion_independiente() as session:
+        # Las páginas se guardan con la versión del catálogo leída antes de cargarlas, como en read_cursos.
+        version = await version_de(session, eventos.RECURSO_CURSOS)
+        while paginas < PAGINAS_PRECARGADAS:
+            clave = _clave_lista(None, None, cursor, LIMITE_POR_DEFECTO)
+            _, cursor = await cache_cursos.obtener_o_cargar(clave, lambda: _cargar_pagina(session, crud.LISTADO_CURSOS, cursor, LIMITE_POR_DEFECTO), version)
+            paginas += 1
+            if not cursor:
+                break
+    return paginas
+
 @router.post("/", response_model=CursoRead, status_code=status.HTTP_201_CREATED)
-def create_curso(*, session: SessionDep, curso_in: CursoCreate):
+async def create_curso(*, session: SessionDep, curso_in: CursoCreate):
     """
     Crea un nuevo curso en la base de datos.
 
@@ -23,55 +70,181 @@ def create_curso(*, session: SessionDep, curso_in: CursoCreate):
         curso_in: Datos del nuevo curso (nombre, créditos, horario, código).
 
     Raises:
-        HTTPException 409: Si el código del curso ya existe.
+        HTTPException 409: Si el código del curso ya existe, también si es de un curso eliminado
+            cuya limpieza sigue pendiente.
 
     Returns:
         CursoRead: El objeto curso creado.
     """
-    existing_curso = session.get(Curso, curso_in.codigo)
-    if existing_curso:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ya existe un curso con ese código.")
+    estado = await crud.estado_curso(session, curso_in.codigo)
+    if estado is not None:
+        detalle = "Ya existe un curso con ese código." if estado else "Un curso eliminado con ese código aún se está limpiando; intente de nuevo en unos segundos."
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detalle)
 
     curso = Curso.model_validate(curso_in)
+    curso.franjas = horarios.crear_franjas(curso.codigo, curso.horario)
     session.add(curso)
-    session.commit()
-    session.refresh(curso)
+    await eventos.curso_creado(session, curso.codigo)
+    await session.commit()
+    await session.refresh(curso)
     return curso
 
 @router.get("/", response_model=List[CursoRead])
-def read_cursos(
+async def read_cursos(
     *, 
     session: SessionDep, 
+    request: Request,
+    response: Response,
     creditos: Optional[int] = Query(None), 
-    codigo: Optional[str] = Query(None) 
+    codigo: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$")
 ):
     """
-    Obtiene una lista de todos los cursos, con soporte para filtros.
+    Obtiene una lista paginada de cursos ordenada por código, con soporte para filtros.
+    Las páginas JSON se guardan ya codificadas en la caché del catálogo mientras no se modifique ningún curso,
+    y con `If-None-Match` se responde 304 si el catálogo no cambió.
+
+    La paginación es por cursor (keyset): si hay más resultados, la respuesta incluye
+    la cabecera `X-Cursor-Siguiente` con el token que debe enviarse como `cursor`
+    para obtener la página siguiente.
 
     Args:
         session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el cursor siguiente y el ETag.
         creditos: Parámetro opcional para filtrar cursos por cantidad de créditos.
         codigo: Parámetro opcional para filtrar cursos por código.
+        cursor: Token de continuación devuelto por la página anterior.
+        limit: Cantidad máxima de cursos por página (100 por defecto).
+        formato: `json` (por defecto) o `ndjson` para recibir los cursos en streaming,
+            una fila por línea, sin límite salvo que se indique `limit`.
+
+    Raises:
+        HTTPException 400: Si el cursor no es válido.
 
     Returns:
         List[CursoRead]: Lista de objetos curso.
     """
-    statement = select(Curso)
+    version, no_modificado = await verificar_version(session, request, response, eventos.RECURSO_CURSOS, variante_de_consulta(request, "lista"))
+    if no_modificado:
+        return no_modificado
+
+    statement = crud.LISTADO_CURSOS
     if creditos is not None:
         statement = statement.where(Curso.creditos == creditos)
     if codigo is not None:
         statement = statement.where(func.lower(Curso.codigo) == func.lower(codigo))
-        
-    cursos = session.exec(statement).all()
-    return cursos
+
+    if formato == "ndjson":
+        return copiar_etag(response, await respuesta_ndjson(paginar(statement, Curso.codigo, cursor, limit), engine_de_lectura(session), limit, "codigo"))
+
+    limite = limit or LIMITE_POR_DEFECTO
+    clave = _clave_lista(creditos, codigo, cursor, limite)
+    cuerpo, cursor_siguiente = await cache_cursos.obtener_o_cargar(clave, lambda: _cargar_pagina(session, statement, cursor, limite), version)
+    if cursor_siguiente:
+        response.headers[CABECERA_CURSOR] = cursor_siguiente
+    return respuesta_json(cuerpo, response)
+
+@router.post("/importar", response_model=ImportacionReport)
+async def importar_cursos(
+    *,
+    request: Request,
+    formato: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """
+    Importa cursos desde un archivo CSV o NDJSON enviado como cuerpo de la petición.
+
+    Cada fila se valida con las reglas de `CursoCreate` y las válidas se insertan en lotes.
+    Las filas rechazadas (inválidas, repetidas o ya existentes) se informan sin detener la carga.
+
+    Args:
+        request: Petición cuyo cuerpo es el archivo a importar.
+        formato: `csv` (con encabezado) o `ndjson`.
+
+    Returns:
+        ImportacionReport: Totales y filas rechazadas con su motivo.
+    """
+    return await importar_desde_peticion(request, "cursos", formato)
+
+@router.get("/exportar")
+async def exportar_cursos(
+    *,
+    session: SessionDep,
+    request: Request,
+    response: Response,
+    formato: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """
+    Exporta todos los cursos en CSV o NDJSON, transmitiendo las filas directamente desde el cursor de la base de datos.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para calcular el ETag.
+        formato: `csv` (por defecto) o `ndjson`.
+
+    Returns:
+        StreamingResponse: Archivo descargable con los cursos (o 304 si no cambiaron).
+    """
+    no_modificado = await verificar_etag(session, request, response, eventos.RECURSO_CURSOS, f"exportar:{formato}")
+    if no_modificado:
+        return no_modificado
+    return copiar_etag(response, respuesta_exportacion("cursos", formato, engine_de_lectura(session)))
+
+@router.get("/estudiantes/", response_model=Dict[str, List[EstudianteRead]])
+async def get_estudiantes_de_cursos(
+    *,
+    session: SessionDep,
+    request: Request,
+    response: Response,
+    codigo: List[str] = Query(..., min_length=1, max_length=MAX_CURSOS_POR_CONSULTA)
+):
+    """
+    Obtiene en una sola petición los estudiantes matriculados en varios cursos
+    (`?codigo=MAT101&codigo=FIS201`), con dos consultas IN en lugar de una petición por curso.
+    El ETag combina las versiones de los cursos pedidos: con `If-None-Match` se responde 304
+    si ninguno cambió.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el ETag.
+        codigo: Códigos de los cursos (hasta 100).
+
+    Raises:
+        HTTPException 404: Si alguno de los cursos no es encontrado.
+
+    Returns:
+        Dict[str, List[EstudianteRead]]: Estudiantes de cada curso, en el orden de los códigos recibidos.
+    """
+    codigos = list(dict.fromkeys(codigo))
+    no_modificado = await verificar_etag_de_varios(session, request, response, [eventos.recurso_curso(c) for c in codigos], "estudiantes")
+    if no_modificado:
+        return no_modificado
+
+    existentes = await crud.cursos_por_codigo(session, codigos)
+    faltantes = [c for c in codigos if c not in existentes]
+    if faltantes:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Cursos no encontrados: {', '.join(faltantes)}.")
+
+    matriculados = await crud.estudiantes_de_cursos(session, codigos)
+    return respuesta_json({c: matriculados.get(c, []) for c in codigos}, response)
 
 @router.get("/{codigo}/", response_model=CursoReadWithEstudiantes)
-def read_curso(*, session: SessionDep, codigo: str):
+async def read_curso(*, session: SessionDep, request: Request, response: Response, codigo: str):
     """
     Obtiene un curso por su código, incluyendo la lista de estudiantes matriculados.
+    Usa dos sentencias sin importar cuántos inscritos tenga: el curso y un JOIN de sus
+    matrículas con los estudiantes, ambas solo con las columnas de la respuesta.
+    El cuerpo ya codificado se guarda en caché hasta que cambie el curso o sus matrículas,
+    y con `If-None-Match` se responde 304 si no cambió.
 
     Args:
         session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el ETag.
         codigo: Código del curso a buscar.
 
     Raises:
@@ -80,55 +253,81 @@ def read_curso(*, session: SessionDep, codigo: str):
     Returns:
         CursoReadWithEstudiantes: El objeto curso con sus estudiantes.
     """
-    curso = session.get(Curso, codigo)
-    if not curso:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
-        
-    estudiantes_matriculados = [matricula.estudiante for matricula in curso.matriculas]
-    
-    curso_read = CursoReadWithEstudiantes.model_validate(curso)
-    curso_read.estudiantes = [EstudianteRead.model_validate(estudiante) for estudiante in estudiantes_matriculados]
-    return curso_read
+    version, no_modificado = await verificar_version(session, request, response, eventos.recurso_curso(codigo), "detalle")
+    if no_modificado:
+        return no_modificado
+
+    async def cargar() -> bytes:
+        curso = await crud.curso_con_estudiantes(session, codigo)
+        if curso is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
+        return codificar(curso)
+
+    return respuesta_json(await cache_cursos.obtener_o_cargar(("detalle", codigo), cargar, version), response)
 
 @router.patch("/{codigo}/", response_model=CursoRead)
-def update_curso(*, session: SessionDep, codigo: str, curso_in: CursoUpdate):
+async def update_curso(*, session: SessionDep, codigo: str, curso_in: CursoUpdate):
     """
     Actualiza parcialmente los datos de un curso por su código.
 
     Args:
         session: Dependencia de sesión de la base de datos.
         codigo: Código del curso a actualizar.
-        curso_in: Datos a actualizar (nombre, créditos, horario).
+        curso_in: Datos a actualizar (nombre, créditos, horario, cupo). Si sube el cupo, la
+            lista de espera se promueve automáticamente.
 
     Raises:
         HTTPException 404: Si el curso no es encontrado.
-        HTTPException 409: Si hay conflicto de unicidad al actualizar.
+        HTTPException 409: Si hay conflicto de unicidad al actualizar, o si el cupo baja por debajo de
+            los estudiantes matriculados más los que están en la lista de espera.
+        HTTPException 503: Si la base de datos sigue ocupada con otras escrituras tras varios reintentos.
 
     Returns:
         CursoRead: El objeto curso actualizado.
     """
-    db_curso = session.get(Curso, codigo)
-    if not db_curso:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
-
     update_data = curso_in.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_curso, key, value)
-    
-    session.add(db_curso)
-    try:
-        session.commit()
-        session.refresh(db_curso)
+
+    async def actualizar():
+        # Con el bloqueo de escritura desde el inicio, como la matrícula: ninguna matrícula
+        # concurrente ocupa un cupo entre el conteo y el cambio de cupo.
+        await iniciar_escritura(session)
+        db_curso = await session.get(Curso, codigo, options=[selectinload(Curso.franjas)], with_for_update=True)
+        if not db_curso or not db_curso.activo:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
+
+        if update_data.get("cupo") is not None:
+            ocupados = (await session.exec(cupos.consulta_ocupados([codigo]))).first()
+            en_espera = (await session.exec(cupos.consulta_en_espera([codigo]))).first()
+            motivo = cupos.cupo_insuficiente(db_curso, update_data["cupo"], (ocupados[1] if ocupados else 0) + (en_espera[1] if en_espera else 0))
+            if motivo:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=motivo)
+
+        for key, value in update_data.items():
+            setattr(db_curso, key, value)
+        if "horario" in update_data:
+            db_curso.franjas = horarios.crear_franjas(codigo, db_curso.horario)
+
+        session.add(db_curso)
+        await eventos.curso_modificado(session, codigo, horario_modificado="horario" in update_data)
+        await lista_espera.cupos_liberados(session, codigos=[codigo])
+        await session.commit()
+        await session.refresh(db_curso)
         return db_curso
+
+    try:
+        return await con_reintentos(session, actualizar)
     except Exception as e:
         if "unique constraint" in str(e).lower():
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Error de unicidad al actualizar.")
         raise
 
 @router.delete("/{codigo}/", status_code=status.HTTP_204_NO_CONTENT)
-def delete_curso(*, session: SessionDep, codigo: str):
+async def delete_curso(*, session: SessionDep, codigo: str):
     """
-    Elimina un curso por su código.
+    Elimina un curso por su código. El curso se marca como inactivo y deja de aparecer en las
+    lecturas al responder; sus matrículas, su lista de espera y sus franjas horarias se borran
+    en segundo plano, por lotes (ver limpieza.py). El horario y los créditos que libera en sus
+    estudiantes se ofrecen entonces a las listas de espera.
 
     Args:
         session: Dependencia de sesión de la base de datos.
@@ -137,16 +336,17 @@ def delete_curso(*, session: SessionDep, codigo: str):
     Raises:
         HTTPException 404: Si el curso no es encontrado.
     """
-    curso = session.get(Curso, codigo)
-    if not curso:
+    statement = update(Curso).where(Curso.codigo == codigo, crud.CURSO_ACTIVO).values(activo=False)
+    if not (await session.exec(statement)).rowcount:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
 
-    session.delete(curso)
-    session.commit()
+    await eventos.curso_modificado(session, codigo, eliminado=True)
+    await limpieza.eliminacion_pendiente(session)
+    await session.commit()
     return {"ok": True}
 
 @router.post("/{codigo}/estudiantes/", status_code=status.HTTP_201_CREATED)
-def add_estudiante_to_curso(
+async def add_estudiante_to_curso(
     *, 
     session: SessionDep, 
     codigo: str, 
@@ -163,55 +363,71 @@ def add_estudiante_to_curso(
     Raises:
         HTTPException 400: Si el código de la URL no coincide con el del cuerpo.
         HTTPException 404: Si el estudiante o el curso no son encontrados.
-        HTTPException 409: Si el estudiante ya está matriculado en el curso, o si hay conflicto de horario (Lógica de Negocio).
+        HTTPException 409: Si el estudiante ya está matriculado en el curso, si el horario se cruza con el de
+            otro curso suyo (Lógica de Negocio), si el curso no tiene cupos (los de quienes están en la lista de
+            espera no cuentan como libres) o si se superan los créditos máximos del semestre del estudiante. Los choques parciales se detectan sobre las franjas indexadas;
+            los horarios que no se pudieron interpretar solo chocan si el texto es idéntico.
+        HTTPException 503: Si la base de datos sigue ocupada con otras escrituras tras varios reintentos.
 
     Returns:
         dict: Mensaje de éxito y el objeto matrícula.
     """
     if codigo != matricula_data.curso_codigo:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El código de curso en la URL y el cuerpo deben coincidir.")
-        
-    estudiante = session.get(Estudiante, matricula_data.estudiante_cedula)
-    curso = session.get(Curso, codigo)
-    
-    if not estudiante:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado.")
-    if not curso:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado.")
-        
-    statement_horario = select(Curso).join(Matricula).where(
-        and_(
-            Matricula.estudiante_cedula == matricula_data.estudiante_cedula,
-            Curso.horario == curso.horario, 
-            Curso.codigo != codigo
-        )
-    )
-    curso_conflicto = session.exec(statement_horario).first()
-
-    if curso_conflicto:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT, 
-            detail=f"Lógica de negocio: El estudiante ya está matriculado en el curso '{curso_conflicto.nombre}' con el mismo horario: {curso_conflicto.horario}."
-        )
-
-    existing_matricula = session.get(Matricula, (matricula_data.estudiante_cedula, codigo))
-    if existing_matricula:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El estudiante ya está matriculado en este curso.")
-
-    matricula = Matricula.model_validate(matricula_data)
-    session.add(matricula)
-    session.commit()
-    session.refresh(matricula)
+
+    async def matricular():
+        # Las validaciones y el INSERT van en una transacción que toma el bloqueo de escritura
+        # desde el inicio: dos matrículas concurrentes no pueden ocupar el mismo cupo.
+        await iniciar_escritura(session)
+        estudiante = await session.get(Estudiante, matricula_data.estudiante_cedula, with_for_update=True)
+        curso = await session.get(Curso, codigo, with_for_update=True)
+
+        if not estudiante or not estudiante.activo:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado.")
+        if not curso or not curso.activo:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado.")
+
+        curso_conflicto = await crud.curso_en_conflicto(session, matricula_data.estudiante_cedula, codigo, curso.horario)
+        if curso_conflicto:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, 
+                detail=cupos.choque_de_horario(curso_conflicto)
+            )
+
+        if await crud.existe_matricula(session, matricula_data.estudiante_cedula, codigo):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El estudiante ya está matriculado en este curso.")
+
+        ocupados = (await session.exec(cupos.consulta_ocupados([codigo]))).first()
+        en_espera = (await session.exec(cupos.consulta_en_espera([codigo]))).first()
+        motivo = cupos.sin_cupo(curso, (ocupados[1] if ocupados else 0) + (en_espera[1] if en_espera else 0))
+        if motivo is None:
+            creditos = (await session.exec(cupos.consulta_creditos([estudiante.cedula]))).first()
+            motivo = cupos.excede_creditos(estudiante.semestre, creditos[1] if creditos else 0, curso)
+        if motivo:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=motivo)
+
+        matricula = Matricula.model_validate(matricula_data)
+        session.add(matricula)
+        await eventos.matriculas_cambiadas(session, [(matricula.estudiante_cedula, matricula.curso_codigo)])
+        await session.commit()
+        await session.refresh(matricula)
+        return estudiante, curso, matricula
+
+    estudiante, curso, matricula = await con_reintentos(session, matricular)
     return {"message": f"Estudiante {estudiante.cedula} matriculado exitosamente en el curso {curso.codigo}", "matricula": matricula}
 
 
 @router.get("/{codigo}/estudiantes/", response_model=List[EstudianteRead])
-def get_estudiantes_de_curso(*, session: SessionDep, codigo: str):
+async def get_estudiantes_de_curso(*, session: SessionDep, request: Request, response: Response, codigo: str):
     """
     Obtiene la lista de estudiantes matriculados en un curso.
+    Los estudiantes se obtienen con un único JOIN sobre la matrícula y el cuerpo ya codificado se guarda en caché.
+    Con `If-None-Match` se responde 304 si la lista no cambió.
 
     Args:
         session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el ETag.
         codigo: Código del curso.
 
     Raises:
@@ -220,8 +436,13 @@ def get_estudiantes_de_curso(*, session: SessionDep, codigo: str):
     Returns:
         List[EstudianteRead]: Lista de estudiantes.
     """
-    curso = session.get(Curso, codigo)
-    if not curso:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
-        
-    return [m.estudiante for m in curso.matriculas]
\ No newline at end of file
+    version, no_modificado = await verificar_version(session, request, response, eventos.recurso_curso(codigo), "estudiantes")
+    if no_modificado:
+        return no_modificado
+
+    async def cargar() -> bytes:
+        if not await crud.existe_curso(session, codigo):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
+        return codificar(await crud.estudiantes_de_curso(session, codigo))
+
+    return respuesta_json(await cache_cursos.obtener_o_cargar(("estudiantes", codigo), cargar, version), response)
\ No newline at end of file
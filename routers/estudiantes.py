@@ -1,11 +1,24 @@
-from fastapi import APIRouter, HTTPException, status, Query
-from sqlmodel import select, Session
+from fastapi import APIRouter, HTTPException, status, Query, Response, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import update
 from typing import List, Optional
 
-from database import SessionDep
+from database import SessionDep, engine_de_lectura
+from cache import cache_estudiantes
+import crud
+import cupos
+from etags import verificar_etag, verificar_version, copiar_etag, variante_de_consulta
+import eventos
+import horarios
+import limpieza
+import lista_espera
+import planificacion
+from carga_masiva import importar_desde_peticion, respuesta_exportacion
+from paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO, paginar, recortar_pagina, respuesta_ndjson
+from serializacion import codificar, como_dicts, respuesta_json
 from models import (
     Estudiante, EstudianteCreate, EstudianteUpdate, EstudianteRead, EstudianteReadWithCursos,
-    CursoRead
+    CursoRead, HorarioEstudianteRead, ImportacionReport, PlanesMatriculaReport
 )
 
 router = APIRouter(
@@ -13,8 +26,10 @@ router = APIRouter(
     tags=["Estudiantes"]
 )
 
+MAX_CURSOS_POR_PLAN = 50
+
 @router.post("/", response_model=EstudianteRead, status_code=status.HTTP_201_CREATED)
-def create_estudiante(*, session: SessionDep, estudiante_in: EstudianteCreate):
+async def create_estudiante(*, session: SessionDep, estudiante_in: EstudianteCreate):
     """
     Crea un nuevo estudiante en la base de datos.
 
@@ -23,21 +38,24 @@ def create_estudiante(*, session: SessionDep, estudiante_in: EstudianteCreate):
         estudiante_in: Datos del nuevo estudiante (nombre, email, semestre, cédula).
 
     Raises:
-        HTTPException 409: Si la cédula o el email ya existen.
+        HTTPException 409: Si la cédula o el email ya existen, también si son de un estudiante
+            eliminado cuya limpieza sigue pendiente.
 
     Returns:
         EstudianteRead: El objeto estudiante creado.
     """
-    existing_estudiante = session.get(Estudiante, estudiante_in.cedula)
-    if existing_estudiante:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Ya existe un estudiante con esa cédula.")
+    estado = await crud.estado_estudiante(session, estudiante_in.cedula)
+    if estado is not None:
+        detalle = "Ya existe un estudiante con esa cédula." if estado else "Un estudiante eliminado con esa cédula aún se está limpiando; intente de nuevo en unos segundos."
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detalle)
 
     estudiante = Estudiante.model_validate(estudiante_in)
     session.add(estudiante)
     
     try:
-        session.commit()
-        session.refresh(estudiante)
+        await eventos.estudiante_creado(session, estudiante.cedula)
+        await session.commit()
+        await session.refresh(estudiante)
         return estudiante
     except Exception as e:
         if "unique constraint" in str(e).lower():
@@ -45,35 +63,114 @@ def create_estudiante(*, session: SessionDep, estudiante_in: EstudianteCreate):
         raise
 
 @router.get("/", response_model=List[EstudianteRead])
-def read_estudiantes(
+async def read_estudiantes(
     *, 
     session: SessionDep, 
-    semestre: Optional[int] = Query(None)
+    request: Request,
+    response: Response,
+    semestre: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO),
+    formato: str = Query("json", pattern="^(json|ndjson)$")
 ):
     """
-    Obtiene una lista de todos los estudiantes.
+    Obtiene una lista paginada de estudiantes ordenada por cédula.
+
+    La paginación es por cursor (keyset): si hay más resultados, la respuesta incluye
+    la cabecera `X-Cursor-Siguiente` con el token que debe enviarse como `cursor`
+    para obtener la página siguiente. Con `If-None-Match` se responde 304 si ningún
+    estudiante cambió.
 
     Args:
         session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el cursor siguiente y el ETag.
         semestre: Parámetro opcional para filtrar estudiantes por semestre.
+        cursor: Token de continuación devuelto por la página anterior.
+        limit: Cantidad máxima de estudiantes por página (100 por defecto).
+        formato: `json` (por defecto) o `ndjson` para recibir los estudiantes en streaming,
+            una fila por línea, sin límite salvo que se indique `limit`.
+
+    Raises:
+        HTTPException 400: Si el cursor no es válido.
 
     Returns:
         List[EstudianteRead]: Lista de objetos estudiante.
     """
-    statement = select(Estudiante)
+    no_modificado = await verificar_etag(session, request, response, eventos.RECURSO_ESTUDIANTES, variante_de_consulta(request, "lista"))
+    if no_modificado:
+        return no_modificado
+
+    statement = crud.LISTADO_ESTUDIANTES
     if semestre is not None:
         statement = statement.where(Estudiante.semestre == semestre)
-        
-    estudiantes = session.exec(statement).all()
-    return estudiantes
+
+    if formato == "ndjson":
+        return copiar_etag(response, await respuesta_ndjson(paginar(statement, Estudiante.cedula, cursor, limit), engine_de_lectura(session), limit, "cedula"))
+
+    limite = limit or LIMITE_POR_DEFECTO
+    filas = (await session.exec(paginar(statement, Estudiante.cedula, cursor, limite))).all()
+    return respuesta_json(como_dicts(recortar_pagina(filas, limite, "cedula", response)), response)
+
+@router.post("/importar", response_model=ImportacionReport)
+async def importar_estudiantes(
+    *,
+    request: Request,
+    formato: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """
+    Importa estudiantes desde un archivo CSV o NDJSON enviado como cuerpo de la petición.
+
+    Cada fila se valida con las reglas de `EstudianteCreate` y las válidas se insertan en lotes.
+    Las filas rechazadas (inválidas, repetidas o ya existentes) se informan sin detener la carga.
+
+    Args:
+        request: Petición cuyo cuerpo es el archivo a importar.
+        formato: `csv` (con encabezado) o `ndjson`.
+
+    Returns:
+        ImportacionReport: Totales y filas rechazadas con su motivo.
+    """
+    return await importar_desde_peticion(request, "estudiantes", formato)
+
+@router.get("/exportar")
+async def exportar_estudiantes(
+    *,
+    session: SessionDep,
+    request: Request,
+    response: Response,
+    formato: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """
+    Exporta todos los estudiantes en CSV o NDJSON, transmitiendo las filas directamente desde el cursor de la base de datos.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para calcular el ETag.
+        formato: `csv` (por defecto) o `ndjson`.
+
+    Returns:
+        StreamingResponse: Archivo descargable con los estudiantes (o 304 si no cambiaron).
+    """
+    no_modificado = await verificar_etag(session, request, response, eventos.RECURSO_ESTUDIANTES, f"exportar:{formato}")
+    if no_modificado:
+        return no_modificado
+    return copiar_etag(response, respuesta_exportacion("estudiantes", formato, engine_de_lectura(session)))
 
 @router.get("/{cedula}/", response_model=EstudianteReadWithCursos)
-def read_estudiante(*, session: SessionDep, cedula: str):
+async def read_estudiante(*, session: SessionDep, request: Request, response: Response, cedula: str):
     """
     Obtiene un estudiante por su cédula, incluyendo la lista de cursos matriculados.
+    Usa dos sentencias sin importar cuántos cursos tenga: el estudiante y un JOIN de sus
+    matrículas con los cursos, ambas solo con las columnas de la respuesta.
+    El cuerpo ya codificado se guarda en caché hasta que cambie el estudiante, sus matrículas
+    o sus cursos, y con `If-None-Match` se responde 304 si no cambió.
 
     Args:
         session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el ETag.
         cedula: Cédula del estudiante a buscar.
 
     Raises:
@@ -82,18 +179,20 @@ def read_estudiante(*, session: SessionDep, cedula: str):
     Returns:
         EstudianteReadWithCursos: El objeto estudiante con sus cursos.
     """
-    estudiante = session.get(Estudiante, cedula)
-    if not estudiante:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado")
-        
-    cursos_matriculados = [matricula.curso for matricula in estudiante.matriculas]
-    
-    estudiante_read = EstudianteReadWithCursos.model_validate(estudiante)
-    estudiante_read.cursos = [CursoRead.model_validate(curso) for curso in cursos_matriculados]
-    return estudiante_read
+    version, no_modificado = await verificar_version(session, request, response, eventos.recurso_estudiante(cedula), "detalle")
+    if no_modificado:
+        return no_modificado
+
+    async def cargar() -> bytes:
+        estudiante = await crud.estudiante_con_cursos(session, cedula)
+        if estudiante is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado")
+        return codificar(estudiante)
+
+    return respuesta_json(await cache_estudiantes.obtener_o_cargar(("detalle", cedula), cargar, version), response)
 
 @router.patch("/{cedula}/", response_model=EstudianteRead)
-def update_estudiante(*, session: SessionDep, cedula: str, estudiante_in: EstudianteUpdate):
+async def update_estudiante(*, session: SessionDep, cedula: str, estudiante_in: EstudianteUpdate):
     """
     Actualiza parcialmente los datos de un estudiante por su cédula.
 
@@ -109,8 +208,8 @@ def update_estudiante(*, session: SessionDep, cedula: str, estudiante_in: Estudi
     Returns:
         EstudianteRead: El objeto estudiante actualizado.
     """
-    db_estudiante = session.get(Estudiante, cedula)
-    if not db_estudiante:
+    db_estudiante = await session.get(Estudiante, cedula)
+    if not db_estudiante or not db_estudiante.activo:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado")
 
     update_data = estudiante_in.model_dump(exclude_unset=True)
@@ -119,8 +218,10 @@ def update_estudiante(*, session: SessionDep, cedula: str, estudiante_in: Estudi
     
     session.add(db_estudiante)
     try:
-        session.commit()
-        session.refresh(db_estudiante)
+        await eventos.estudiante_modificado(session, cedula)
+        await lista_espera.cupos_liberados(session, cedulas=[cedula])
+        await session.commit()
+        await session.refresh(db_estudiante)
         return db_estudiante
     except Exception as e:
         if "unique constraint" in str(e).lower():
@@ -128,10 +229,12 @@ def update_estudiante(*, session: SessionDep, cedula: str, estudiante_in: Estudi
         raise
 
 @router.delete("/{cedula}/", status_code=status.HTTP_204_NO_CONTENT)
-def delete_estudiante(*, session: SessionDep, cedula: str):
+async def delete_estudiante(*, session: SessionDep, cedula: str):
     """
     Elimina un estudiante por su cédula.
-    La matrícula asociada también será eliminada (comportamiento en cascada).
+    El estudiante se marca como inactivo y deja de aparecer en las lecturas al responder; sus
+    matrículas y su lista de espera se borran en segundo plano, por lotes (ver limpieza.py), y
+    los cupos que liberan se ofrecen entonces a las listas de espera.
 
     Args:
         session: Dependencia de sesión de la base de datos.
@@ -140,21 +243,26 @@ def delete_estudiante(*, session: SessionDep, cedula: str):
     Raises:
         HTTPException 404: Si el estudiante no es encontrado.
     """
-    estudiante = session.get(Estudiante, cedula)
-    if not estudiante:
+    statement = update(Estudiante).where(Estudiante.cedula == cedula, crud.ESTUDIANTE_ACTIVO).values(activo=False)
+    if not (await session.exec(statement)).rowcount:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado")
 
-    session.delete(estudiante)
-    session.commit()
+    await eventos.estudiante_modificado(session, cedula, eliminado=True)
+    await limpieza.eliminacion_pendiente(session)
+    await session.commit()
     return {"ok": True}
 
 @router.get("/{cedula}/cursos/", response_model=List[CursoRead])
-def get_cursos_de_estudiante(*, session: SessionDep, cedula: str):
+async def get_cursos_de_estudiante(*, session: SessionDep, request: Request, response: Response, cedula: str):
     """
     Obtiene la lista de cursos en los que un estudiante está matriculado.
+    Los cursos se obtienen con un único JOIN sobre la matrícula y el cuerpo ya codificado se guarda en caché.
+    Con `If-None-Match` se responde 304 si la lista no cambió.
 
     Args:
         session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el ETag.
         cedula: Cédula del estudiante.
 
     Raises:
@@ -163,8 +271,135 @@ def get_cursos_de_estudiante(*, session: SessionDep, cedula: str):
     Returns:
         List[CursoRead]: Lista de cursos.
     """
-    estudiante = session.get(Estudiante, cedula)
-    if not estudiante:
+    version, no_modificado = await verificar_version(session, request, response, eventos.recurso_estudiante(cedula), "cursos")
+    if no_modificado:
+        return no_modificado
+
+    async def cargar() -> bytes:
+        if not await crud.existe_estudiante(session, cedula):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado")
+        return codificar(await crud.cursos_de_estudiante(session, cedula))
+
+    return respuesta_json(await cache_estudiantes.obtener_o_cargar(("cursos", cedula), cargar, version), response)
+
+@router.get("/{cedula}/horario/", response_model=HorarioEstudianteRead)
+async def get_horario_de_estudiante(*, session: SessionDep, request: Request, response: Response, cedula: str):
+    """
+    Obtiene el horario semanal de un estudiante: una franja por día y curso matriculado, en
+    orden de la semana, y aparte los cursos cuyo horario no se pudo interpretar.
+    Se arma desde su agenda (ver agendas.py), sin interpretar el horario de cada curso, y el
+    cuerpo ya codificado se guarda en caché. Con `If-None-Match` se responde 304 si el
+    horario no cambió.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        request: Petición HTTP, usada para leer `If-None-Match`.
+        response: Respuesta HTTP, usada para publicar el ETag.
+        cedula: Cédula del estudiante.
+
+    Raises:
+        HTTPException 404: Si el estudiante no es encontrado.
+
+    Returns:
+        HorarioEstudianteRead: Franjas de la semana y cursos sin horario interpretable.
+    """
+    version, no_modificado = await verificar_version(session, request, response, eventos.recurso_estudiante(cedula), "horario")
+    if no_modificado:
+        return no_modificado
+
+    async def cargar() -> bytes:
+        if not await crud.existe_estudiante(session, cedula):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado")
+        ocupado = await crud.horario_ocupado(session, cedula)
+        # Los cursos eliminados dejan de mostrarse aunque ocupen el horario hasta la limpieza.
+        cursos = await crud.cursos_por_codigo(session, ocupado.cursos)
+        bloques = [
+            {"dia": horarios.DIAS[franja.dia], "inicio": horarios.hora(franja.inicio), "fin": horarios.hora(franja.fin),
+             "curso_codigo": codigo, "nombre": cursos[codigo].nombre}
+            for franja, codigo in ocupado.franjas() if codigo in cursos
+        ]
+        sin_interpretar = [
+            cursos[codigo]._asdict() for codigo, horario in sorted(ocupado.cursos.items())
+            if codigo in cursos and horarios.interpretar(horario) is None
+        ]
+        return codificar({"cedula": cedula, "bloques": bloques, "sin_interpretar": sin_interpretar})
+
+    return respuesta_json(await cache_estudiantes.obtener_o_cargar(("horario", cedula), cargar, version), response)
+
+@router.get("/{cedula}/planes/", response_model=PlanesMatriculaReport)
+async def get_planes_de_matricula(
+    *,
+    session: SessionDep,
+    response: Response,
+    cedula: str,
+    codigo: List[str] = Query(..., min_length=1, max_length=MAX_CURSOS_POR_PLAN),
+    limite: int = Query(10, ge=1, le=100)
+):
+    """
+    Propone combinaciones de los cursos pedidos (`?codigo=MAT101&codigo=FIS201`) que el
+    estudiante podría matricular juntas: sin choques de horario entre ellas ni con sus
+    cursos actuales y sin pasar sus créditos máximos. No matricula nada.
+
+    Los cursos y las matrículas del estudiante se cargan de una vez y la búsqueda se hace
+    en memoria (ver planificacion.py). Cada plan es maximal (no admite ningún otro curso
+    pedido); primero van los de más créditos. Los cursos que no pueden entrar en ningún plan
+    se informan en `descartados` con el mismo motivo que daría la matrícula, y en `choques`
+    los pares de cursos pedidos que se cruzan entre sí. Si la búsqueda se corta por tiempo,
+    `completo` es falso y los planes son los mejores encontrados hasta entonces.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        response: Respuesta HTTP.
+        cedula: Cédula del estudiante.
+        codigo: Códigos de los cursos deseados (hasta 50).
+        limite: Cantidad máxima de planes (10 por defecto).
+
+    Raises:
+        HTTPException 404: Si el estudiante no es encontrado.
+
+    Returns:
+        PlanesMatriculaReport: Planes, cursos descartados y choques entre los cursos pedidos.
+    """
+    estudiante = await crud.estudiante(session, cedula)
+    if estudiante is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado")
-        
-    return [m.curso for m in estudiante.matriculas]
\ No newline at end of file
+
+    codigos = list(dict.fromkeys(codigo))
+    cursos = await crud.cursos_por_codigo(session, codigos)
+    matriculados = {fila.codigo: fila for fila in await crud.matriculas_de_estudiantes(session, [cedula])}
+    ocupados = dict((await session.exec(cupos.consulta_ocupados(codigos))).all())
+    # Como en la matrícula directa, los cupos de quienes están en lista de espera no se ofrecen.
+    for curso_codigo, en_espera in (await session.exec(cupos.consulta_en_espera(codigos))).all():
+        ocupados[curso_codigo] = ocupados.get(curso_codigo, 0) + en_espera
+
+    semestre = estudiante["semestre"]
+    creditos_matriculados = sum(fila.creditos for fila in matriculados.values())
+    ocupado = horarios.HorarioOcupado.de_cursos({c: fila.horario for c, fila in matriculados.items()})
+    candidatos: List[planificacion.Candidato] = []
+    descartados = []
+    for c in codigos:
+        curso = cursos.get(c)
+        if curso is None:
+            detalle = "Curso no encontrado."
+        elif c in matriculados:
+            detalle = "El estudiante ya está matriculado en este curso."
+        elif (conflicto := ocupado.choque(curso.horario)) is not None:
+            detalle = cupos.choque_de_horario(matriculados[conflicto])
+        else:
+            detalle = cupos.sin_cupo(curso, ocupados.get(c, 0)) or cupos.excede_creditos(semestre, creditos_matriculados, curso)
+        if detalle:
+            descartados.append({"curso_codigo": c, "detalle": detalle})
+        else:
+            candidatos.append(planificacion.Candidato(c, curso.creditos, curso.horario))
+
+    creditos_maximos = cupos.creditos_maximos(semestre)
+    resultado = await run_in_threadpool(planificacion.buscar, candidatos, creditos_maximos - creditos_matriculados, limite)
+    return respuesta_json({
+        "cedula": cedula,
+        "creditos_matriculados": creditos_matriculados,
+        "creditos_maximos": creditos_maximos,
+        "planes": [{"cursos": cursos_plan, "creditos": creditos} for cursos_plan, creditos in resultado.planes],
+        "descartados": descartados,
+        "choques": [list(par) for par in resultado.choques],
+        "completo": resultado.completo,
+    }, response)
\ No newline at end of file
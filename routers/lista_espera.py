@@ -0,0 +1,137 @@
+from fastapi import APIRouter, HTTPException, status
+from sqlmodel import select, func
+from typing import List
+
+from database import SessionDep, con_reintentos, iniciar_escritura
+import crud
+import cupos
+from models import Curso, Estudiante, ListaEspera, ListaEsperaRead, Matricula, MatriculaBase
+
+router = APIRouter(
+    prefix="/cursos/{codigo}/lista-espera",
+    tags=["Lista de Espera"]
+)
+
+def _posicion(entrada: ListaEspera):
+    return (
+        select(func.count())
+        .select_from(ListaEspera)
+        .join(Estudiante)
+        .where(ListaEspera.curso_codigo == entrada.curso_codigo, ListaEspera.id <= entrada.id, crud.ESTUDIANTE_ACTIVO)
+    )
+
+@router.get("/", response_model=List[ListaEsperaRead])
+async def read_lista_espera(*, session: SessionDep, codigo: str):
+    """
+    Obtiene la lista de espera de un curso, en orden de llegada.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        codigo: Código del curso.
+
+    Raises:
+        HTTPException 404: Si el curso no es encontrado.
+
+    Returns:
+        List[ListaEsperaRead]: Estudiantes en espera con su posición (1 es el siguiente).
+    """
+    if not await crud.existe_curso(session, codigo):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado")
+
+    statement = (
+        select(ListaEspera.estudiante_cedula)
+        .join(Estudiante)
+        .where(ListaEspera.curso_codigo == codigo, crud.ESTUDIANTE_ACTIVO)
+        .order_by(ListaEspera.id)
+    )
+    cedulas = (await session.exec(statement)).all()
+    return [
+        ListaEsperaRead(curso_codigo=codigo, estudiante_cedula=cedula, posicion=posicion)
+        for posicion, cedula in enumerate(cedulas, start=1)
+    ]
+
+@router.post("/", response_model=ListaEsperaRead, status_code=status.HTTP_201_CREATED)
+async def unirse_a_lista_espera(*, session: SessionDep, codigo: str, matricula_data: MatriculaBase):
+    """
+    Agrega un estudiante al final de la lista de espera de un curso lleno. Cuando le llegue
+    un cupo, el estudiante se matricula automáticamente si su horario y sus créditos lo
+    permiten; si no, sale de la lista y el cupo pasa al siguiente.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        codigo: Código del curso (de la URL).
+        matricula_data: Cédula del estudiante y código del curso.
+
+    Raises:
+        HTTPException 400: Si el código de la URL no coincide con el del cuerpo.
+        HTTPException 404: Si el estudiante o el curso no son encontrados.
+        HTTPException 409: Si el estudiante ya está matriculado o en la lista de espera, o si el
+            curso todavía tiene cupos (en ese caso debe matricularse directamente).
+        HTTPException 503: Si la base de datos sigue ocupada con otras escrituras tras varios reintentos.
+
+    Returns:
+        ListaEsperaRead: La entrada creada con su posición.
+    """
+    if codigo != matricula_data.curso_codigo:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="El código de curso en la URL y el cuerpo deben coincidir.")
+    cedula = matricula_data.estudiante_cedula
+
+    async def unirse():
+        # Con el bloqueo de escritura: la comprobación de cupo no puede cruzarse con una
+        # matrícula o una promoción concurrente.
+        await iniciar_escritura(session)
+        estudiante = await session.get(Estudiante, cedula, with_for_update=True)
+        curso = await session.get(Curso, codigo, with_for_update=True)
+        if not estudiante or not estudiante.activo:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Estudiante no encontrado.")
+        if not curso or not curso.activo:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Curso no encontrado.")
+
+        if await session.get(Matricula, (cedula, codigo)):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El estudiante ya está matriculado en este curso.")
+        statement = select(ListaEspera).where(ListaEspera.curso_codigo == codigo, ListaEspera.estudiante_cedula == cedula)
+        if (await session.exec(statement)).first():
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El estudiante ya está en la lista de espera de este curso.")
+        ocupados = (await session.exec(cupos.consulta_ocupados([codigo]))).first()
+        en_espera = (await session.exec(cupos.consulta_en_espera([codigo]))).first()
+        if cupos.sin_cupo(curso, (ocupados[1] if ocupados else 0) + (en_espera[1] if en_espera else 0)) is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="El curso tiene cupos disponibles: matricúlese directamente.")
+
+        entrada = ListaEspera(curso_codigo=codigo, estudiante_cedula=cedula)
+        session.add(entrada)
+        await session.flush()
+        posicion = (await session.exec(_posicion(entrada))).one()
+        await session.commit()
+        return posicion
+
+    posicion = await con_reintentos(session, unirse)
+    return ListaEsperaRead(curso_codigo=codigo, estudiante_cedula=cedula, posicion=posicion)
+
+@router.delete("/{cedula}", status_code=status.HTTP_204_NO_CONTENT)
+async def salir_de_lista_espera(*, session: SessionDep, codigo: str, cedula: str):
+    """
+    Retira a un estudiante de la lista de espera de un curso.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        codigo: Código del curso.
+        cedula: Cédula del estudiante.
+
+    Raises:
+        HTTPException 404: Si el estudiante no está en la lista de espera del curso.
+        HTTPException 503: Si la base de datos sigue ocupada con otras escrituras tras varios reintentos.
+    """
+    async def salir():
+        # Como las demás escrituras: con el bloqueo tomado desde el inicio y reintentos si
+        # la base sigue ocupada.
+        await iniciar_escritura(session)
+        statement = select(ListaEspera).where(ListaEspera.curso_codigo == codigo, ListaEspera.estudiante_cedula == cedula)
+        entrada = (await session.exec(statement)).first()
+        if not entrada:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="El estudiante no está en la lista de espera de este curso.")
+
+        await session.delete(entrada)
+        await session.commit()
+
+    await con_reintentos(session, salir)
+    return {"ok": True}
@@ -1,22 +1,31 @@
-from fastapi import APIRouter, HTTPException, status
-from sqlmodel import Session
+from fastapi import APIRouter, HTTPException, status, Body
+from sqlmodel import insert
+from typing import Dict, List
 
-from database import SessionDep
-from models import Matricula, MatriculaBase
+from database import SessionDep, con_reintentos, iniciar_escritura
+import crud
+import cupos
+import eventos
+import lista_espera
+from horarios import Agenda
+from models import Matricula, MatriculaBase, MatriculaBulkResult, MatriculaBulkReport
 
 router = APIRouter(
     prefix="/matriculas",
     tags=["Matrículas"]
 )
 
+MAX_MATRICULAS_POR_LOTE = 10000
+
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
-def desmatricular_estudiante(
+async def desmatricular_estudiante(
     *, 
     session: SessionDep, 
     matricula_in: MatriculaBase
 ):
     """
     Elimina una matrícula específica (desmatricula un estudiante de un curso).
+    El cupo liberado se ofrece, en segundo plano, a la lista de espera del curso.
 
     Args:
         session: Dependencia de sesión de la base de datos.
@@ -24,12 +33,114 @@ def desmatricular_estudiante(
 
     Raises:
         HTTPException 404: Si la matrícula no es encontrada.
+        HTTPException 503: Si la base de datos sigue ocupada con otras escrituras tras varios reintentos.
+    """
+    async def desmatricular():
+        # En la misma fila de escritura que la matrícula y la promoción de la lista de espera.
+        await iniciar_escritura(session)
+        matricula = await session.get(Matricula, (matricula_in.estudiante_cedula, matricula_in.curso_codigo))
+
+        if not matricula:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Matrícula no encontrada.")
+
+        await session.delete(matricula)
+        await eventos.matriculas_cambiadas(session, [(matricula_in.estudiante_cedula, matricula_in.curso_codigo)], eliminadas=True)
+        await lista_espera.cupos_liberados(session, [matricula_in.estudiante_cedula], [matricula_in.curso_codigo])
+        await session.commit()
+
+    await con_reintentos(session, desmatricular)
+    return {"ok": True}
+
+@router.post("/bulk", response_model=MatriculaBulkReport)
+async def matricular_en_lote(
+    *,
+    session: SessionDep,
+    matriculas_in: List[MatriculaBase] = Body(..., min_length=1, max_length=MAX_MATRICULAS_POR_LOTE)
+):
     """
-    matricula = session.get(Matricula, (matricula_in.estudiante_cedula, matricula_in.curso_codigo))
-    
-    if not matricula:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Matrícula no encontrada.")
-        
-    session.delete(matricula)
-    session.commit()
-    return {"ok": True}
\ No newline at end of file
+    Matricula en una sola transacción un lote de pares (cédula, código).
+
+    Las validaciones de la matrícula individual (existencia del estudiante y del curso,
+    matrícula duplicada, conflicto de horario, cupo del curso y créditos máximos) se resuelven para todo el lote con unas
+    pocas consultas por conjuntos (IN), y las matrículas válidas se insertan con un único
+    INSERT de múltiples filas. Los pares del mismo lote se validan en orden, por lo que
+    también se detectan duplicados, choques de horario (incluidos los parciales) y cupos o
+    créditos agotados dentro del propio lote.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        matriculas_in: Lista de matrículas (cédula del estudiante y código del curso).
+
+    Raises:
+        HTTPException 503: Si la base de datos sigue ocupada con otras escrituras tras varios reintentos.
+
+    Returns:
+        MatriculaBulkReport: Totales y el resultado de cada par, en el orden recibido.
+    """
+    cedulas = sorted({m.estudiante_cedula for m in matriculas_in})
+    codigos = sorted({m.curso_codigo for m in matriculas_in})
+
+    async def matricular():
+        # Como en la matrícula individual, todo el lote se valida e inserta con el bloqueo de
+        # escritura tomado desde el inicio (y, fuera de SQLite, con las filas bloqueadas).
+        await iniciar_escritura(session)
+        semestres = {cedula: fila.semestre for cedula, fila in (await crud.estudiantes_por_cedula(session, cedulas, bloquear=True)).items()}
+        cursos = await crud.cursos_por_codigo(session, codigos, bloquear=True)
+
+        ocupados: Dict[str, int] = {}
+        for lote in crud.en_lotes(codigos):
+            ocupados.update((await session.exec(cupos.consulta_ocupados(lote))).all())
+            # Los cupos de quienes están en lista de espera tampoco se ofrecen al lote.
+            for codigo, en_espera in (await session.exec(cupos.consulta_en_espera(lote))).all():
+                ocupados[codigo] = ocupados.get(codigo, 0) + en_espera
+
+        # Estado por estudiante: cursos ya matriculados, horario ocupado y créditos.
+        cursos_por_estudiante: Dict[str, set] = {cedula: set() for cedula in semestres}
+        agendas: Dict[str, Agenda] = {cedula: Agenda() for cedula in semestres}
+        creditos: Dict[str, int] = {cedula: 0 for cedula in semestres}
+        for fila in await crud.matriculas_de_estudiantes(session, semestres):
+            cedula = fila.estudiante_cedula
+            cursos_por_estudiante[cedula].add(fila.codigo)
+            agendas[cedula].agregar(fila)
+            creditos[cedula] += fila.creditos
+
+        resultados: List[MatriculaBulkResult] = []
+        nuevas: List[dict] = []
+        for matricula_in in matriculas_in:
+            cedula, codigo = matricula_in.estudiante_cedula, matricula_in.curso_codigo
+            curso = cursos.get(codigo)
+            detalle = None
+            if cedula not in semestres:
+                detalle = "Estudiante no encontrado."
+            elif curso is None:
+                detalle = "Curso no encontrado."
+            elif codigo in cursos_por_estudiante[cedula]:
+                detalle = "El estudiante ya está matriculado en este curso."
+            elif (conflicto := agendas[cedula].choque(curso.horario)) is not None:
+                detalle = cupos.choque_de_horario(conflicto)
+            else:
+                detalle = cupos.sin_cupo(curso, ocupados.get(codigo, 0)) or cupos.excede_creditos(semestres[cedula], creditos[cedula], curso)
+
+            if detalle:
+                resultados.append(MatriculaBulkResult(estudiante_cedula=cedula, curso_codigo=codigo, estado="rechazada", detalle=detalle))
+                continue
+
+            cursos_por_estudiante[cedula].add(codigo)
+            agendas[cedula].agregar(curso)
+            creditos[cedula] += curso.creditos
+            ocupados[codigo] = ocupados.get(codigo, 0) + 1
+            nuevas.append({"estudiante_cedula": cedula, "curso_codigo": codigo})
+            resultados.append(MatriculaBulkResult(estudiante_cedula=cedula, curso_codigo=codigo, estado="matriculada"))
+
+        if nuevas:
+            await session.exec(insert(Matricula), params=nuevas)
+            await eventos.matriculas_cambiadas(session, [(fila["estudiante_cedula"], fila["curso_codigo"]) for fila in nuevas])
+        await session.commit()
+        return resultados, nuevas
+
+    resultados, nuevas = await con_reintentos(session, matricular)
+    return MatriculaBulkReport(
+        matriculados=len(nuevas),
+        rechazados=len(resultados) - len(nuevas),
+        resultados=resultados
+    )
@@ -0,0 +1,171 @@
+from fastapi import APIRouter, Query, Response
+from sqlmodel import select, func, true
+from typing import List, Optional
+
+from config import settings
+from database import SessionDep
+from paginacion import LIMITE_POR_DEFECTO, LIMITE_MAXIMO, paginar, recortar_pagina
+from models import (
+    Curso, Estudiante, Matricula, ResumenCurso, ResumenEstudiante,
+    ReporteCreditosEstudiante, ReporteMatriculadosCurso, ReporteCargaSemestre, RangoOcupacion
+)
+
+router = APIRouter(
+    prefix="/reportes",
+    tags=["Reportes"]
+)
+
+# Cada reporte es una única consulta agregada. Con REPORTES_MATERIALIZADOS=true los totales
+# se leen de las tablas de resumen (ver resumenes.py) en lugar de agrupar las matrículas.
+
+def _totales_por_estudiante():
+    """
+    Consulta de cursos y créditos por estudiante, junto con la expresión de créditos
+    (para filtrar por ella).
+    """
+    if settings.reportes_materializados:
+        cursos = func.coalesce(ResumenEstudiante.cursos, 0)
+        creditos = func.coalesce(ResumenEstudiante.creditos, 0)
+        statement = select(Estudiante.cedula, Estudiante.nombre, Estudiante.semestre, cursos.label("cursos"), creditos.label("creditos"))
+        return statement.outerjoin(ResumenEstudiante, ResumenEstudiante.cedula == Estudiante.cedula).where(Estudiante.activo == true()), creditos
+
+    cursos = func.count(Curso.codigo)
+    creditos = func.coalesce(func.sum(Curso.creditos), 0)
+    statement = (
+        select(Estudiante.cedula, Estudiante.nombre, Estudiante.semestre, cursos.label("cursos"), creditos.label("creditos"))
+        .outerjoin(Matricula, Matricula.estudiante_cedula == Estudiante.cedula)
+        .outerjoin(Curso, Curso.codigo == Matricula.curso_codigo)
+        .where(Estudiante.activo == true())
+        .group_by(Estudiante.cedula)
+    )
+    return statement, creditos
+
+def _matriculados_por_curso():
+    if settings.reportes_materializados:
+        matriculados = func.coalesce(ResumenCurso.matriculados, 0)
+        statement = select(Curso.codigo, Curso.nombre, Curso.creditos, matriculados.label("matriculados"))
+        return statement.outerjoin(ResumenCurso, ResumenCurso.codigo == Curso.codigo).where(Curso.activo == true())
+
+    matriculados = func.count(Matricula.estudiante_cedula)
+    statement = (
+        select(Curso.codigo, Curso.nombre, Curso.creditos, matriculados.label("matriculados"))
+        .outerjoin(Matricula, Matricula.curso_codigo == Curso.codigo)
+        .where(Curso.activo == true())
+        .group_by(Curso.codigo)
+    )
+    return statement
+
+@router.get("/creditos-por-estudiante", response_model=List[ReporteCreditosEstudiante])
+async def reporte_creditos_por_estudiante(
+    *,
+    session: SessionDep,
+    response: Response,
+    semestre: Optional[int] = Query(None),
+    min_creditos: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO)
+):
+    """
+    Cursos y créditos matriculados por cada estudiante, ordenados por cédula.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        response: Respuesta HTTP, usada para publicar el cursor siguiente.
+        semestre: Parámetro opcional para filtrar estudiantes por semestre.
+        min_creditos: Parámetro opcional para incluir solo a quienes tienen al menos esos créditos.
+        cursor: Token de continuación devuelto por la página anterior (cabecera `X-Cursor-Siguiente`).
+        limit: Cantidad máxima de estudiantes por página (100 por defecto).
+
+    Raises:
+        HTTPException 400: Si el cursor no es válido.
+
+    Returns:
+        List[ReporteCreditosEstudiante]: Totales por estudiante.
+    """
+    statement, creditos = _totales_por_estudiante()
+    if semestre is not None:
+        statement = statement.where(Estudiante.semestre == semestre)
+    if min_creditos is not None:
+        statement = statement.where(creditos >= min_creditos) if settings.reportes_materializados else statement.having(creditos >= min_creditos)
+
+    limite = limit or LIMITE_POR_DEFECTO
+    filas = (await session.exec(paginar(statement, Estudiante.cedula, cursor, limite))).all()
+    return [ReporteCreditosEstudiante.model_validate(fila) for fila in recortar_pagina(filas, limite, "cedula", response)]
+
+@router.get("/matriculados-por-curso", response_model=List[ReporteMatriculadosCurso])
+async def reporte_matriculados_por_curso(
+    *,
+    session: SessionDep,
+    response: Response,
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MAXIMO)
+):
+    """
+    Cantidad de estudiantes matriculados en cada curso, ordenados por código.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        response: Respuesta HTTP, usada para publicar el cursor siguiente.
+        cursor: Token de continuación devuelto por la página anterior (cabecera `X-Cursor-Siguiente`).
+        limit: Cantidad máxima de cursos por página (100 por defecto).
+
+    Raises:
+        HTTPException 400: Si el cursor no es válido.
+
+    Returns:
+        List[ReporteMatriculadosCurso]: Matriculados por curso.
+    """
+    statement = _matriculados_por_curso()
+    limite = limit or LIMITE_POR_DEFECTO
+    filas = (await session.exec(paginar(statement, Curso.codigo, cursor, limite))).all()
+    return [ReporteMatriculadosCurso.model_validate(fila) for fila in recortar_pagina(filas, limite, "codigo", response)]
+
+@router.get("/carga-por-semestre", response_model=List[ReporteCargaSemestre])
+async def reporte_carga_por_semestre(*, session: SessionDep):
+    """
+    Estudiantes, matrículas y créditos totales y promedio de cada semestre.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+
+    Returns:
+        List[ReporteCargaSemestre]: Un elemento por semestre con estudiantes, ordenados por semestre.
+    """
+    por_estudiante, _ = _totales_por_estudiante()
+    totales = por_estudiante.subquery()
+    statement = (
+        select(totales.c.semestre, func.count(), func.sum(totales.c.cursos), func.sum(totales.c.creditos))
+        .group_by(totales.c.semestre)
+        .order_by(totales.c.semestre)
+    )
+    return [
+        ReporteCargaSemestre(
+            semestre=semestre,
+            estudiantes=estudiantes,
+            matriculas=matriculas,
+            creditos=creditos,
+            creditos_promedio=round(creditos / estudiantes, 2)
+        )
+        for semestre, estudiantes, matriculas, creditos in (await session.exec(statement)).all()
+    ]
+
+@router.get("/ocupacion-cursos", response_model=List[RangoOcupacion])
+async def reporte_ocupacion_cursos(*, session: SessionDep, ancho: int = Query(10, ge=1, le=10000)):
+    """
+    Histograma de ocupación: cuántos cursos tienen entre `desde` y `hasta` matriculados.
+
+    Args:
+        session: Dependencia de sesión de la base de datos.
+        ancho: Cantidad de matriculados que abarca cada rango (10 por defecto).
+
+    Returns:
+        List[RangoOcupacion]: Rangos con al menos un curso, ordenados de menor a mayor ocupación.
+    """
+    por_curso = _matriculados_por_curso()
+    totales = por_curso.subquery()
+    rango = (totales.c.matriculados // ancho).label("rango")
+    statement = select(rango, func.count()).group_by(rango).order_by(rango)
+    return [
+        RangoOcupacion(desde=indice * ancho, hasta=indice * ancho + ancho - 1, cursos=cursos)
+        for indice, cursos in (await session.exec(statement)).all()
+    ]
@@ -0,0 +1,60 @@
+"""
+Serialización rápida de las respuestas de lectura.
+
+Las rutas de lectura declaran su `response_model` (el esquema OpenAPI no cambia), pero en
+lugar de devolver objetos del ORM para que FastAPI los valide contra el modelo y los vuelva
+a convertir a JSON, consultan solo las columnas del modelo de lectura (`columnas`), arman
+diccionarios directamente con las tuplas del resultado (`como_dicts`) y devuelven el
+cuerpo ya codificado con orjson (`respuesta_json`). FastAPI no revalida una respuesta que
+el endpoint devuelve directamente.
+
+El contenido es el mismo que produciría el modelo: las mismas claves, en el mismo orden.
+Las cachés guardan el cuerpo ya codificado, así que un acierto no vuelve a serializar.
+"""
+from typing import Any, Iterable, List, Type
+
+import orjson
+from fastapi import Response
+from sqlmodel import SQLModel
+
+
+def columnas(lectura: Type[SQLModel], tabla: Type[SQLModel]) -> list:
+    """
+    Columnas de `tabla` que corresponden a los campos de `lectura`, en el orden de sus campos.
+    Los campos que no son columnas (las listas anidadas) se omiten.
+    """
+    return [getattr(tabla, campo) for campo in lectura.model_fields if campo in tabla.__table__.c]
+
+
+def como_dicts(filas: Iterable[Any]) -> List[dict]:
+    """
+    Convierte las filas de una consulta por columnas en diccionarios columna -> valor.
+    """
+    return [fila._asdict() for fila in filas]
+
+
+def codificar(contenido: Any) -> bytes:
+    return orjson.dumps(contenido)
+
+
+class RespuestaJSON(Response):
+    """
+    Respuesta JSON codificada con orjson. Acepta también un cuerpo ya codificado (bytes).
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else codificar(content)
+
+
+def respuesta_json(contenido: Any, response: Response) -> RespuestaJSON:
+    """
+    Devuelve el contenido (o el cuerpo ya codificado) con las cabeceras que el endpoint
+    agregó a `response` (ETag, cursor de la página siguiente), que FastAPI no traslada a
+    una respuesta devuelta directamente.
+    """
+    respuesta = RespuestaJSON(contenido)
+    respuesta.raw_headers.extend(
+        (nombre, valor) for nombre, valor in response.raw_headers if nombre not in (b"content-length", b"content-type")
+    )
+    return respuesta
@@ -0,0 +1,104 @@
+"""
+Punto de entrada de producción: levanta varios workers de uvicorn sobre un mismo socket.
+
+    python -m servidor                             # un worker por núcleo, 127.0.0.1:8000
+    python -m servidor --host 0.0.0.0 --port 8080 --workers 4
+
+`uvicorn main:app --reload` sigue siendo el modo de desarrollo. Este lanzador:
+
+- Hace una sola vez, en el proceso padre y antes de crear los workers, las tareas de inicio
+  que de otro modo repetiría cada worker: migraciones (según MIGRAR_AL_INICIAR, ver
+  migraciones.al_iniciar), la reconstrucción de los resúmenes (REPORTES_MATERIALIZADOS) y la
+  purga del registro de cambios. Los workers arrancan con INICIO_PREPARADO=true y solo
+  comprueban que no falten migraciones.
+- Cada worker abre su pool de conexiones y carga el catálogo de cursos en su caché antes de
+  aceptar conexiones (ver `calentar` en main.py); mientras tanto las conexiones esperan en
+  la cola del socket, que abre el padre.
+
+Señales al proceso padre:
+
+- SIGHUP: reinicio escalonado. Cada worker nuevo (con el código y la configuración del
+  momento) reemplaza a uno viejo solo cuando ya terminó de iniciar y calentarse; si no lo
+  logra en SERVIDOR_ARRANQUE_SEGUNDOS, por ejemplo porque faltan migraciones, se conservan
+  los workers viejos. Para actualizar: `python -m migraciones` y después `kill -HUP`.
+- SIGTERM o SIGINT: cada worker deja de aceptar conexiones y espera hasta
+  SERVIDOR_DRENAJE_SEGUNDOS a que terminen las peticiones en curso. Las suscripciones a
+  /cambios/eventos no terminan solas: se cortan al vencer el plazo y los clientes se
+  reconectan con Last-Event-ID.
+- SIGTTIN / SIGTTOU: agrega o quita un worker.
+
+Con SQLite todos los workers comparten el archivo en modo WAL: las lecturas escalan con los
+núcleos, pero las escrituras se hacen de a una en toda la máquina (ver
+benchmarks/escalado_workers.py). La caché y las suscripciones son de cada worker (ver
+cache.py y cambios.py).
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from config import settings
+
+logger = logging.getLogger("universidad.servidor")
+
+
+def cantidad_workers(pedidos: Optional[int] = None) -> int:
+    """
+    Workers a levantar: los pedidos, SERVIDOR_WORKERS o, si no se indicó ninguno, uno por núcleo.
+    """
+    return max(1, pedidos or settings.servidor_workers or os.cpu_count() or 1)
+
+
+def preparar():
+    """
+    Ejecuta una vez las tareas de inicio que los workers omiten con INICIO_PREPARADO.
+    """
+    import cambios
+    import migraciones
+    import resumenes
+    from database import engine
+
+    migraciones.al_iniciar()
+    if settings.reportes_materializados:
+        resumenes.reconstruir()
+    cambios.purgar()
+    # Los workers abren sus propias conexiones; el padre no vuelve a usar las suyas.
+    engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="Por defecto SERVIDOR_WORKERS o un worker por núcleo.")
+    parser.add_argument("--sin-registro-accesos", action="store_true", help="No registrar cada petición en el log.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.log_level, format="%(levelname)s:     %(name)s - %(message)s")
+    workers = cantidad_workers(args.workers)
+    preparar()
+    # Los workers se crean con spawn y leen la configuración del entorno al importar config.
+    os.environ["INICIO_PREPARADO"] = "true"
+
+    config = uvicorn.Config(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        log_level=settings.log_level.lower(),
+        access_log=not args.sin_registro_accesos,
+        timeout_graceful_shutdown=settings.servidor_drenaje_segundos,
+        timeout_worker_healthcheck=settings.servidor_arranque_segundos,
+    )
+    logger.info("Iniciando %d workers en %s:%d.", workers, args.host, args.port)
+    # Siempre bajo el supervisor, también con un solo worker, para que SIGHUP reinicie sin cortar.
+    Multiprocess(config, sockets=[config.bind_socket()]).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
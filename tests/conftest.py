@@ -0,0 +1,116 @@
+"""
+Configuración común de las pruebas: una base SQLite temporal en un archivo, sembrada con
+los datos sintéticos de benchmarks/datos.py, y un cliente de la aplicación que anota las
+sentencias SQL que ejecuta cada petición.
+
+La configuración se lee al importar la aplicación (ver config.py), así que se fija aquí,
+antes de que se importe. DB_MODO se respeta si viene del entorno:
+
+    python -m pytest
+    DB_MODO=async python -m pytest
+"""
+import contextvars
+import os
+import shutil
+import tempfile
+from typing import List, Optional, Tuple
+
+import pytest
+
+_DIRECTORIO = tempfile.mkdtemp(prefix="universidad-pruebas-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_DIRECTORIO, 'universidad.db')}",
+    "DATABASE_URL_ASYNC": "",
+    "DATABASE_URLS_LECTURA": "",
+    "MIGRAR_AL_INICIAR": "true",
+    "LOG_LEVEL": "WARNING",
+    "METRICAS_UMBRAL_LENTO_MS": str(10**9),
+})
+os.environ.setdefault("DB_MODO", "sync")
+
+ESTUDIANTES = 2000
+CURSOS = 100
+MATRICULAS_POR_ESTUDIANTE = 4
+
+# Sentencias de la petición en curso (los hilos del threadpool copian el contexto, así que
+# las ven; las tareas en segundo plano de la aplicación no).
+_peticion_actual: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("peticion_actual", default=None)
+
+
+def _anotar(conn, cursor, statement, parameters, context, executemany):
+    sentencias = _peticion_actual.get()
+    if sentencias is not None:
+        sentencias.append((statement, parameters))
+
+
+def _capturar(aplicacion, capturas: List[list]):
+    """
+    Envuelve la aplicación ASGI: cada petición HTTP agrega a `capturas` la lista de las
+    sentencias que ejecuta.
+    """
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return await aplicacion(scope, receive, send)
+        capturas.append([])
+        token = _peticion_actual.set(capturas[-1])
+        try:
+            await aplicacion(scope, receive, send)
+        finally:
+            _peticion_actual.reset(token)
+    return app
+
+
+@pytest.fixture(scope="session")
+def base():
+    """
+    Siembra la base temporal antes de iniciar la aplicación y la borra al terminar.
+    """
+    from benchmarks import datos
+
+    datos.sembrar(os.environ["DATABASE_URL"], ESTUDIANTES, CURSOS, MATRICULAS_POR_ESTUDIANTE)
+    yield os.environ["DATABASE_URL"]
+    shutil.rmtree(_DIRECTORIO, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def cliente(base):
+    """
+    Cliente de la aplicación (con su inicio y su cierre) que anota las sentencias SQL de cada
+    petición; ver `con_sentencias`.
+    """
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    import database
+    import main
+
+    engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _anotar)
+    capturas: List[list] = []
+
+    class Cliente(TestClient):
+        def con_sentencias(self, metodo: str, url: str, **kwargs) -> Tuple[object, List[tuple]]:
+            """
+            Hace la petición y devuelve la respuesta con las sentencias (sql, parámetros) que ejecutó.
+            """
+            respuesta = self.request(metodo, url, **kwargs)
+            return respuesta, capturas[-1]
+
+    try:
+        with Cliente(_capturar(main.app, capturas)) as cliente:
+            yield cliente
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", _anotar)
+
+
+@pytest.fixture
+def sin_cache():
+    """
+    Vacía las cachés de lecturas para que las peticiones de la prueba consulten la base.
+    """
+    import cache
+
+    cache.cache_cursos.limpiar()
+    cache.cache_estudiantes.limpiar()
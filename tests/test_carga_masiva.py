@@ -0,0 +1,77 @@
+"""
+Lo que se exporta se puede volver a importar tal cual, también los cursos sin cupo (que en
+CSV quedan con la celda vacía). Los lotes que no se pueden escribir porque la base sigue
+ocupada se informan fila a fila, sin deshacer los demás.
+"""
+import dataclasses
+import io
+import sqlite3
+
+import pytest
+from sqlmodel import Session
+
+import carga_masiva
+import database
+from config import settings
+
+CURSOS = [
+    {"nombre": "Curso con cupo", "creditos": 3, "horario": "Vie 6-8", "cupo": 25},
+    {"nombre": "Curso sin cupo", "creditos": 2, "horario": "Vie 8-10", "cupo": None},
+]
+
+
+def _exportados(cliente, formato: str, prefijo: str) -> list:
+    respuesta = cliente.get("/cursos/exportar", params={"formato": formato})
+    assert respuesta.status_code == 200
+    lineas = respuesta.text.splitlines(keepends=True)
+    encabezado = lineas[:1] if formato == "csv" else []
+    return encabezado + [linea for linea in lineas if prefijo in linea]
+
+
+@pytest.mark.parametrize("formato", ["csv", "ndjson"])
+def test_exportar_e_importar_cursos_con_y_sin_cupo(cliente, formato):
+    origen, destino = f"EX{formato[0].upper()}", f"IM{formato[0].upper()}"
+    for n, curso in enumerate(CURSOS):
+        assert cliente.post("/cursos/", json={"codigo": f"{origen}{n}", **curso}).status_code == 201
+
+    exportado = "".join(_exportados(cliente, formato, origen))
+    reporte = cliente.post(f"/cursos/importar?formato={formato}", content=exportado.replace(origen, destino).encode())
+
+    assert reporte.status_code == 200
+    assert reporte.json() == {"insertados": len(CURSOS), "rechazados": 0, "errores": []}
+    for n, curso in enumerate(CURSOS):
+        assert cliente.get(f"/cursos/{destino}{n}/").json()["cupo"] == curso["cupo"]
+    assert "".join(_exportados(cliente, formato, destino)) == exportado.replace(origen, destino)
+
+
+def test_lotes_bloqueados_se_reintentan_y_se_informan(cliente, monkeypatch):
+    engine = database.crear_engine(dataclasses.replace(settings, sqlite_busy_timeout_ms=0))
+    monkeypatch.setattr(database, "ESPERA_BASE_REINTENTO", 0.001)
+    otra_escritura = sqlite3.connect(engine.url.database, isolation_level=None, check_same_thread=False)
+    intentos = {}
+    escribir = carga_masiva._escribir
+
+    def escribir_con_otra_escritura(session, nombre_entidad, entidad, lote):
+        # Filas 2-3: bloqueadas solo en el primer intento. Filas 4-5: bloqueadas siempre.
+        primera = lote[0][0]
+        intentos[primera] = intentos.get(primera, 0) + 1
+        if primera in (2, 4) and intentos[primera] == 1:
+            otra_escritura.execute("BEGIN IMMEDIATE")
+        elif primera != 4 and otra_escritura.in_transaction:
+            otra_escritura.execute("COMMIT")
+        return escribir(session, nombre_entidad, entidad, lote)
+
+    monkeypatch.setattr(carga_masiva, "_escribir", escribir_con_otra_escritura)
+    archivo = io.StringIO("codigo,nombre,creditos,horario,cupo\n" + "".join(f"LOT{n},Curso en lote {n},3,Vie {n + 10}-{n + 11},\n" for n in range(6)))
+    with Session(engine) as session:
+        reporte = carga_masiva.importar(session, "cursos", archivo, "csv", tamano_lote=2)
+    if otra_escritura.in_transaction:
+        otra_escritura.execute("COMMIT")
+    otra_escritura.close()
+    engine.dispose()
+
+    assert intentos == {2: 2, 4: database.MAX_REINTENTOS_BLOQUEO, 6: 1}
+    assert reporte.insertados == 4
+    assert [(rechazo.fila, rechazo.error) for rechazo in reporte.errores] == [(4, carga_masiva.ERROR_BASE_OCUPADA), (5, carga_masiva.ERROR_BASE_OCUPADA)]
+    existentes = [n for n in range(6) if cliente.get(f"/cursos/LOT{n}/").status_code == 200]
+    assert existentes == [0, 1, 4, 5]
@@ -0,0 +1,30 @@
+"""
+El choque de horario se informa igual en la matrícula individual, en la matrícula en lote y
+en los planes de matrícula: con el nombre y el horario del curso ya matriculado.
+"""
+from types import SimpleNamespace
+
+import cupos
+
+
+def test_mismo_mensaje_de_choque_en_todas_las_rutas(cliente):
+    matriculado = {"codigo": "CHQ01", "nombre": "Curso matriculado", "creditos": 3, "horario": "Jue 8-10"}
+    pedido = {"codigo": "CHQ02", "nombre": "Curso pedido", "creditos": 3, "horario": "Jue 9-11"}
+    for curso in (matriculado, pedido):
+        assert cliente.post("/cursos/", json=curso).status_code == 201
+    estudiante = {"cedula": "CHQ0001", "nombre": "Estudiante con choque", "email": "chq@pruebas.co", "semestre": 5}
+    assert cliente.post("/estudiantes/", json=estudiante).status_code == 201
+    par = {"estudiante_cedula": "CHQ0001", "curso_codigo": "CHQ01"}
+    assert cliente.post("/cursos/CHQ01/estudiantes/", json=par).status_code == 201
+
+    par["curso_codigo"] = "CHQ02"
+    individual = cliente.post("/cursos/CHQ02/estudiantes/", json=par)
+    lote = cliente.post("/matriculas/bulk", json=[par])
+    planes = cliente.get("/estudiantes/CHQ0001/planes/", params={"codigo": "CHQ02"})
+
+    esperado = cupos.choque_de_horario(SimpleNamespace(**matriculado))
+    assert "Jue 8-10" in esperado
+    assert individual.status_code == 409
+    assert individual.json()["detail"] == esperado
+    assert lote.json()["resultados"][0]["detalle"] == esperado
+    assert planes.json()["descartados"] == [{"curso_codigo": "CHQ02", "detalle": esperado}]
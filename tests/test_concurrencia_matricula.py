@@ -0,0 +1,132 @@
+"""
+Matrículas concurrentes desde varios procesos sobre la misma base SQLite en archivo, como
+varios workers de uvicorn: ni el cupo de un curso ni los créditos máximos de un estudiante
+se superan cuando cientos de peticiones compiten a la vez (ver
+benchmarks/concurrencia_matricula.py para la versión de estrés).
+
+Dentro de un proceso las escrituras ya hacen fila (ver database._turno_de_escritura); entre
+procesos solo las protegen BEGIN IMMEDIATE y los reintentos de con_reintentos. Para que esos
+choques se vean, los procesos hijos abren la base con busy_timeout=0: cada bloqueo se
+reintenta (y se registra) o termina en 503, y la prueba comprueba que los hubo.
+"""
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from sqlmodel import Session, func, insert, select
+
+import cupos
+from database import engine
+from models import Estudiante, Matricula
+
+PROCESOS = 4
+HILOS_POR_PROCESO = 8
+CUPO = 5
+ESTUDIANTES = 300
+CREDITOS_POR_CURSO = 4
+CURSOS_ESCENARIO_CREDITOS = 12
+BLOQUEO = "Escritura bloqueada"
+
+
+class _ContadorDeBloqueos(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.bloqueos = 0
+
+    def emit(self, record: logging.LogRecord):
+        if record.getMessage().startswith(BLOQUEO):
+            self.bloqueos += 1
+
+
+def _proceso(pares: List[Tuple[str, str]], barrera, resultados):
+    """
+    Cuerpo de cada proceso hijo: su propia aplicación (y su propio engine) envía las
+    matrículas desde varios hilos cuando todos los procesos están listos.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+
+    contador = _ContadorDeBloqueos()
+    logging.getLogger("universidad.database").addHandler(contador)
+
+    # Con `with`, todas las peticiones del proceso corren en un mismo bucle de eventos, como en un worker.
+    with TestClient(main.app) as cliente:
+        def matricular(par: Tuple[str, str]) -> int:
+            cedula, codigo = par
+            return cliente.post(f"/cursos/{codigo}/estudiantes/", json={"estudiante_cedula": cedula, "curso_codigo": codigo}).status_code
+
+        barrera.wait()
+        with ThreadPoolExecutor(max_workers=HILOS_POR_PROCESO) as hilos:
+            estados = Counter(hilos.map(matricular, pares))
+    resultados.put((estados, contador.bloqueos))
+
+
+def _desde_varios_procesos(monkeypatch, pares: List[Tuple[str, str]]) -> Tuple[Counter, int]:
+    """
+    Reparte las matrículas entre PROCESOS procesos nuevos y suma sus estados y los bloqueos
+    que tuvieron que reintentar.
+    """
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "0")
+    monkeypatch.setenv("MIGRAR_AL_INICIAR", "false")
+    contexto = multiprocessing.get_context("spawn")
+    barrera, resultados = contexto.Barrier(PROCESOS), contexto.Queue()
+    procesos = [contexto.Process(target=_proceso, args=(pares[n::PROCESOS], barrera, resultados)) for n in range(PROCESOS)]
+    for proceso in procesos:
+        proceso.start()
+    estados, bloqueos = Counter(), 0
+    for _ in procesos:
+        estados_proceso, bloqueos_proceso = resultados.get(timeout=300)
+        estados += estados_proceso
+        bloqueos += bloqueos_proceso
+    for proceso in procesos:
+        proceso.join(timeout=60)
+        assert proceso.exitcode == 0
+    return estados, bloqueos
+
+
+def _matriculados(codigos: List[str]) -> int:
+    with Session(engine) as session:
+        return session.exec(select(func.count()).select_from(Matricula).where(Matricula.curso_codigo.in_(codigos))).one()
+
+
+def _crear(cliente, cursos: List[dict], cedulas: List[str], semestre: int):
+    for curso in cursos:
+        assert cliente.post("/cursos/", json=curso).status_code == 201
+    with Session(engine) as session:
+        session.exec(insert(Estudiante), params=[
+            {"cedula": cedula, "nombre": f"Estudiante {cedula}", "email": f"{cedula.lower()}@pruebas.co", "semestre": semestre}
+            for cedula in cedulas
+        ])
+        session.commit()
+
+
+def test_no_sobrevende_el_cupo(cliente, monkeypatch):
+    codigo = "CCUPO1"
+    cedulas = [f"CU{n:05d}" for n in range(ESTUDIANTES)]
+    _crear(cliente, [{"codigo": codigo, "nombre": "Curso con cupo", "creditos": 3, "horario": "Sab 8-10", "cupo": CUPO}], cedulas, semestre=12)
+
+    estados, bloqueos = _desde_varios_procesos(monkeypatch, [(cedula, codigo) for cedula in cedulas])
+
+    assert sum(estados.values()) == ESTUDIANTES
+    assert set(estados) <= {201, 409, 503}
+    assert estados[201] == _matriculados([codigo]) == CUPO
+    assert bloqueos + estados[503] > 0, "los procesos nunca chocaron: la prueba no ejercitó los reintentos"
+
+
+def test_no_supera_los_creditos_maximos(cliente, monkeypatch):
+    codigos = [f"CCRED{n:02d}" for n in range(CURSOS_ESCENARIO_CREDITOS)]
+    # Un horario distinto por curso, para que solo limiten los créditos.
+    _crear(cliente, [
+        {"codigo": codigo, "nombre": f"Curso de créditos {n}", "creditos": CREDITOS_POR_CURSO, "horario": f"Dom {6 + n}-{7 + n}"}
+        for n, codigo in enumerate(codigos)
+    ], ["CR00000"], semestre=1)
+
+    estados, _ = _desde_varios_procesos(monkeypatch, [("CR00000", codigo) for codigo in codigos])
+
+    admitidos = cupos.creditos_maximos(1) // CREDITOS_POR_CURSO
+    assert set(estados) <= {201, 409, 503}
+    assert estados[201] == _matriculados(codigos) <= admitidos
+    assert estados[201] + estados[503] >= admitidos
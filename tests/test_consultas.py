@@ -0,0 +1,58 @@
+"""
+Las lecturas de detalle ejecutan la misma cantidad de sentencias SQL sin importar cuántas
+matrículas tenga el curso o el estudiante (sin consultas N+1).
+"""
+import pytest
+from sqlmodel import Session, insert
+
+from database import engine
+from models import Curso, Estudiante, Matricula
+
+TAMANOS = (3, 30, 300)
+
+
+def _curso(n: int) -> str:
+    return f"QC{n:04d}"
+
+
+def _cedula(n: int) -> str:
+    return f"QE{n:04d}"
+
+
+@pytest.fixture(scope="module")
+def matriculas(cliente):
+    """
+    Para cada tamaño n, un curso con n estudiantes y un estudiante con n cursos.
+    """
+    cursos, estudiantes, filas = [], [], []
+    for n in TAMANOS:
+        cursos.append({"codigo": _curso(n), "nombre": f"Curso con {n}", "creditos": 3, "horario": "Lun 8-10"})
+        estudiantes.append({"cedula": _cedula(n), "nombre": f"Estudiante con {n}", "email": f"qe{n}@pruebas.co", "semestre": 5})
+        for i in range(n):
+            codigo, cedula = f"{_curso(n)}-{i:03d}", f"{_cedula(n)}-{i:03d}"
+            cursos.append({"codigo": codigo, "nombre": f"Curso {codigo}", "creditos": 3, "horario": "Mar 8-10"})
+            estudiantes.append({"cedula": cedula, "nombre": f"Estudiante {cedula}", "email": f"{cedula}@pruebas.co", "semestre": 5})
+            filas += [
+                {"estudiante_cedula": cedula, "curso_codigo": _curso(n)},
+                {"estudiante_cedula": _cedula(n), "curso_codigo": codigo},
+            ]
+    with Session(engine) as session:
+        session.exec(insert(Curso), params=cursos)
+        session.exec(insert(Estudiante), params=estudiantes)
+        session.exec(insert(Matricula), params=filas)
+        session.commit()
+
+
+@pytest.mark.parametrize("ruta, elementos", [
+    (lambda n: f"/cursos/{_curso(n)}/", lambda cuerpo: cuerpo["estudiantes"]),
+    (lambda n: f"/cursos/{_curso(n)}/estudiantes/", lambda cuerpo: cuerpo),
+    (lambda n: f"/estudiantes/{_cedula(n)}/", lambda cuerpo: cuerpo["cursos"]),
+], ids=["curso", "estudiantes_de_curso", "estudiante"])
+def test_sentencias_constantes_con_mas_matriculas(cliente, matriculas, sin_cache, ruta, elementos):
+    sentencias = {}
+    for n in TAMANOS:
+        respuesta, ejecutadas = cliente.con_sentencias("GET", ruta(n))
+        assert respuesta.status_code == 200
+        assert len(elementos(respuesta.json())) == n
+        sentencias[n] = len(ejecutadas)
+    assert len(set(sentencias.values())) == 1, sentencias
@@ -0,0 +1,30 @@
+"""
+El cupo de un curso no se puede bajar por debajo de sus estudiantes matriculados más los que
+están en su lista de espera.
+"""
+from types import SimpleNamespace
+
+import cupos
+
+
+def test_no_baja_el_cupo_por_debajo_de_los_ocupados(cliente):
+    codigo = "CUPB01"
+    curso = {"codigo": codigo, "nombre": "Curso para bajar el cupo", "creditos": 3, "horario": "Sab 14-16", "cupo": 2}
+    assert cliente.post("/cursos/", json=curso).status_code == 201
+    for n in range(3):
+        estudiante = {"cedula": f"CUPB{n:04d}", "nombre": f"Estudiante {n}", "email": f"cupb{n}@pruebas.co", "semestre": 6}
+        assert cliente.post("/estudiantes/", json=estudiante).status_code == 201
+    for n in range(2):
+        par = {"estudiante_cedula": f"CUPB{n:04d}", "curso_codigo": codigo}
+        assert cliente.post(f"/cursos/{codigo}/estudiantes/", json=par).status_code == 201
+    par = {"estudiante_cedula": "CUPB0002", "curso_codigo": codigo}
+    assert cliente.post(f"/cursos/{codigo}/lista-espera/", json=par).status_code == 201
+
+    bajado = cliente.patch(f"/cursos/{codigo}/", json={"cupo": 1})
+    assert bajado.status_code == 409
+    assert bajado.json()["detail"] == cupos.cupo_insuficiente(SimpleNamespace(**curso), 1, 3)
+    assert cliente.get(f"/cursos/{codigo}/").json()["cupo"] == 2
+
+    # Dejarlo igual o subirlo siempre se puede, aunque haya estudiantes esperando.
+    assert cliente.patch(f"/cursos/{codigo}/", json={"cupo": 2, "nombre": "Curso con cupo revisado"}).status_code == 200
+    assert cliente.patch(f"/cursos/{codigo}/", json={"cupo": 3}).json()["cupo"] == 3
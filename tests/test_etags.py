@@ -0,0 +1,52 @@
+"""
+Peticiones condicionales: el ETag cambia con la versión de los recursos y el cuerpo que lo
+acompaña nunca es más viejo que esa versión, aunque venga de la caché del proceso.
+"""
+from sqlalchemy import text
+from sqlmodel import Session
+
+from database import engine
+
+
+def _crear_curso(cliente, codigo: str, horario: str):
+    respuesta = cliente.post("/cursos/", json={"codigo": codigo, "nombre": f"Curso {codigo}", "creditos": 3, "horario": horario})
+    assert respuesta.status_code == 201
+
+
+def test_estudiantes_de_varios_cursos_responde_304_hasta_que_cambia_uno(cliente):
+    _crear_curso(cliente, "ETV01", "Mar 14-16")
+    _crear_curso(cliente, "ETV02", "Mie 14-16")
+    respuesta = cliente.post("/estudiantes/", json={"cedula": "ETV0001", "nombre": "Estudiante ETag", "email": "etv@pruebas.co", "semestre": 5})
+    assert respuesta.status_code == 201
+    url = "/cursos/estudiantes/?codigo=ETV01&codigo=ETV02"
+
+    primera = cliente.get(url)
+    etag = primera.headers["etag"]
+    assert primera.json() == {"ETV01": [], "ETV02": []}
+    assert cliente.get(url, headers={"If-None-Match": etag}).status_code == 304
+    # Otro orden de los cursos es otra representación.
+    assert cliente.get("/cursos/estudiantes/?codigo=ETV02&codigo=ETV01", headers={"If-None-Match": etag}).status_code == 200
+
+    matricula = {"estudiante_cedula": "ETV0001", "curso_codigo": "ETV02"}
+    assert cliente.post("/cursos/ETV02/estudiantes/", json=matricula).status_code == 201
+    despues = cliente.get(url, headers={"If-None-Match": etag})
+    assert despues.status_code == 200
+    assert despues.headers["etag"] != etag
+    assert [estudiante["cedula"] for estudiante in despues.json()["ETV02"]] == ["ETV0001"]
+
+
+def test_no_sirve_desde_la_cache_un_cuerpo_anterior_a_la_version(cliente):
+    _crear_curso(cliente, "ETC01", "Jue 14-16")
+    antes = cliente.get("/cursos/ETC01/")
+    assert cliente.get("/cursos/ETC01/").json() == antes.json()  # ya en la caché de este proceso
+
+    # Una escritura de otro worker: cambia la fila y su versión, pero no invalida esta caché.
+    with Session(engine) as session:
+        session.exec(text("UPDATE curso SET nombre = 'Curso renombrado' WHERE codigo = 'ETC01'"))
+        session.exec(text("UPDATE version_recurso SET version = version + 1 WHERE recurso = 'curso:ETC01'"))
+        session.commit()
+
+    despues = cliente.get("/cursos/ETC01/", headers={"If-None-Match": antes.headers["etag"]})
+    assert despues.status_code == 200
+    assert despues.json()["nombre"] == "Curso renombrado"
+    assert cliente.get("/cursos/ETC01/", headers={"If-None-Match": despues.headers["etag"]}).status_code == 304
@@ -0,0 +1,66 @@
+"""
+Las migraciones llevan una base vacía, o una creada antes de que existieran, al mismo esquema
+que declara models.py, sin avisos de SQLAlchemy (por ejemplo al reflejar el índice de
+expresión ix_curso_codigo_lower).
+"""
+import pytest
+from sqlmodel import SQLModel
+
+import migraciones
+from database import crear_engine
+
+pytestmark = pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+
+# El esquema que creaba la primera versión de la aplicación: sin cupo ni el resto de tablas.
+ESQUEMA_ORIGINAL = [
+    "CREATE TABLE curso (nombre VARCHAR(150) NOT NULL, creditos INTEGER NOT NULL, horario VARCHAR NOT NULL, "
+    "codigo VARCHAR(10) NOT NULL, PRIMARY KEY (codigo))",
+    "CREATE UNIQUE INDEX ix_curso_codigo ON curso (codigo)",
+    "CREATE TABLE estudiante (nombre VARCHAR(100) NOT NULL, email VARCHAR NOT NULL, semestre INTEGER NOT NULL, "
+    "cedula VARCHAR(20) NOT NULL, PRIMARY KEY (cedula))",
+    "CREATE UNIQUE INDEX ix_estudiante_cedula ON estudiante (cedula)",
+    "CREATE UNIQUE INDEX ix_estudiante_email ON estudiante (email)",
+    "CREATE INDEX ix_estudiante_nombre ON estudiante (nombre)",
+    "CREATE TABLE matricula (estudiante_cedula VARCHAR NOT NULL, curso_codigo VARCHAR NOT NULL, "
+    "PRIMARY KEY (estudiante_cedula, curso_codigo), FOREIGN KEY(estudiante_cedula) REFERENCES estudiante (cedula), "
+    "FOREIGN KEY(curso_codigo) REFERENCES curso (codigo))",
+]
+
+
+def _esquema(engine) -> dict:
+    """
+    Columnas, claves foráneas e índices de cada tabla del modelo, leídos de SQLite.
+    """
+    esquema = {}
+    with engine.connect() as connection:
+        def sql_de(nombre: str) -> str:
+            sql = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = ?", (nombre,)).scalar()
+            return " ".join((sql or "").replace("IF NOT EXISTS ", "").split())
+
+        for tabla in SQLModel.metadata.tables:
+            columnas = {fila[1]: tuple(fila[2:]) for fila in connection.exec_driver_sql(f'PRAGMA table_info("{tabla}")')}
+            claves = sorted(tuple(fila[2:5]) for fila in connection.exec_driver_sql(f'PRAGMA foreign_key_list("{tabla}")'))
+            indices = {fila[1]: (tuple(fila[2:5]), sql_de(fila[1])) for fila in connection.exec_driver_sql(f'PRAGMA index_list("{tabla}")')}
+            esquema[tabla] = (columnas, claves, indices, "AUTOINCREMENT" in sql_de(tabla))
+    return esquema
+
+
+@pytest.fixture
+def modelo(tmp_path) -> dict:
+    engine = crear_engine(url=f"sqlite:///{tmp_path / 'modelo.db'}")
+    SQLModel.metadata.create_all(engine)
+    yield _esquema(engine)
+    engine.dispose()
+
+
+@pytest.mark.parametrize("inicial", [[], ESQUEMA_ORIGINAL], ids=["vacia", "anterior_a_las_migraciones"])
+def test_migrar_llega_al_esquema_del_modelo(tmp_path, modelo, inicial):
+    engine = crear_engine(url=f"sqlite:///{tmp_path / 'migrada.db'}")
+    with engine.begin() as connection:
+        for sentencia in inicial:
+            connection.exec_driver_sql(sentencia)
+
+    assert [migracion.version for migracion in migraciones.migrar(engine)] == [migracion.version for migracion in migraciones.descubrir()]
+    assert _esquema(engine) == modelo
+    assert migraciones.migrar(engine) == []
+    engine.dispose()
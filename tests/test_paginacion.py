@@ -0,0 +1,44 @@
+"""
+Las páginas NDJSON de los listados tienen exactamente `limit` filas y el mismo cursor de
+continuación que las páginas JSON.
+"""
+import orjson
+import pytest
+
+from paginacion import CABECERA_CURSOR
+
+LIMITE = 7
+
+
+def _lineas(respuesta) -> list:
+    return [orjson.loads(linea) for linea in respuesta.content.splitlines()]
+
+
+@pytest.mark.parametrize("url, clave", [("/cursos/", "codigo"), ("/estudiantes/", "cedula")], ids=["cursos", "estudiantes"])
+def test_pagina_ndjson_con_limite_y_cursor(cliente, url, clave):
+    primera = cliente.get(url, params={"formato": "ndjson", "limit": LIMITE})
+    assert primera.status_code == 200
+    filas = _lineas(primera)
+    assert len(filas) == LIMITE
+
+    json = cliente.get(url, params={"limit": LIMITE})
+    assert [fila[clave] for fila in filas] == [fila[clave] for fila in json.json()]
+    assert primera.headers[CABECERA_CURSOR] == json.headers[CABECERA_CURSOR]
+
+    siguiente = cliente.get(url, params={"formato": "ndjson", "limit": LIMITE, "cursor": primera.headers[CABECERA_CURSOR]})
+    assert siguiente.status_code == 200
+    claves = [fila[clave] for fila in _lineas(siguiente)]
+    assert len(claves) == LIMITE
+    assert claves[0] > filas[-1][clave]
+    assert claves == sorted(claves)
+
+
+def test_ultima_pagina_ndjson_sin_cursor(cliente):
+    todos = cliente.get("/cursos/", params={"formato": "ndjson"})
+    codigos = [fila["codigo"] for fila in _lineas(todos)]
+    assert CABECERA_CURSOR not in todos.headers
+
+    anterior = cliente.get("/cursos/", params={"limit": len(codigos) - LIMITE})
+    ultima = cliente.get("/cursos/", params={"formato": "ndjson", "limit": LIMITE, "cursor": anterior.headers[CABECERA_CURSOR]})
+    assert [fila["codigo"] for fila in _lineas(ultima)] == codigos[-LIMITE:]
+    assert CABECERA_CURSOR not in ultima.headers
@@ -0,0 +1,48 @@
+"""
+Ninguna consulta de las rutas frecuentes recorre una tabla entera según EXPLAIN QUERY PLAN
+(ver benchmarks/planes_consulta.py, que hace lo mismo sobre bases más grandes): ni los
+listados filtrados, ni las listas de estudiantes de un curso, ni las páginas siguientes de
+la paginación por cursor.
+"""
+import pytest
+from sqlmodel import SQLModel
+
+from benchmarks.planes_consulta import RUTAS_FRECUENTES, recorridos
+from database import engine
+from paginacion import CABECERA_CURSOR
+
+LISTADOS_PAGINADOS = [
+    "/cursos/?limit=20",
+    "/cursos/?creditos=3&limit=5",
+    "/estudiantes/?limit=50",
+    "/estudiantes/?semestre=3&limit=20",
+]
+
+
+def _recorridos_de(sentencias) -> list:
+    tablas = set(SQLModel.metadata.tables)
+    malos = []
+    with engine.connect() as connection:
+        for sql, parametros in sentencias:
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            plan = [fila[3] for fila in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parametros).all()]
+            malos += [f"{paso}: {' '.join(sql.split())[:160]}" for paso in recorridos(plan, tablas)]
+    return malos
+
+
+@pytest.mark.parametrize("generar", [generar for _, generar in RUTAS_FRECUENTES], ids=[nombre for nombre, _ in RUTAS_FRECUENTES])
+def test_rutas_frecuentes_sin_recorrer_tablas(cliente, sin_cache, generar):
+    metodo, url, kwargs = generar()
+    respuesta, sentencias = cliente.con_sentencias(metodo, url, **kwargs)
+    assert respuesta.status_code < 500
+    assert _recorridos_de(sentencias) == []
+
+
+@pytest.mark.parametrize("url", LISTADOS_PAGINADOS)
+def test_paginas_siguientes_sin_recorrer_tablas(cliente, sin_cache, url):
+    cursor = cliente.get(url).headers[CABECERA_CURSOR]
+    respuesta, sentencias = cliente.con_sentencias("GET", url, params={"cursor": cursor})
+    assert respuesta.status_code == 200
+    assert any(sql.lstrip().upper().startswith("SELECT") for sql, _ in sentencias)
+    assert _recorridos_de(sentencias) == []